@@ -2,6 +2,9 @@
 ASGI config for DevMate project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn DevMate.asgi:application``) to
+enable the /notifications/stream/ push channel; under WSGI the stream answers
+204 and the browser keeps polling /notifications/count/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
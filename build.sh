@@ -17,4 +17,18 @@ npx @tailwindcss/cli -i ./static/styles/input.css -o ./static/styles/output.css
 python manage.py collectstatic --noinput
 
 # Run database migrations (for PostgreSQL)
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# One-off backfills after upgrading an existing database are run by hand, not on
+# every deploy (see README "Upgrading an existing database"):
+#   python manage.py rebuild_second_degree_links --missing
+#   python manage.py rebuild_timelines --missing
+
+# Long-running processes are started next to the web server, not by this build
+# (on Render: a Background Worker with the same build command):
+#   python manage.py run_outbox_worker    # notifications, mentions, storage cleanup
+#   python manage.py flush_log_views      # folds buffered log impressions into LogViews
+#
+# Scheduled jobs (cron, systemd timer or a Render Cron Job; see README "Notification retention"):
+#   python manage.py prune_notifications       # daily, deletes old read notifications
+#   python manage.py partition_notifications   # monthly, only after partition_notifications --convert
@@ -0,0 +1,38 @@
+"""
+Fold buffered log impressions into LogViews every few seconds.
+Run it as a long-lived process next to the web server; several flushers can
+run side by side on PostgreSQL.
+
+Usage:
+    python manage.py flush_log_views
+    python manage.py flush_log_views --interval 2 --batch-size 10000
+    python manage.py flush_log_views --once      # flush what is staged and exit
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from logs.utils.view_buffer import VIEW_FLUSH_BATCH_SIZE, VIEW_FLUSH_INTERVAL, drain_log_views
+
+
+class Command(BaseCommand):
+    help = "Flush buffered log impressions into LogViews"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=VIEW_FLUSH_BATCH_SIZE, help="Impressions claimed per transaction")
+        parser.add_argument('--interval', type=float, default=VIEW_FLUSH_INTERVAL, help="Seconds between flushes")
+        parser.add_argument('--once', action='store_true', help="Flush staged impressions and exit")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            flushed = drain_log_views(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} impressions"))
+            return
+
+        self.stdout.write("Log view flusher running (Ctrl+C to stop)")
+        try:
+            while True:
+                close_old_connections()
+                drain_log_views(batch_size=options['batch_size'])
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Log view flusher stopped"))
@@ -0,0 +1,38 @@
+"""
+Monthly partitioning of the Notification table (PostgreSQL only, optional).
+
+Usage:
+    python manage.py partition_notifications --convert          # one-time rebuild as a partitioned table
+    python manage.py partition_notifications                    # create the coming months (monthly cron job)
+    python manage.py partition_notifications --months-ahead 3
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from logs.utils.notification_partitions import (
+    PARTITION_MONTHS_AHEAD, convert_to_partitioned, ensure_notification_partitions, is_partitioned,
+)
+
+
+class Command(BaseCommand):
+    help = "Partition notifications by month and keep future partitions ready"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help="Rebuild the table as a partitioned table")
+        parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD, help="Future months to prepare")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Notification partitioning needs PostgreSQL")
+
+        if options['convert']:
+            if is_partitioned():
+                self.stdout.write("Notification table is already partitioned")
+            else:
+                copied = convert_to_partitioned(months_ahead=options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(f"Partitioned notifications ({copied} rows copied)"))
+                return
+        elif not is_partitioned():
+            raise CommandError("The notification table is not partitioned yet (run with --convert)")
+
+        created = ensure_notification_partitions(months_ahead=options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} notification partitions"))
@@ -0,0 +1,39 @@
+"""
+Delete old notifications in bounded, throttled chunks.
+Meant to run periodically (e.g. a daily cron job).
+
+Usage:
+    python manage.py prune_notifications                      # read notifications older than 30 days
+    python manage.py prune_notifications --days 14 --chunk-size 500 --sleep 0.5
+    python manage.py prune_notifications --include-unread --days 180
+    python manage.py prune_notifications --drop-months 6     # partitioned tables: drop months past 6 too
+"""
+from django.core.management.base import BaseCommand, CommandError
+from logs.utils.notification_partitions import drop_notification_partitions, is_partitioned
+from logs.utils.retention import RETENTION_CHUNK_SIZE, RETENTION_CHUNK_SLEEP, RETENTION_DAYS, prune_notifications
+
+
+class Command(BaseCommand):
+    help = "Delete old notifications in id-range chunks (and drop expired monthly partitions)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="Delete notifications older than N days")
+        parser.add_argument('--include-unread', action='store_true', help="Delete old unread notifications too")
+        parser.add_argument('--chunk-size', type=int, default=RETENTION_CHUNK_SIZE, help="Ids covered per DELETE")
+        parser.add_argument('--sleep', type=float, default=RETENTION_CHUNK_SLEEP, help="Seconds to pause between chunks")
+        parser.add_argument('--drop-months', type=int, help="Drop whole monthly partitions older than N months (partitioned tables only)")
+
+    def handle(self, *args, **options):
+        if options['drop_months'] is not None:
+            if not is_partitioned():
+                raise CommandError("The notification table is not partitioned (see partition_notifications)")
+            dropped = drop_notification_partitions(options['drop_months'])
+            self.stdout.write(self.style.SUCCESS(f"Dropped {len(dropped)} notification partitions"))
+
+        deleted = prune_notifications(
+            days=options['days'],
+            read_only=not options['include_unread'],
+            chunk_size=options['chunk_size'],
+            sleep_seconds=options['sleep'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} notifications"))
@@ -0,0 +1,26 @@
+"""
+Recompute the daily activity rollup and cached streaks from the Log table.
+Run after bulk log imports or deletes that bypass signals.
+
+Usage:
+    python manage.py rebuild_daily_activity
+    python manage.py rebuild_daily_activity --user alice --user bob
+"""
+from django.core.management.base import BaseCommand
+from logs.utils.activity import ACTIVITY_REBUILD_BATCH_SIZE, rebuild_daily_activity
+from myapp.models import userinfo
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyActivity rows and userinfo streaks from logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Only rebuild this user (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=ACTIVITY_REBUILD_BATCH_SIZE, help="Users rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = userinfo.objects.filter(user__username__in=options['usernames'])
+        rebuilt = rebuild_daily_activity(users, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily activity of {rebuilt} users"))
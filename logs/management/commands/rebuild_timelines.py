@@ -0,0 +1,35 @@
+"""
+Rebuild materialized home timelines from the follow graph.
+
+Usage:
+    python manage.py rebuild_timelines              # every user
+    python manage.py rebuild_timelines --missing    # only users without a timeline yet
+    python manage.py rebuild_timelines --user alice
+"""
+from django.core.management.base import BaseCommand
+from logs.models import TimelineEntry
+from logs.utils.timeline import rebuild_timeline
+from myapp.models import userinfo
+
+
+class Command(BaseCommand):
+    help = "Rebuild home timelines (network feed) from the follow graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the timeline of this username")
+        parser.add_argument('--missing', action='store_true', help="Only rebuild users that have no timeline rows")
+
+    def handle(self, *args, **options):
+        users = userinfo.objects.all()
+        if options['user']:
+            users = users.filter(user__username=options['user'])
+        if options['missing']:
+            users = users.exclude(id__in=TimelineEntry.objects.values('owner_id'))
+
+        rebuilt = 0
+        written = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            written += rebuild_timeline(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timelines ({written} entries)"))
@@ -0,0 +1,28 @@
+"""
+Recompute the denormalized engagement counters on Log and fix drift.
+
+Usage:
+    python manage.py reconcile_log_counters              # every log
+    python manage.py reconcile_log_counters --days 7     # logs from the last 7 days
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from logs.models import Log
+from logs.utils.counters import reconcile_log_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute reaction/comment counters on Log from the source tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Only check logs created in the last N days")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Logs checked per query")
+
+    def handle(self, *args, **options):
+        logs = Log.objects.all()
+        if options['days']:
+            logs = logs.filter(timestamp__gte=timezone.now() - timedelta(days=options['days']))
+
+        fixed = reconcile_log_counters(logs, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected counters on {fixed} logs"))
@@ -0,0 +1,21 @@
+"""
+Recompute the denormalized unread notification counters and fix drift.
+Meant to run periodically (e.g. a daily cron job).
+
+Usage:
+    python manage.py reconcile_notification_counts
+    python manage.py reconcile_notification_counts --batch-size 500
+"""
+from django.core.management.base import BaseCommand
+from logs.utils.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute unread notification counters from the Notification table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Users checked per query")
+
+    def handle(self, *args, **options):
+        fixed = reconcile_unread_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected unread counters on {fixed} users"))
@@ -0,0 +1,33 @@
+"""
+Carry out queued outbox events (notifications, storage cleanup) in a loop.
+Run it as a long-lived process next to the web server; several workers can
+run side by side on PostgreSQL.
+
+Usage:
+    python manage.py run_outbox_worker
+    python manage.py run_outbox_worker --batch-size 200 --poll 0.5
+    python manage.py run_outbox_worker --once      # process what is due and exit
+"""
+from django.core.management.base import BaseCommand
+from logs.utils.outbox import OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, drain_outbox, run_outbox_worker
+
+
+class Command(BaseCommand):
+    help = "Process transactional outbox events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help="Events claimed per transaction")
+        parser.add_argument('--poll', type=float, default=OUTBOX_POLL_SECONDS, help="Seconds to wait when idle")
+        parser.add_argument('--once', action='store_true', help="Process due events and exit")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = drain_outbox(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} outbox events"))
+            return
+
+        self.stdout.write("Outbox worker running (Ctrl+C to stop)")
+        try:
+            run_outbox_worker(batch_size=options['batch_size'], poll_seconds=options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Outbox worker stopped"))
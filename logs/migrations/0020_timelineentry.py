@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0019_logformsettings'),
+        ('myapp', '0135_remove_ip_geolocation_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.userinfo')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='logs.log')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='myapp.userinfo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-timestamp', '-log'], name='logs_timeli_owner_i_1e670b_idx'), models.Index(fields=['owner', 'author'], name='logs_timeli_owner_i_64139b_idx')],
+                'unique_together': {('owner', 'log')},
+            },
+        ),
+    ]
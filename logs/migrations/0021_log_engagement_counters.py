@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 18:11
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    # Fill the new counter columns from the Reaction and Comment tables
+    Log = apps.get_model('logs', 'Log')
+    Reaction = apps.get_model('logs', 'Reaction')
+    Comment = apps.get_model('logs', 'Comment')
+
+    def count_of(model, **filters):
+        rows = (
+            model.objects.filter(mindlog=OuterRef('pk'), **filters)
+            .order_by()
+            .values('mindlog')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    Log.objects.update(
+        like_count=count_of(Reaction, emoji='❤️'),
+        rocket_count=count_of(Reaction, emoji='🚀'),
+        insight_count=count_of(Reaction, emoji='💡'),
+        sad_count=count_of(Reaction, emoji='😢'),
+        comment_count=count_of(Comment, parent_comment__isnull=True),
+        reply_count=count_of(Comment, parent_comment__isnull=False),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0020_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='insight_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='rocket_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='sad_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 18:26
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def backfill_hot_scores(apps, schema_editor):
+    # Same formula as logs.utils.trending.compute_hot_score
+    Log = apps.get_model('logs', 'Log')
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    batch = []
+    for log in Log.objects.only(
+        'pk', 'timestamp', 'like_count', 'rocket_count', 'insight_count', 'sad_count', 'comment_count', 'reply_count'
+    ).iterator():
+        reactions = log.like_count + log.rocket_count + log.insight_count + log.sad_count
+        engagement_score = reactions * 2 + log.comment_count * 3 + log.reply_count * 3
+        log.hot_score = math.log10(max(engagement_score, 1)) + (log.timestamp - epoch).total_seconds() / 45000
+        batch.append(log)
+        if len(batch) >= 1000:
+            Log.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    if batch:
+        Log.objects.bulk_update(batch, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0021_log_engagement_counters'),
+        ('myapp', '0137_seconddegreelink'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['-hot_score', '-id'], name='logs_log_hot_sco_83d187_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0023_log_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='card_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
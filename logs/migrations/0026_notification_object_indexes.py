@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('logs', '0025_notification_coalescing'),
+        ('myapp', '0139_userinfo_unread_notification_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['target_content_type', 'target_object_id'], name='logs_notifi_target__36f581_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['action_content_type', 'action_object_id'], name='logs_notifi_action__a79fdc_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0027_outboxevent'),
+        ('myapp', '0139_userinfo_unread_notification_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogViewImpression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField(auto_now_add=True)),
+                ('log', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='logs.log')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.userinfo')),
+            ],
+        ),
+    ]
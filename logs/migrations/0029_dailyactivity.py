@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0028_logviewimpression'),
+        ('myapp', '0139_userinfo_unread_notification_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='myapp.userinfo')),
+            ],
+            options={
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 19:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_last_activity(apps, schema_editor):
+    # Existing groups were last active when they were last stamped
+    Notification = apps.get_model('logs', 'Notification')
+    Notification.objects.update(last_activity=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0029_dailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_last_activity, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('logs', '0030_notification_last_activity'),
+        ('myapp', '0141_userinfo_geo_cell_not_editable'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'last_activity'], name='logs_notifi_recipie_1f1683_idx'),
+        ),
+    ]
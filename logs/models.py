@@ -1,8 +1,9 @@
 from django.db import models
 from myapp.models import userinfo
+from django.utils import timezone
 from django.utils.crypto import get_random_string
-from django.db.models import F, Count
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models import F
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 
 BASE62_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
@@ -26,22 +27,56 @@ class Log(models.Model):
 
     # Unique signature
     sig = models.CharField(max_length=20, unique=True, default=generate_unique_signature)
+
+    # Denormalized engagement counters (maintained by signals, see logs/signals.py)
+    like_count = models.PositiveIntegerField(default=0)
+    rocket_count = models.PositiveIntegerField(default=0)
+    insight_count = models.PositiveIntegerField(default=0)
+    sad_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)  # Top-level comments only
+    reply_count = models.PositiveIntegerField(default=0)
+
+    # Time-decayed ranking score (see logs.utils.trending.compute_hot_score)
+    hot_score = models.FloatField(default=0)
+
+    # Bumped whenever the rendered feed card changes (see logs.utils.card_cache)
+    card_version = models.PositiveIntegerField(default=0)
+
+    # Notifications about this log; deleting logs removes them in bulk with the cascade
+    notifications = GenericRelation(
+        'Notification', content_type_field='target_content_type', object_id_field='target_object_id'
+    )
+
+    # Counter column for each reaction emoji
+    REACTION_COUNT_FIELDS = {
+        '❤️': 'like_count',
+        '🚀': 'rocket_count',
+        '💡': 'insight_count',
+        '😢': 'sad_count',
+    }
     
     def total_comments(self):
-        return self.comments.count()
+        return self.comment_count + self.reply_count
     
     def total_reactions(self):
-        return self.reactions.count()
+        return sum(getattr(self, field) for field in self.REACTION_COUNT_FIELDS.values())
     
     def get_reaction_counts(self):
         """Get count of each reaction type"""
-        counts = self.reactions.values('emoji').annotate(count=Count('emoji'))
-        return {item['emoji']: item['count'] for item in counts}
+        return {
+            emoji: getattr(self, field)
+            for emoji, field in self.REACTION_COUNT_FIELDS.items()
+            if getattr(self, field)
+        }
     
     def get_user_reaction(self, user):
         """Get the reaction by a specific user for this log"""
+        # _viewer_reaction is filled for a whole page by logs.utils.hydration.hydrate_feed_logs
+        user = user.info if hasattr(user, 'info') else user
+        if hasattr(self, '_viewer_reaction') and self._viewer_reaction[0] == getattr(user, 'pk', None):
+            return self._viewer_reaction[1]
         try:
-            return self.reactions.get(user=user.info if hasattr(user, 'info') else user)
+            return self.reactions.get(user=user)
         except:
             return None
     
@@ -49,6 +84,18 @@ class Log(models.Model):
         """Check if user has reacted to this log"""
         return self.reactions.filter(user=user.info if hasattr(user, 'info') else user).exists()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-hot_score', '-id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Edits invalidate the cached feed card
+        if not self._state.adding:
+            self.card_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'card_version'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.user.username} ▸ {self.sig}"
@@ -135,6 +182,10 @@ class Notification(models.Model):
         ('comment_mention', 'Mentioned in Comment'),
     ]
     
+    # Types aggregated into one row per (recipient, type, target) while unread
+    # ("alice and 12 others reacted to your log"); follows group per recipient
+    COALESCED_TYPES = ('reaction', 'comment', 'follow')
+    
     # Who receives the notification
     recipient = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='notifications')
     
@@ -157,9 +208,14 @@ class Notification(models.Model):
     # Notification type for easy filtering and rendering
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES, db_index=True)
     
+    # Aggregation of coalesced notifications: actor is the most recent one
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actor_ids = models.JSONField(default=list, blank=True)  # Most recent first, capped
+    
     # Metadata
     is_read = models.BooleanField(default=False, db_index=True)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)  # Sort key of the list; never moves
+    last_activity = models.DateTimeField(default=timezone.now)  # Latest event merged into a coalesced group
     
     class Meta:
         ordering = ['-timestamp']
@@ -167,16 +223,28 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'is_read', '-timestamp']),
             models.Index(fields=['recipient', 'notification_type']),
             models.Index(fields=['recipient', '-timestamp']),
+            models.Index(fields=['recipient', 'last_activity']),  # Notification streams
+            # Cleanup when a target or action object is deleted
+            models.Index(fields=['target_content_type', 'target_object_id']),
+            models.Index(fields=['action_content_type', 'action_object_id']),
         ]
     
     def __str__(self):
         return f"{self.actor.user.username} {self.verb} → {self.recipient.user.username}"
     
+    @property
+    def other_actor_count(self):
+        """Number of actors besides the displayed one ("alice and 12 others")"""
+        return self.actor_count - 1
+    
     def mark_as_read(self):
-        """Mark this notification as read"""
+        """Mark this notification as read (and decrement the recipient's unread counter)"""
         if not self.is_read:
             self.is_read = True
-            self.save(update_fields=['is_read'])
+            # Conditional update so concurrent calls decrement the counter only once
+            if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True):
+                from logs.utils.notifications import adjust_unread_count
+                adjust_unread_count(self.recipient_id, -1)
 
 
 class LogViews(models.Model):
@@ -208,6 +276,84 @@ class LogViews(models.Model):
         self.save(update_fields=['view_count', 'viewed_at'])
 
 
+class LogViewImpression(models.Model):
+    """
+    Append-only staging row for one tracked impression.
+    The view beacon only inserts here; `manage.py flush_log_views` folds the
+    rows into LogViews in batches (see logs/utils/view_buffer.py).
+    Kept small and short-lived, so the foreign keys carry no extra indexes.
+    """
+    user = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='+', db_index=False)
+    log = models.ForeignKey(Log, on_delete=models.CASCADE, related_name='+', db_index=False)
+    viewed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} viewed {self.log_id}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home timeline: one row per log in a user's network feed.
+    Filled by fan-out on write (see logs/utils/timeline.py) so a network
+    feed page is a single keyset range scan on (owner, timestamp, log).
+    """
+    owner = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='timeline_entries')
+    log = models.ForeignKey(Log, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='+')
+    timestamp = models.DateTimeField()  # Copy of log.timestamp for the keyset index
+
+    class Meta:
+        unique_together = ['owner', 'log']
+        indexes = [
+            models.Index(fields=['owner', '-timestamp', '-log']),
+            models.Index(fields=['owner', 'author']),
+        ]
+
+    def __str__(self):
+        return f"{self.owner.user.username} ◂ {self.log.sig}"
+
+
+class DailyActivity(models.Model):
+    """
+    Number of logs a user posted on each day of their local calendar.
+    Kept current by the Log signals (see logs/utils/activity.py); drives the
+    profile heatmap and the streak columns on userinfo.
+    """
+    user = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField()  # Day in the user's timezone
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'date']
+
+    def __str__(self):
+        return f"{self.user_id} on {self.date}: {self.count}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Transactional outbox: side effects queued by signals in the same
+    transaction as the write that caused them, and carried out by
+    `manage.py run_outbox_worker` (see logs/utils/outbox.py).
+    Processed events are deleted; events that keep failing are marked failed.
+    """
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)  # Pushed back after a failed attempt
+    attempts = models.PositiveSmallIntegerField(default=0)
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['failed', 'available_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+
 class LogFormSettings(models.Model):
     """
     Singleton model to store LogForm settings like placeholder text.
@@ -1,40 +1,184 @@
 """
-Signal handlers for logs app - includes file cleanup and notification creation
+Signal handlers for logs app - includes file cleanup, engagement counters,
+hot scores, notification creation (through the outbox worker), unread
+notification counters, the daily activity rollup and home timeline fan-out
 """
-from django.db.models.signals import post_delete, post_save
+from django.contrib.auth.models import User
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.core.files.storage import default_storage
 from django.contrib.contenttypes.models import ContentType
 import re
 
 from .models import Log, Comment, Reaction, Notification
-from myapp.models import follow
+from .utils import activity, outbox, timeline, trending
+from .utils.counters import adjust_log_counter
+from .utils.outbox import outbox_handler
+from .utils.notifications import (
+    adjust_unread_count, build_notification, defer_action_object_cleanup, defer_unread_decrement,
+    hand_over_notifications, reconcile_unread_counts, send_notifications, withdraw_notification,
+)
+from myapp.models import follow, userinfo
+
+
+def _origin_model(origin):
+    """Model class of a delete origin (model instance or QuerySet passed to post_delete)"""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
 
 
 @receiver(post_delete, sender=Log)
 def delete_log_snapshot(sender, instance, **kwargs):
-    """Clean up snapshot file when log is deleted"""
+    """Clean up snapshot file when log is deleted (storage call runs in the outbox worker)"""
     if instance.snap_shot and instance.snap_shot.name:
-        if default_storage.exists(instance.snap_shot.name):
-            default_storage.delete(instance.snap_shot.name)
+        outbox.enqueue('delete_file', name=instance.snap_shot.name)
+
+
+# ============= ENGAGEMENT COUNTER SIGNALS =============
+
+@receiver(post_save, sender=Reaction)
+def count_reaction(sender, instance, created, **kwargs):
+    """
+    Keep the per-emoji reaction counters on Log current.
+    An emoji change is detected through _previous_emoji (set by toggle_reaction).
+    """
+    field = Log.REACTION_COUNT_FIELDS.get(instance.emoji)
+    if created:
+        if field:
+            adjust_log_counter(instance.mindlog_id, field, 1)
+        return
+    
+    previous_field = Log.REACTION_COUNT_FIELDS.get(getattr(instance, '_previous_emoji', None))
+    if previous_field and previous_field != field:
+        adjust_log_counter(instance.mindlog_id, previous_field, -1)
+        if field:
+            adjust_log_counter(instance.mindlog_id, field, 1)
+
+
+@receiver(post_delete, sender=Reaction)
+def uncount_reaction(sender, instance, **kwargs):
+    """Decrement the reaction counter when a reaction is removed"""
+    field = Log.REACTION_COUNT_FIELDS.get(instance.emoji)
+    if field:
+        adjust_log_counter(instance.mindlog_id, field, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    """Increment the comment or reply counter on Log"""
+    if not created:
+        return
+    field = 'reply_count' if instance.parent_comment_id else 'comment_count'
+    adjust_log_counter(instance.mindlog_id, field, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    """Decrement the comment or reply counter (cascaded replies fire their own signal)"""
+    field = 'reply_count' if instance.parent_comment_id else 'comment_count'
+    adjust_log_counter(instance.mindlog_id, field, -1)
+
+
+# ============= TRENDING SIGNALS =============
+# These run after the counter signals above, so hot_score is computed from current counters
+
+@receiver(post_save, sender=Log)
+def init_hot_score(sender, instance, created, **kwargs):
+    """Give a new log its starting hot_score (no engagement yet)"""
+    if created:
+        trending.update_hot_score(instance)
+
+
+@receiver(post_save, sender=Reaction)
+@receiver(post_save, sender=Comment)
+def raise_hot_score(sender, instance, created, **kwargs):
+    """Recompute the log's hot_score for a new reaction, comment or reply"""
+    if created:
+        trending.update_hot_score(instance.mindlog)
+
+
+@receiver(post_delete, sender=Reaction)
+@receiver(post_delete, sender=Comment)
+def lower_hot_score(sender, instance, origin=None, **kwargs):
+    """Recompute the log's hot_score when engagement is removed (skipped when the log itself is deleted)"""
+    if _origin_model(origin) is not Log:
+        trending.update_hot_score(instance.mindlog)
 
 
 # ============= NOTIFICATION SIGNALS =============
+# Receivers only queue an outbox event; the notifications are built by the
+# handlers below in the outbox worker (manage.py run_outbox_worker).
 
 @receiver(post_save, sender=Comment)
 def create_comment_notification(sender, instance, created, **kwargs):
     """
-    Create notification when someone comments on a log or replies to a comment
+    Queue notifications when someone comments on a log or replies to a comment
+    """
+    if not created:
+        return
+    
+    # _actual_parent_user is set by add_comment for flattened replies
+    parent_user = getattr(instance, '_actual_parent_user', None)
+    outbox.enqueue('notify_comment', comment_id=instance.id, parent_user_id=parent_user.pk if parent_user else None)
+
+
+@receiver(post_save, sender=Reaction)
+def create_reaction_notification(sender, instance, created, **kwargs):
+    """
+    Queue a notification when someone reacts to a log
+    """
+    if not created:
+        return
+    
+    # Don't notify if user reacts to their own log
+    if instance.mindlog.user_id == instance.user_id:
+        return
+    
+    outbox.enqueue('notify_reaction', reaction_id=instance.id)
+
+
+@receiver(post_save, sender=follow)
+def create_follow_notification(sender, instance, created, **kwargs):
+    """
+    Queue a notification when someone follows a user
     """
     if not created:
         return
     
+    outbox.enqueue('notify_follow', follow_id=instance.id)
+
+
+@receiver(post_save, sender=Log)
+def create_log_mention_notifications(sender, instance, created, **kwargs):
+    """
+    Queue notifications for @mentions in log content
+    """
+    if not created or '@' not in instance.content:
+        return
+    
+    outbox.enqueue('notify_log_mentions', log_id=instance.id)
+
+
+@outbox_handler('notify_comment')
+def notify_comment(comment_id, parent_user_id=None):
+    """
+    Create notification when someone comments on a log or replies to a comment.
+    The comment/reply notification and any @mention notifications are inserted together.
+    """
+    instance = (
+        Comment.objects.select_related('user', 'mindlog__user', 'parent_comment__user')
+        .filter(pk=comment_id).first()
+    )
+    if instance is None:
+        return  # Deleted before the worker got to it
+    
+    notifications = []
+    
     # Determine notification type and recipient
-    if instance.parent_comment or hasattr(instance, '_actual_parent_user'):
+    if instance.parent_comment or parent_user_id:
         # This is a reply to a comment
-        # Use _actual_parent_user if available (handles flattened replies)
-        if hasattr(instance, '_actual_parent_user'):
-            recipient = instance._actual_parent_user
+        # Use the actual parent user if given (handles flattened replies)
+        if parent_user_id:
+            recipient = userinfo.objects.filter(pk=parent_user_id).first()
         else:
             recipient = instance.parent_comment.user
         verb = 'replied to your comment'
@@ -44,88 +188,83 @@ def create_comment_notification(sender, instance, created, **kwargs):
         recipient = instance.mindlog.user
         verb = 'commented on your log'
         notification_type = 'comment'
-        
-        # Don't notify if user comments on their own log
-        if recipient == instance.user:
-            # Still check for mentions though
-            create_mention_notifications(instance.content, instance.user, instance.mindlog, instance, 'comment_mention')
-            return
     
-    # Don't notify if replying to yourself
-    if recipient == instance.user:
-        # Still check for mentions though
-        create_mention_notifications(instance.content, instance.user, instance.mindlog, instance, 'comment_mention')
-        return
-    
-    # Create the notification
-    Notification.objects.create(
-        recipient=recipient,
-        actor=instance.user,
-        verb=verb,
-        target=instance.mindlog,
-        action_object=instance,
-        notification_type=notification_type
-    )
+    # Don't notify if user comments on their own log or replies to themselves
+    # (mentions are still checked)
+    reply_recipient = None
+    if recipient is not None and recipient != instance.user:
+        notifications.append(build_notification(
+            recipient=recipient,
+            actor=instance.user,
+            verb=verb,
+            target=instance.mindlog,
+            action_object=instance,
+            notification_type=notification_type
+        ))
+        # Pass the reply recipient to avoid duplicate notifications
+        if notification_type == 'reply':
+            reply_recipient = recipient
     
     # Check for @mentions in the comment
-    # Pass the reply recipient to avoid duplicate notifications
-    reply_recipient = recipient if notification_type == 'reply' else None
-    create_mention_notifications(instance.content, instance.user, instance.mindlog, instance, 'comment_mention', exclude_user=reply_recipient)
+    notifications += build_mention_notifications(
+        instance.content, instance.user, instance.mindlog, instance, 'comment_mention', exclude_user=reply_recipient
+    )
+    send_notifications(notifications)
 
 
-@receiver(post_save, sender=Reaction)
-def create_reaction_notification(sender, instance, created, **kwargs):
+@outbox_handler('notify_reaction')
+def notify_reaction(reaction_id):
     """
     Create notification when someone reacts to a log
     """
-    if not created:
-        return
-    
-    # Don't notify if user reacts to their own log
-    if instance.mindlog.user == instance.user:
-        return
+    instance = Reaction.objects.select_related('user', 'mindlog__user').filter(pk=reaction_id).first()
+    if instance is None:
+        return  # Reaction removed before the worker got to it
     
-    Notification.objects.create(
+    send_notifications([build_notification(
         recipient=instance.mindlog.user,
         actor=instance.user,
         verb=f'reacted {instance.emoji} to your log',
         target=instance.mindlog,
         action_object=instance,
         notification_type='reaction'
-    )
+    )])
 
 
-@receiver(post_save, sender=follow)
-def create_follow_notification(sender, instance, created, **kwargs):
+@outbox_handler('notify_follow')
+def notify_follow(follow_id):
     """
     Create notification when someone follows a user
     """
-    if not created:
-        return
+    instance = follow.objects.select_related('follower', 'following').filter(pk=follow_id).first()
+    if instance is None:
+        return  # Unfollowed before the worker got to it
     
-    Notification.objects.create(
+    send_notifications([build_notification(
         recipient=instance.following,
         actor=instance.follower,
         verb='started following you',
         target=instance.follower,  # Target is the follower's profile
         notification_type='follow'
-    )
+    )])
 
 
-@receiver(post_save, sender=Log)
-def create_log_mention_notifications(sender, instance, created, **kwargs):
+@outbox_handler('notify_log_mentions')
+def notify_log_mentions(log_id):
     """
     Create notifications for @mentions in log content
     """
-    if not created:
-        return
+    instance = Log.objects.select_related('user').filter(pk=log_id).first()
+    if instance is None:
+        return  # Deleted before the worker got to it
     
-    create_mention_notifications(instance.content, instance.user, instance, None, 'mention')
+    send_notifications(build_mention_notifications(instance.content, instance.user, instance, None, 'mention'))
 
 
-def create_mention_notifications(content, actor, log, action_object=None, notification_type='mention', exclude_user=None):
+def build_mention_notifications(content, actor, log, action_object=None, notification_type='mention', exclude_user=None):
     """
-    Parse content for @mentions and create notifications
+    Parse content for @mentions and build (unsaved) notifications for them.
+    All mentioned usernames are resolved with a single query.
     
     Args:
         content: Text content to parse for mentions
@@ -134,124 +273,200 @@ def create_mention_notifications(content, actor, log, action_object=None, notifi
         action_object: Optional action object (e.g., Comment)
         notification_type: Type of mention notification
         exclude_user: Optional user to exclude from mention notifications (e.g., if they already got a reply notification)
-    """
-    from myapp.models import userinfo
     
-    # Find all @mentions in the content
+    Returns:
+        List of unsaved Notification objects (insert with send_notifications)
+    """
+    # Find all unique @mentions in the content
     mention_pattern = r'@(\w+)'
-    mentioned_usernames = re.findall(mention_pattern, content)
+    mentioned_usernames = set(re.findall(mention_pattern, content))
     
     if not mentioned_usernames:
-        return
+        return []
     
-    # Get unique usernames
-    mentioned_usernames = set(mentioned_usernames)
+    # Don't notify yourself, a user who already received a reply notification,
+    # or the log owner mentioned in their own log
+    skip_ids = {actor.pk}
+    if exclude_user:
+        skip_ids.add(exclude_user.pk)
+    if not action_object:
+        skip_ids.add(log.user_id)
+    
+    # Usernames that don't exist are simply not matched
+    mentioned_users = (
+        userinfo.objects.filter(user__username__in=mentioned_usernames)
+        .exclude(pk__in=skip_ids)
+        .order_by('pk')
+    )
     
-    # Find users and create notifications
-    for username in mentioned_usernames:
-        try:
-            mentioned_user = userinfo.objects.select_related('user').get(user__username=username)
-            
-            # Don't notify if mentioning yourself
-            if mentioned_user == actor:
-                continue
-            
-            # Don't notify if this user already received a reply notification
-            if exclude_user and mentioned_user == exclude_user:
-                continue
-            
-            # Don't notify the log owner if they're mentioned in their own log
-            if mentioned_user == log.user and not action_object:
-                continue
-            
-            # Create notification
-            verb = 'mentioned you in a comment' if notification_type == 'comment_mention' else 'mentioned you in a log'
-            
-            Notification.objects.create(
-                recipient=mentioned_user,
-                actor=actor,
-                verb=verb,
-                target=log,
-                action_object=action_object,
-                notification_type=notification_type
-            )
-        except userinfo.DoesNotExist:
-            # Username doesn't exist, skip
-            continue
+    verb = 'mentioned you in a comment' if notification_type == 'comment_mention' else 'mentioned you in a log'
+    return [
+        build_notification(
+            recipient=mentioned_user,
+            actor=actor,
+            verb=verb,
+            target=log,
+            action_object=action_object,
+            notification_type=notification_type
+        )
+        for mentioned_user in mentioned_users
+    ]
+
+
+# ============= UNREAD NOTIFICATION COUNTER SIGNALS =============
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    """Increment the recipient's unread counter for a new notification"""
+    if created and not instance.is_read:
+        adjust_unread_count(instance.recipient_id, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_unread_notification(sender, instance, origin=None, **kwargs):
+    """
+    Decrement the unread counter when an unread notification is deleted.
+    Decrements of one delete operation are applied together on commit.
+    Cascades from a user deletion are skipped (they can report a row twice) and reconciled below.
+    """
+    if not instance.is_read and _origin_model(origin) not in (User, userinfo):
+        defer_unread_decrement(origin, instance.recipient_id)
+
+
+@receiver(pre_delete, sender=userinfo)
+def collect_notified_recipients(sender, instance, **kwargs):
+    """Remember whose unread notifications go with the deleted user (triggered by them or about their logs)"""
+    about_logs = Q(
+        target_content_type=ContentType.objects.get_for_model(Log),
+        target_object_id__in=Log.objects.filter(user=instance).values('id'),
+    )
+    instance._notified_recipient_ids = list(
+        Notification.objects.filter(Q(actor=instance) | about_logs, is_read=False)
+        .values_list('recipient_id', flat=True).distinct()
+    )
+
+
+@receiver(pre_delete, sender=userinfo)
+def hand_over_coalesced_notifications(sender, instance, **kwargs):
+    """
+    Take the deleted user out of coalesced notifications, keeping the groups
+    of their other actors (unread counters are reconciled below)
+    """
+    hand_over_notifications(instance.pk)
+
+
+@receiver(post_delete, sender=userinfo)
+def reconcile_notified_recipients(sender, instance, **kwargs):
+    """Recount unread notifications of the users the deleted user had notified"""
+    recipient_ids = getattr(instance, '_notified_recipient_ids', None)
+    if recipient_ids:
+        reconcile_unread_counts(userinfo.objects.filter(pk__in=recipient_ids))
 
 
 # ============= NOTIFICATION CLEANUP SIGNALS =============
 
 @receiver(post_delete, sender=Comment)
-def delete_comment_notifications(sender, instance, **kwargs):
+def delete_comment_notifications(sender, instance, origin=None, **kwargs):
     """
-    Delete notifications when a comment or reply is deleted
+    Delete notifications when a comment or reply is deleted.
+    A coalesced comment notification only loses the commenter once they
+    have no top-level comment left on the log.
     """
-    from django.contrib.contenttypes.models import ContentType
-    
-    # Get the ContentType for Comment
-    comment_ct = ContentType.objects.get_for_model(Comment)
+    # Notifications about a deleted log go with it (Log.notifications)
+    if _origin_model(origin) is Log:
+        return
     
-    # Delete notifications where this comment is the action_object
-    # This handles both comment and reply notifications
-    Notification.objects.filter(
-        action_content_type=comment_ct,
-        action_object_id=instance.id
-    ).delete()
+    # Reply and mention notifications of all comments deleted together, in one statement
+    defer_action_object_cleanup(origin, instance)
     
-    # Also delete mention notifications where this comment is the action_object
-    Notification.objects.filter(
-        action_content_type=comment_ct,
-        action_object_id=instance.id,
-        notification_type__in=['comment_mention']
-    ).delete()
+    # User deletions withdraw in bulk (hand_over_notifications)
+    if instance.parent_comment_id is None and _origin_model(origin) not in (User, userinfo):
+        log = instance.mindlog
+        if log.user_id != instance.user_id and not Comment.objects.filter(
+            mindlog_id=log.id, user_id=instance.user_id, parent_comment__isnull=True
+        ).exists():
+            withdraw_notification(log.user_id, 'comment', log, instance.user_id)
 
 
 @receiver(post_delete, sender=Reaction)
-def delete_reaction_notifications(sender, instance, **kwargs):
+def delete_reaction_notifications(sender, instance, origin=None, **kwargs):
     """
-    Delete notifications when a reaction is removed
+    Withdraw the reactor from the log owner's reaction notification when a reaction is removed
     """
-    from django.contrib.contenttypes.models import ContentType
-    
-    # Get the ContentType for Reaction
-    reaction_ct = ContentType.objects.get_for_model(Reaction)
+    # Log deletions drop the log's notifications; user deletions withdraw in bulk (hand_over_notifications)
+    if _origin_model(origin) in (Log, User, userinfo):
+        return
     
-    # Delete the reaction notification
-    Notification.objects.filter(
-        action_content_type=reaction_ct,
-        action_object_id=instance.id,
-        notification_type='reaction'
-    ).delete()
+    log = instance.mindlog
+    if log.user_id != instance.user_id:
+        withdraw_notification(log.user_id, 'reaction', log, instance.user_id)
 
 
 @receiver(post_delete, sender=follow)
-def delete_follow_notifications(sender, instance, **kwargs):
+def delete_follow_notifications(sender, instance, origin=None, **kwargs):
     """
-    Delete notifications when someone unfollows a user
+    Withdraw the follower from the follow notification when someone unfollows a user
     """
-    # Delete the follow notification
-    # We match by recipient, actor, and notification_type since follow doesn't use action_object
-    Notification.objects.filter(
-        recipient=instance.following,
-        actor=instance.follower,
-        notification_type='follow'
-    ).delete()
+    # User deletions withdraw in bulk (hand_over_notifications)
+    if _origin_model(origin) in (User, userinfo):
+        return
+    
+    withdraw_notification(instance.following_id, 'follow', instance.follower, instance.follower_id)
+
+
+# ============= DAILY ACTIVITY SIGNALS =============
+
+@receiver(post_save, sender=Log)
+def count_log_activity(sender, instance, created, **kwargs):
+    """
+    Count a new log in the author's daily rollup and advance their streak
+    """
+    if not created:
+        return
+    
+    # Read by save_log for the streak reward
+    instance._first_log_of_day = activity.record_log_activity(instance)
 
 
 @receiver(post_delete, sender=Log)
-def delete_log_notifications(sender, instance, **kwargs):
+def uncount_log_activity(sender, instance, origin=None, **kwargs):
     """
-    Delete all notifications related to a log when it's deleted
+    Take a deleted log off the author's daily rollup
     """
-    from django.contrib.contenttypes.models import ContentType
+    # The rollup goes with a deleted user
+    if _origin_model(origin) in (User, userinfo):
+        return
     
-    # Get the ContentType for Log
-    log_ct = ContentType.objects.get_for_model(Log)
+    activity.remove_log_activity(instance)
+
+
+# ============= TIMELINE SIGNALS =============
+
+@receiver(post_save, sender=Log)
+def fan_out_log_to_timelines(sender, instance, created, **kwargs):
+    """
+    Push a new log into the home timelines of the author's network
+    """
+    if not created:
+        return
     
-    # Delete all notifications where this log is the target
-    # This includes comments, reactions, and mentions on this log
-    Notification.objects.filter(
-        target_content_type=log_ct,
-        target_object_id=instance.id
-    ).delete()
\ No newline at end of file
+    timeline.fan_out_log(instance)
+
+
+@receiver(post_save, sender=follow)
+def backfill_timelines_on_follow(sender, instance, created, **kwargs):
+    """
+    Copy recent logs of newly reachable authors into affected timelines
+    """
+    if not created:
+        return
+    
+    timeline.on_follow(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=follow)
+def evict_timelines_on_unfollow(sender, instance, **kwargs):
+    """
+    Remove logs of authors that are no longer reachable after an unfollow
+    """
+    timeline.on_unfollow(instance.follower_id, instance.following_id)
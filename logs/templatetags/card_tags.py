@@ -0,0 +1,17 @@
+from django import template
+from logs.utils.card_cache import render_log_card
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def log_card(context, log):
+    """
+    Render the cached body of a feed card for the current viewer.
+
+    Usage in template:
+        {% load card_tags %}
+        {% log_card log %}
+    """
+    request = context.get('request')
+    viewer = request.user.info if request is not None and request.user.is_authenticated else None
+    return render_log_card(log, viewer)
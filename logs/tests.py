@@ -0,0 +1,1184 @@
+import io
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from unittest import skipUnless
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from myapp.models import follow, userinfo
+from myapp.utils import presence
+from logs import signals
+from logs.models import (
+    Comment, DailyActivity, Log, LogViewImpression, LogViews, Notification, OutboxEvent, Reaction, TimelineEntry,
+)
+from logs.utils import (
+    activity, card_cache, notification_partitions, notification_stream, notifications, outbox, retention,
+    seen_filter, timeline, trending,
+)
+from logs.utils.bloom import BloomFilter
+from logs.utils.counters import COUNTER_FIELDS, adjust_log_counter, reconcile_log_counters
+from logs.utils.hydration import hydrate_feed_logs
+from logs.utils.notifications import get_notification_page, reconcile_unread_counts
+from logs.utils.outbox import drain_outbox
+from logs.utils.view_buffer import drain_log_views, flush_log_views, record_log_views
+
+
+def make_user(username):
+    user = User.objects.create_user(username, f'{username}@example.com', 'password')
+    return userinfo.objects.get_or_create(user=user)[0]
+
+
+class CoalescedNotificationTests(TestCase):
+    """Coalescing, withdrawal and hand-over of reaction/comment/follow notifications"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(4)]
+        self.log = Log.objects.create(user=self.owner, content='hello')
+
+    def run_side_effects(self):
+        """Run the outbox handlers and on-commit callbacks the request would have triggered"""
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+
+    def react(self, fan):
+        with self.captureOnCommitCallbacks(execute=True):
+            reaction = Reaction.objects.create(user=fan, mindlog=self.log, emoji='🚀')
+        self.run_side_effects()
+        return reaction
+
+    def delete(self, obj):
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.delete()
+        self.run_side_effects()
+
+    def reaction_groups(self):
+        return Notification.objects.filter(recipient=self.owner, notification_type='reaction')
+
+    def assertUnreadCount(self, expected):
+        self.assertEqual(userinfo.objects.get(pk=self.owner.pk).unread_notification_count, expected)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+    def test_reactions_coalesce_into_one_group(self):
+        for fan in self.fans:
+            self.react(fan)
+
+        group = self.reaction_groups().get()
+        self.assertEqual(group.actor_count, 4)
+        self.assertEqual(group.actor_id, self.fans[-1].pk)
+        self.assertEqual(group.recent_actor_ids, [fan.pk for fan in reversed(self.fans)])
+        self.assertUnreadCount(1)
+
+    def test_repeat_actor_is_counted_once(self):
+        first = self.react(self.fans[0])
+        self.react(self.fans[1])
+        self.delete(first)
+        self.react(self.fans[0])
+
+        group = self.reaction_groups().get()
+        self.assertEqual(group.actor_count, 2)
+        self.assertEqual(group.recent_actor_ids, [self.fans[0].pk, self.fans[1].pk])
+        self.assertUnreadCount(1)
+
+    def test_coalescing_keeps_group_position_in_pages(self):
+        other_log = Log.objects.create(user=self.owner, content='second')
+        self.react(self.fans[0])  # Group on self.log, older
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.objects.create(user=self.fans[1], mindlog=other_log, emoji='🚀')
+        self.run_side_effects()
+        older = self.reaction_groups().get(target_object_id=self.log.pk)
+        created = older.timestamp
+
+        first_page = get_notification_page(self.owner, page_size=1)
+        self.assertEqual([n.target_object_id for n in first_page['items']], [other_log.pk])
+
+        self.react(self.fans[2])  # Merges into the group not reached yet
+        second_page = get_notification_page(self.owner, cursor=first_page['next_cursor'], page_size=1)
+        self.assertEqual([n.pk for n in second_page['items']], [older.pk])
+        self.assertFalse(second_page['has_next'])
+
+        older.refresh_from_db()
+        self.assertEqual(older.timestamp, created)
+        self.assertGreater(older.last_activity, created)
+        self.assertEqual(older.actor_count, 2)
+
+    def test_withdrawal_falls_back_to_previous_actor(self):
+        reactions = [self.react(fan) for fan in self.fans[:3]]
+
+        self.delete(reactions[2])
+        group = self.reaction_groups().get()
+        self.assertEqual(group.actor_count, 2)
+        self.assertEqual(group.actor_id, self.fans[1].pk)
+        self.assertEqual(group.recent_actor_ids, [self.fans[1].pk, self.fans[0].pk])
+        self.assertUnreadCount(1)
+
+        for reaction in reactions[:2]:
+            self.delete(reaction)
+        self.assertFalse(self.reaction_groups().exists())
+        self.assertUnreadCount(0)
+
+    def test_comment_withdrawn_with_last_top_level_comment(self):
+        comments = []
+        for fan in (self.fans[0], self.fans[0], self.fans[1]):
+            with self.captureOnCommitCallbacks(execute=True):
+                comments.append(Comment.objects.create(user=fan, mindlog=self.log, content='nice'))
+            self.run_side_effects()
+        groups = Notification.objects.filter(recipient=self.owner, notification_type='comment')
+        self.assertEqual(groups.get().actor_count, 2)
+
+        self.delete(comments[0])  # fan0 still has a comment on the log
+        self.assertEqual(groups.get().actor_count, 2)
+        self.delete(comments[1])
+        self.assertEqual(groups.get().actor_count, 1)
+        self.assertEqual(groups.get().recent_actor_ids, [self.fans[1].pk])
+        self.assertUnreadCount(1)
+
+    def test_unfollow_withdraws_follower(self):
+        follows = []
+        for fan in self.fans[:2]:
+            with self.captureOnCommitCallbacks(execute=True):
+                follows.append(follow.objects.create(follower=fan, following=self.owner))
+            self.run_side_effects()
+
+        self.delete(follows[1])
+        group = Notification.objects.get(recipient=self.owner, notification_type='follow')
+        self.assertEqual(group.actor_count, 1)
+        self.assertEqual(group.actor_id, self.fans[0].pk)
+        self.assertEqual(group.target_object_id, self.fans[0].pk)
+        self.assertUnreadCount(1)
+
+    def test_user_deletion_hands_over_groups(self):
+        for fan in self.fans[:3]:
+            self.react(fan)
+        original = self.reaction_groups().get()
+        timestamp = timezone.now() - timedelta(hours=3)
+        Notification.objects.filter(pk=original.pk).update(timestamp=timestamp)
+
+        self.delete(self.fans[2].user)
+        group = self.reaction_groups().get()
+        self.assertNotEqual(group.pk, original.pk)
+        self.assertEqual(group.actor_count, 2)
+        self.assertEqual(group.actor_id, self.fans[1].pk)
+        self.assertEqual(group.recent_actor_ids, [self.fans[1].pk, self.fans[0].pk])
+        self.assertEqual(group.timestamp, timestamp)
+        self.assertUnreadCount(1)
+
+    def test_user_deletion_decrements_groups_counting_them(self):
+        for fan in self.fans[:3]:
+            self.react(fan)
+
+        self.delete(self.fans[0].user)
+        group = self.reaction_groups().get()
+        self.assertEqual(group.actor_count, 2)
+        self.assertEqual(group.actor_id, self.fans[2].pk)
+        self.assertEqual(group.recent_actor_ids, [self.fans[2].pk, self.fans[1].pk])
+        self.assertUnreadCount(1)
+
+
+class NotificationStreamTests(TestCase):
+    """Notification and unread events of the SSE stream"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(3)]
+        self.log = Log.objects.create(user=self.owner, content='hello')
+
+    def react(self, fan):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.objects.create(user=fan, mindlog=self.log, emoji='🚀')
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+
+    def test_new_and_merged_notifications_are_sent_once(self):
+        self.react(self.fans[0])
+        sent = notification_stream._recent_notifications(self.owner.pk)
+        count, changed = notification_stream._read_state(self.owner.pk, sent)
+        self.assertEqual((count, changed), (1, []))  # Already on the page when the stream opened
+
+        self.react(self.fans[1])
+        count, changed = notification_stream._read_state(self.owner.pk, sent)
+        self.assertEqual(count, 1)
+        self.assertEqual([(n['type'], n['actor'], n['actor_count']) for n in changed], [('reaction', 'fan1', 2)])
+        self.assertIn(f'data-notification-id="{changed[0]["id"]}"', changed[0]['html'])
+        self.assertEqual(notification_stream._read_state(self.owner.pk, sent), (1, []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.objects.create(follower=self.fans[2], following=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+        count, changed = notification_stream._read_state(self.owner.pk, sent)
+        self.assertEqual(count, 2)
+        self.assertEqual([n['type'] for n in changed], ['follow'])
+
+    def test_merge_wakes_open_streams(self):
+        self.react(self.fans[0])
+        with mock.patch.object(notifications, 'publish_notification_event') as publish:
+            self.react(self.fans[1])
+        publish.assert_called_with(self.owner.pk)
+
+
+class NotificationPartitionTests(TestCase):
+    """Opt-in monthly partitioning of the Notification table"""
+
+    def test_conversion_needs_postgres(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('Only checks the refusal on other databases')
+        self.assertFalse(notification_partitions.is_partitioned())
+        with self.assertRaises(ValueError):
+            notification_partitions.convert_to_partitioned()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Notification partitioning needs PostgreSQL')
+class PostgresNotificationPartitionTests(TestCase):
+    """Conversion, monthly partitions and dropping expired months (DDL rolls back with the test)"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(2)]
+        self.log = Log.objects.create(user=self.owner, content='hello')
+        for fan in self.fans:
+            with self.captureOnCommitCallbacks(execute=True):
+                follow.objects.create(follower=fan, following=self.owner)
+                Comment.objects.create(user=fan, mindlog=self.log, content='nice')
+            with self.captureOnCommitCallbacks(execute=True):
+                drain_outbox()
+        # One unread notification from five months ago
+        self.old = Notification.objects.filter(recipient=self.owner, notification_type='follow').get()
+        old_month = notification_partitions._add_months(notification_partitions._current_month(), -5)
+        Notification.objects.filter(pk=self.old.pk).update(
+            timestamp=datetime(old_month.year, old_month.month, 2, tzinfo=dt_timezone.utc)
+        )
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)",
+                [Notification._meta.db_table],
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_convert_keeps_rows_and_orm_access(self):
+        before = sorted(Notification.objects.values_list('id', 'recipient_id', 'notification_type', 'actor_count'))
+
+        copied = notification_partitions.convert_to_partitioned(months_ahead=1)
+        self.assertEqual(copied, len(before))
+        self.assertTrue(notification_partitions.is_partitioned())
+        self.assertEqual(notification_partitions.convert_to_partitioned(), 0)  # Already partitioned
+        self.assertEqual(
+            sorted(Notification.objects.values_list('id', 'recipient_id', 'notification_type', 'actor_count')),
+            before,
+        )
+        month = notification_partitions._current_month()
+        self.assertTrue({
+            notification_partitions._partition_name(month),
+            notification_partitions._partition_name(notification_partitions._add_months(month, 1)),
+            notification_partitions._partition_name(notification_partitions._add_months(month, -5)),
+            f'{Notification._meta.db_table}_default',
+        } <= self.partitions())
+
+        # New rows get fresh ids from the new sequence; merges still work
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.objects.create(user=self.fans[0], mindlog=self.log, emoji='🚀')
+            Reaction.objects.create(user=self.fans[1], mindlog=self.log, emoji='🚀')
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+        group = Notification.objects.get(recipient=self.owner, notification_type='reaction')
+        self.assertGreater(group.pk, max(row[0] for row in before))
+        self.assertEqual(group.actor_count, 2)
+
+    def test_ensure_and_drop_partitions(self):
+        notification_partitions.convert_to_partitioned(months_ahead=0)
+        self.assertEqual(notification_partitions.ensure_notification_partitions(months_ahead=2), 2)
+        self.assertEqual(notification_partitions.ensure_notification_partitions(months_ahead=2), 0)
+
+        dropped = notification_partitions.drop_notification_partitions(months=3)
+        self.assertIn(
+            notification_partitions._partition_name(
+                notification_partitions._add_months(notification_partitions._current_month(), -5)
+            ),
+            dropped,
+        )
+        self.assertFalse(Notification.objects.filter(pk=self.old.pk).exists())
+        # The dropped unread notification no longer counts
+        self.assertEqual(userinfo.objects.get(pk=self.owner.pk).unread_notification_count, 1)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+
+class NotificationRetentionTests(TestCase):
+    """Chunked deletion of old notifications by prune_notifications()"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        fan = make_user('fan')
+        # Comments on separate logs, so each one is its own notification
+        for i in range(4):
+            log = Log.objects.create(user=self.owner, content=f'log {i}')
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(user=fan, mindlog=log, content='nice')
+            with self.captureOnCommitCallbacks(execute=True):
+                drain_outbox()
+        notes = list(Notification.objects.filter(recipient=self.owner).order_by('id'))
+        self.assertEqual(len(notes), 4)
+        old = timezone.now() - timedelta(days=retention.RETENTION_DAYS + 1)
+        # Two old read, one old unread, one recent read
+        self.old_read = notes[:2]
+        self.old_unread, self.recent = notes[2], notes[3]
+        Notification.objects.filter(pk__in=[n.pk for n in notes[:3]]).update(timestamp=old)
+        Notification.objects.filter(pk__in=[n.pk for n in self.old_read] + [self.recent.pk]).update(is_read=True)
+        reconcile_unread_counts()
+
+    def unread_count(self):
+        return userinfo.objects.get(pk=self.owner.pk).unread_notification_count
+
+    def test_deletes_only_old_read_notifications(self):
+        deleted = retention.prune_notifications(chunk_size=1, sleep_seconds=0)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)),
+            {self.old_unread.pk, self.recent.pk},
+        )
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_deleting_unread_keeps_counter_right(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = retention.prune_notifications(read_only=False, chunk_size=2, sleep_seconds=0)
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_sleeps_between_non_empty_chunks(self):
+        with mock.patch.object(retention.time, 'sleep') as sleep:
+            retention.prune_notifications(chunk_size=1, sleep_seconds=0.5)
+
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_nothing_to_prune(self):
+        Notification.objects.update(timestamp=timezone.now())
+
+        self.assertEqual(retention.prune_notifications(sleep_seconds=0), 0)
+
+
+class TimelineTests(TestCase):
+    """Fan-out-on-write home timelines and the pull path for high-fan-out authors"""
+
+    def setUp(self):
+        cache.clear()
+        # alice -> bob -> carol, dave is outside alice's network
+        self.alice, self.bob, self.carol, self.dave = (make_user(name) for name in ('alice', 'bob', 'carol', 'dave'))
+        follow.objects.create(follower=self.alice, following=self.bob)
+        follow.objects.create(follower=self.bob, following=self.carol)
+
+    def timeline(self, user):
+        return set(TimelineEntry.objects.filter(owner=user).values_list('log_id', flat=True))
+
+    def test_new_log_reaches_followers_and_their_followers(self):
+        log = Log.objects.create(user=self.carol, content='hello')
+        self.assertIn(log.pk, self.timeline(self.bob))
+        self.assertIn(log.pk, self.timeline(self.alice))  # Friend of a friend
+        self.assertNotIn(log.pk, self.timeline(self.carol))
+        self.assertNotIn(log.pk, self.timeline(self.dave))
+
+    def test_follow_backfills_and_unfollow_evicts(self):
+        log = Log.objects.create(user=self.dave, content='hello')
+        relation = follow.objects.create(follower=self.bob, following=self.dave)
+        self.assertIn(log.pk, self.timeline(self.bob))
+        self.assertIn(log.pk, self.timeline(self.alice))
+
+        # Still reachable for alice through her own follow
+        follow.objects.create(follower=self.alice, following=self.dave)
+        relation.delete()
+        self.assertNotIn(log.pk, self.timeline(self.bob))
+        self.assertIn(log.pk, self.timeline(self.alice))
+
+    def test_rebuild_matches_fan_out(self):
+        logs = [Log.objects.create(user=author, content='hello') for author in (self.bob, self.carol, self.dave)]
+        expected = self.timeline(self.alice)
+        self.assertEqual(expected, {logs[0].pk, logs[1].pk})
+
+        TimelineEntry.objects.filter(owner=self.alice).delete()
+        self.assertEqual(timeline.rebuild_timeline(self.alice.pk), 2)
+        self.assertEqual(self.timeline(self.alice), expected)
+
+    def test_pages_follow_the_keyset_cursor(self):
+        logs = [Log.objects.create(user=self.bob, content=f'log {i}') for i in range(5)]
+        newest_first = sorted(logs, key=lambda log: (log.timestamp, log.pk), reverse=True)
+
+        first = timeline.get_timeline_logs(self.alice, limit=3)
+        last = first[-1]
+        second = timeline.get_timeline_logs(self.alice, last.timestamp, last.pk, limit=3)
+        self.assertEqual(first + second, newest_first)
+
+    def test_high_fan_out_author_is_pulled_at_read_time(self):
+        with mock.patch.object(timeline, 'PULL_FOLLOWER_THRESHOLD', 1):
+            cache.clear()
+            log = Log.objects.create(user=self.carol, content='hello')
+            self.assertNotIn(log.pk, self.timeline(self.bob))
+            self.assertIn(log, timeline.get_timeline_logs(self.bob))
+            self.assertIn(log, timeline.get_timeline_logs(self.alice))
+
+
+class FeedHydrationTests(TestCase):
+    """Card data for a page of logs in a fixed number of queries"""
+
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        self.authors = [make_user(f'author{i}') for i in range(4)]
+        follow.objects.create(follower=self.viewer, following=self.authors[0])
+        for author in self.authors:
+            log = Log.objects.create(user=author, content='hello')
+            comment = Comment.objects.create(user=self.viewer, mindlog=log, content='nice')
+            Comment.objects.create(user=author, mindlog=log, content='thanks', parent_comment=comment)
+        Reaction.objects.create(user=self.viewer, mindlog=Log.objects.get(user=self.authors[1]), emoji='💡')
+
+    def hydrated_page(self, count):
+        logs = list(Log.objects.filter(user__in=self.authors[:count]).order_by('id'))
+        with self.assertNumQueries(7):
+            hydrate_feed_logs(logs, viewer=self.viewer)
+        return logs
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.hydrated_page(2)
+        self.hydrated_page(4)
+
+    def test_cards_render_from_hydrated_data(self):
+        logs = self.hydrated_page(4)
+        with self.assertNumQueries(0):
+            self.assertEqual([log.viewer_follows_author for log in logs], [True, False, False, False])
+            self.assertEqual(
+                [getattr(log.get_user_reaction(self.viewer), 'emoji', None) for log in logs],
+                [None, '💡', None, None],
+            )
+            for log in logs:
+                self.assertEqual(log.user.user.username, f'author{self.authors.index(log.user)}')
+                top_level = [comment for comment in log.comments.all() if comment.parent_comment_id is None]
+                self.assertEqual([comment.user.user.username for comment in top_level], ['viewer'])
+                self.assertEqual([reply.content for reply in top_level[0].replies.all()], ['thanks'])
+
+    def test_anonymous_viewer_skips_viewer_queries(self):
+        logs = list(Log.objects.order_by('id'))
+        with self.assertNumQueries(5):
+            hydrate_feed_logs(logs, comments=True)
+        self.assertFalse(any(log.viewer_follows_author for log in logs))
+
+
+class EngagementCounterTests(TestCase):
+    """Denormalized reaction and comment counters on Log"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(3)]
+        self.log = Log.objects.create(user=self.owner, content='hello')
+
+    def counters(self):
+        return Log.objects.filter(pk=self.log.pk).values(*COUNTER_FIELDS).get()
+
+    def test_reactions_are_counted_per_emoji(self):
+        version = Log.objects.get(pk=self.log.pk).card_version
+        reactions = [Reaction.objects.create(user=fan, mindlog=self.log, emoji='🚀') for fan in self.fans[:2]]
+        Reaction.objects.create(user=self.fans[2], mindlog=self.log, emoji='❤️')
+        self.assertEqual(Log.objects.get(pk=self.log.pk).get_reaction_counts(), {'❤️': 1, '🚀': 2})
+        self.assertGreater(Log.objects.get(pk=self.log.pk).card_version, version)
+
+        reaction = reactions[0]
+        reaction._previous_emoji = reaction.emoji
+        reaction.emoji = '💡'
+        reaction.save()
+        reactions[1].delete()
+        self.assertEqual(Log.objects.get(pk=self.log.pk).get_reaction_counts(), {'❤️': 1, '💡': 1})
+        self.assertEqual(reconcile_log_counters(), 0)
+
+    def test_comments_and_replies_are_counted_separately(self):
+        comment = Comment.objects.create(user=self.fans[0], mindlog=self.log, content='nice')
+        for fan in self.fans[1:]:
+            Comment.objects.create(user=fan, mindlog=self.log, content='agreed', parent_comment=comment)
+        Comment.objects.create(user=self.fans[1], mindlog=self.log, content='also nice')
+        self.assertEqual(Log.objects.get(pk=self.log.pk).total_comments(), 4)
+
+        comment.delete()  # Cascades to its replies
+        counters = self.counters()
+        self.assertEqual((counters['comment_count'], counters['reply_count']), (1, 0))
+        self.assertEqual(reconcile_log_counters(), 0)
+
+    def test_counters_never_go_negative(self):
+        adjust_log_counter(self.log.pk, 'like_count', -1)
+        self.assertEqual(self.counters()['like_count'], 0)
+
+    def test_reconcile_repairs_drift(self):
+        Reaction.objects.create(user=self.fans[0], mindlog=self.log, emoji='❤️')
+        Comment.objects.create(user=self.fans[0], mindlog=self.log, content='nice')
+        Log.objects.filter(pk=self.log.pk).update(like_count=5, comment_count=0, hot_score=0)
+
+        self.assertEqual(reconcile_log_counters(), 1)
+        log = Log.objects.get(pk=self.log.pk)
+        self.assertEqual((log.like_count, log.comment_count), (1, 1))
+        self.assertGreater(log.hot_score, 0)
+        self.assertEqual(reconcile_log_counters(), 0)
+
+
+class TrendingTests(TestCase):
+    """Cached What's Hot ranking with exact engaged-user counts"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(3)]
+        self.hot = Log.objects.create(user=self.owner, content='hot')
+        self.warm = Log.objects.create(user=self.owner, content='warm')
+        self.quiet = Log.objects.create(user=self.owner, content='quiet')
+        for fan in self.fans:
+            Reaction.objects.create(user=fan, mindlog=self.hot, emoji='🚀')
+        for fan in self.fans[1:]:
+            Comment.objects.create(user=fan, mindlog=self.hot, content='wow')
+        # fan0 reacts and comments twice: still one engaged user
+        Reaction.objects.create(user=self.fans[0], mindlog=self.warm, emoji='❤️')
+        Comment.objects.create(user=self.fans[0], mindlog=self.warm, content='nice')
+        Comment.objects.create(user=self.fans[0], mindlog=self.warm, content='really')
+
+    def test_ranking_and_exact_engaged_users(self):
+        logs = trending.get_trending_logs(limit=5)
+        self.assertEqual(logs, [self.hot, self.warm])  # Logs without engagement are left out
+        self.assertEqual([log.total_engaged_users for log in logs], [3, 1])
+        self.assertEqual([log.engagement_score for log in logs], [12, 8])
+
+    def test_ranking_is_cached(self):
+        trending.get_trending_logs(limit=5)
+        Reaction.objects.create(user=self.fans[1], mindlog=self.quiet, emoji='💡')
+        self.warm.delete()
+        with self.assertNumQueries(1):
+            logs = trending.get_trending_logs(limit=5)
+        self.assertEqual(logs, [self.hot])  # Deleted logs are skipped, new engagement waits for a refresh
+
+    def test_hours_limits_log_age(self):
+        Log.objects.filter(pk=self.hot.pk).update(timestamp=timezone.now() - timedelta(hours=30))
+        self.assertEqual(trending.get_trending_logs(limit=5, hours=24), [self.warm])
+
+
+class HotScoreTests(TestCase):
+    """Stored time-decayed hot_score and the Hot feed"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(2)]
+
+    def stored(self, log):
+        return Log.objects.values_list('hot_score', flat=True).get(pk=log.pk)
+
+    def test_signals_keep_the_score_current(self):
+        log = Log.objects.create(user=self.owner, content='hello')
+        self.assertAlmostEqual(self.stored(log), trending.compute_hot_score(0, log.timestamp))
+
+        reaction = Reaction.objects.create(user=self.fans[0], mindlog=log, emoji='🚀')
+        Comment.objects.create(user=self.fans[1], mindlog=log, content='nice')
+        self.assertAlmostEqual(self.stored(log), trending.compute_hot_score(5, log.timestamp))
+
+        reaction.delete()
+        self.assertAlmostEqual(self.stored(log), trending.compute_hot_score(3, log.timestamp))
+
+    def test_newer_logs_need_less_engagement(self):
+        now = timezone.now()
+        older = trending.compute_hot_score(10, now - timedelta(seconds=trending.HOT_SCORE_DECAY_SECONDS))
+        self.assertAlmostEqual(trending.compute_hot_score(1, now), older)
+        self.assertGreater(trending.compute_hot_score(2, now), older)
+
+    def test_rebuild_and_hot_feed_pages(self):
+        logs = [Log.objects.create(user=self.owner, content=f'log {i}') for i in range(5)]
+        Reaction.objects.create(user=self.fans[0], mindlog=logs[0], emoji='🚀')
+        Log.objects.update(hot_score=0)
+        self.assertEqual(trending.rebuild_hot_scores(batch_size=2), 5)
+
+        expected = sorted(logs, key=lambda log: (self.stored(log), log.pk), reverse=True)
+        self.assertEqual(expected[0], logs[0])  # Engagement outweighs seconds of age
+        first = trending.get_hot_logs(limit=3)
+        cursor = first[-1]
+        second = trending.get_hot_logs(cursor.hot_score, cursor.pk, limit=3)
+        self.assertEqual(first + second, expected)
+
+
+class SeenFilterTests(TestCase):
+    """Bloom filter of viewed logs and unseen-first feed pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('viewer')
+        self.author = make_user('author')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        for value in range(0, 2000, 2):
+            bloom.add(value)
+        restored = BloomFilter(1000, bloom.to_bytes())
+        self.assertTrue(all(value in restored for value in range(0, 2000, 2)))
+        false_positives = sum(value in restored for value in range(1, 20000, 2))
+        self.assertLess(false_positives, 10000 * 0.03)
+
+    def test_filter_is_built_from_views_and_updated_in_place(self):
+        logs = [Log.objects.create(user=self.author, content=f'log {i}') for i in range(3)]
+        LogViews.objects.create(user=self.viewer, log=logs[0])
+        self.assertIn(logs[0].pk, seen_filter.get_seen_filter(self.viewer.pk))
+        self.assertNotIn(logs[1].pk, seen_filter.get_seen_filter(self.viewer.pk))
+
+        seen_filter.mark_logs_seen(self.viewer.pk, [logs[1].pk])
+        with self.assertNumQueries(0):
+            seen = seen_filter.get_seen_filter(self.viewer.pk)
+        self.assertIn(logs[1].pk, seen)
+        self.assertNotIn(logs[2].pk, seen)
+
+    def test_pages_put_unseen_logs_first(self):
+        start = timezone.now()
+        source = [SimpleNamespace(id=i, timestamp=start - timedelta(minutes=i)) for i in range(1, 11)]
+
+        def fetch_logs(cursor_timestamp, cursor_id, limit):
+            if cursor_id is not None:
+                return [log for log in source if log.id > cursor_id][:limit]
+            return source[:limit]
+
+        seen = {1, 2, 4}
+        page, last, has_next = seen_filter.select_feed_page(fetch_logs, seen, 3)
+        self.assertEqual([log.id for log in page], [3, 5, 6])
+        self.assertTrue(has_next)
+
+        page, last, has_next = seen_filter.select_feed_page(fetch_logs, seen, 3, last.timestamp, last.id)
+        self.assertEqual([log.id for log in page], [7, 8, 9])
+
+        # Everything seen: the page falls back to seen logs in feed order
+        page, last, has_next = seen_filter.select_feed_page(fetch_logs, set(range(1, 11)), 3)
+        self.assertEqual([log.id for log in page], [1, 2, 3])
+        self.assertEqual(last.id, 10)
+        self.assertFalse(has_next)
+
+
+class CardCacheTests(TestCase):
+    """Viewer-independent card HTML cached per log with per-viewer slots"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.fan = make_user('fan')
+        log = Log.objects.create(user=self.owner, content='hello cards')
+        Comment.objects.create(user=self.fan, mindlog=log, content='nice card')
+        Reaction.objects.create(user=self.fan, mindlog=log, emoji='🚀')
+
+    def load(self):
+        return Log.objects.select_related('user__user').get(content='hello cards')
+
+    def render(self, viewer):
+        log = self.load()
+        hydrate_feed_logs([log], viewer=viewer, comments=False)
+        card_cache.prime_log_cards([log])
+        return card_cache.render_log_card(log, viewer)
+
+    def test_shared_html_is_rendered_once(self):
+        log = self.load()
+        card_cache.prime_log_cards([log])
+        self.assertIn('nice card', log._card_html)
+
+        log = self.load()
+        with self.assertNumQueries(0):
+            card_cache.prime_log_cards([log])
+
+        # A counter change bumps card_version and forces a re-render
+        Reaction.objects.create(user=self.owner, mindlog=log, emoji='💡')
+        log = self.load()
+        with mock.patch.object(card_cache, 'render_to_string', return_value='') as render:
+            card_cache.prime_log_cards([log])
+        render.assert_called_once()
+
+    def test_slots_are_filled_per_viewer(self):
+        owner_html = self.render(self.owner)
+        fan_html = self.render(self.fan)
+        anonymous_html = self.render(None)
+        log = self.load()
+
+        for html in (owner_html, fan_html, anonymous_html):
+            self.assertNotIn('<!--slot:', html)
+        self.assertIn(f'data-log-id="{log.sig}"', owner_html)
+        self.assertNotIn(f'data-log-id="{log.sig}"', fan_html)
+        self.assertIn('deleteComment(', owner_html)  # Log owner may delete any comment
+        self.assertIn('deleteComment(', fan_html)  # Comment author
+        self.assertNotIn('deleteComment(', anonymous_html)
+        self.assertEqual(fan_html.count(card_cache.REACTION_ACTIVE_CLASSES), 1)
+        self.assertEqual(owner_html.count(card_cache.REACTION_ACTIVE_CLASSES), 0)
+
+
+class UnreadCounterTests(TestCase):
+    """Denormalized unread notification counter on userinfo"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fan = make_user('fan')
+        self.log = Log.objects.create(user=self.owner, content='hello')
+
+    def mention(self):
+        return notifications.create_notification(self.owner, self.fan, 'mentioned you in', self.log, notification_type='mention')
+
+    def unread(self):
+        return userinfo.objects.get(pk=self.owner.pk).unread_notification_count
+
+    def test_reads_and_deletes_adjust_the_counter_once(self):
+        first, second, third, fourth = (self.mention() for _ in range(4))
+        self.assertEqual(self.unread(), 4)
+
+        first.mark_as_read()
+        Notification.objects.get(pk=first.pk).mark_as_read()
+        self.assertEqual(self.unread(), 3)
+        self.assertEqual(notifications.mark_as_read([first.pk, second.pk]), 1)
+        self.assertEqual(self.unread(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()  # Already read
+            third.delete()
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(notifications.mark_all_as_read(self.owner), 1)
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+    def test_count_is_one_primary_key_read(self):
+        self.mention()
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.get_notification_count(self.owner), 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.mention()
+        userinfo.objects.filter(pk=self.owner.pk).update(unread_notification_count=7)
+        self.assertEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(self.unread(), 1)
+
+
+class MentionNotificationTests(TestCase):
+    """@mentions resolved in one query and inserted in bulk"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.friends = [make_user(f'friend{i}') for i in range(5)]
+
+    def run_side_effects(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+
+    def mentions(self, notification_type):
+        return Notification.objects.filter(notification_type=notification_type)
+
+    def test_log_mentions_are_resolved_in_one_query(self):
+        content = ' '.join(f'@{friend.user.username}' for friend in self.friends) + ' @nobody @author @friend0'
+        log = Log(user=self.author, content=content)
+        ContentType.objects.get_for_model(Log)  # Cached after the first lookup of a process
+        with self.assertNumQueries(1):
+            built = signals.build_mention_notifications(content, self.author, log)
+        self.assertEqual([n.recipient_id for n in built], [friend.pk for friend in self.friends])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Log.objects.create(user=self.author, content=content)
+        with mock.patch.object(Notification.objects, 'bulk_create', wraps=Notification.objects.bulk_create) as bulk_create:
+            self.run_side_effects()
+        bulk_create.assert_called_once()
+        self.assertEqual(
+            set(self.mentions('mention').values_list('recipient_id', flat=True)), {friend.pk for friend in self.friends}
+        )
+        self.assertEqual(userinfo.objects.get(pk=self.friends[0].pk).unread_notification_count, 1)
+
+    def test_reply_recipient_is_not_mentioned_twice(self):
+        log = Log.objects.create(user=self.author, content='hello')
+        comment = Comment.objects.create(user=self.friends[0], mindlog=log, content='first')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                user=self.friends[1], mindlog=log, parent_comment=comment, content='@friend0 @friend2 agreed',
+            )
+        self.run_side_effects()
+
+        self.assertEqual(list(self.mentions('reply').values_list('recipient_id', flat=True)), [self.friends[0].pk])
+        self.assertEqual(list(self.mentions('comment_mention').values_list('recipient_id', flat=True)), [self.friends[2].pk])
+
+
+class NotificationPageTests(TestCase):
+    """Keyset pagination of the notification list"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fan = make_user('fan')
+        self.log = Log.objects.create(user=self.owner, content='hello')
+        self.mentions = [self.mention() for _ in range(7)]
+        # Equal timestamps: the id breaks the tie
+        Notification.objects.update(timestamp=timezone.now() - timedelta(minutes=5))
+
+    def mention(self):
+        return notifications.create_notification(self.owner, self.fan, 'mentioned you in', self.log, notification_type='mention')
+
+    def all_pages(self, **kwargs):
+        ids, cursor = [], None
+        while True:
+            page = get_notification_page(self.owner, cursor=cursor, page_size=3, **kwargs)
+            ids += [n.pk for n in page['items']]
+            if not page['has_next']:
+                return ids
+            cursor = page['next_cursor']
+
+    def test_pages_cover_every_notification_once(self):
+        self.assertEqual(self.all_pages(), sorted((n.pk for n in self.mentions), reverse=True))
+
+        self.mentions[0].mark_as_read()
+        self.assertEqual(self.all_pages(unread_only=True), sorted((n.pk for n in self.mentions[1:]), reverse=True))
+
+    def test_new_notifications_do_not_shift_later_pages(self):
+        first = get_notification_page(self.owner, page_size=3)
+        self.mention()
+        second = get_notification_page(self.owner, cursor=first['next_cursor'], page_size=3)
+        self.assertEqual([n.pk for n in second['items']], [n.pk for n in reversed(self.mentions[1:4])])
+
+    def test_malformed_cursor(self):
+        for cursor in ('yesterday,3', '2025-01-01T00:00:00+00:00,x'):
+            with self.assertRaises(ValueError):
+                get_notification_page(self.owner, cursor=cursor)
+
+        self.client.force_login(self.owner.user)
+        self.addCleanup(presence._pending.clear)
+        response = self.client.get(reverse('load_more_notifications'), {'cursor': 'yesterday,3'})
+        self.assertEqual(response.status_code, 400)
+
+        cursor = get_notification_page(self.owner, page_size=3)['next_cursor']
+        response = self.client.get(reverse('load_more_notifications'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['has_more'], response.json()['next_cursor']), (False, None))
+
+
+class NotificationObjectTests(TestCase):
+    """Batched resolution of notification targets and action objects"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(2)]
+        self.logs = [Log.objects.create(user=self.owner, content=f'log {i}') for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for log in self.logs:
+                Reaction.objects.create(user=self.fans[0], mindlog=log, emoji='🚀')
+            Comment.objects.create(user=self.fans[1], mindlog=self.logs[0], content='nice')
+            follow.objects.create(follower=self.fans[1], following=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+
+    def test_one_query_per_content_type(self):
+        # Page + logs + reactions + comments + userinfo targets
+        with self.assertNumQueries(5):
+            items = get_notification_page(self.owner)['items']
+        self.assertEqual(len(items), 5)
+        with self.assertNumQueries(0):
+            for notification in items:
+                self.assertIsNotNone(notification.target)
+                if notification.notification_type in ('reaction', 'comment'):
+                    self.assertEqual(notification.target.user.user.username, 'owner')
+                    self.assertEqual(notification.action_object.mindlog_id, notification.target.pk)
+                if notification.notification_type == 'follow':
+                    self.assertEqual(notification.target.user.username, 'fan1')
+
+    def test_deleted_objects_resolve_to_none(self):
+        orphan = notifications.build_notification(
+            self.owner, self.fans[0], 'reacted to your log', self.logs[1],
+            action_object=Reaction.objects.get(mindlog=self.logs[1]), notification_type='reaction',
+        )
+        orphan.action_object_id = 999999  # Removed since
+        notifications.prefetch_notification_objects([orphan])
+        with self.assertNumQueries(0):
+            self.assertEqual(orphan.target, self.logs[1])
+            self.assertIsNone(orphan.action_object)
+
+
+class NotificationCleanupTests(TestCase):
+    """Set-based notification cleanup when logs, comments and replies are deleted"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.fans = [make_user(f'fan{i}') for i in range(6)]
+        self.log = Log.objects.create(user=self.owner, content='hello')
+
+    def commit(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = action()
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_outbox()
+        return result
+
+    def thread(self, replies):
+        comment = self.commit(lambda: Comment.objects.create(user=self.fans[0], mindlog=self.log, content='first @owner'))
+        for fan in self.fans[1:replies + 1]:
+            self.commit(lambda: Comment.objects.create(
+                user=fan, mindlog=self.log, parent_comment=comment, content='@fan5 agreed',
+            ))
+        return comment
+
+    def notification_deletes(self, comment):
+        with CaptureQueriesContext(connection) as queries:
+            self.commit(comment.delete)
+        return sum(query['sql'].startswith(f'DELETE FROM "{Notification._meta.db_table}"') for query in queries)
+
+    def test_deleting_a_thread_cleans_up_in_bulk(self):
+        small = self.notification_deletes(self.thread(replies=1))
+        self.assertFalse(Notification.objects.filter(notification_type__in=('reply', 'comment_mention')).exists())
+        self.assertFalse(Notification.objects.filter(notification_type='comment').exists())
+
+        large = self.notification_deletes(self.thread(replies=4))
+        self.assertEqual(large, small)
+        self.assertLessEqual(large, 2)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+    def test_deleting_a_log_drops_its_notifications(self):
+        self.thread(replies=2)
+        self.commit(lambda: Reaction.objects.create(user=self.fans[3], mindlog=self.log, emoji='🚀'))
+        self.assertGreater(userinfo.objects.get(pk=self.owner.pk).unread_notification_count, 0)
+
+        self.commit(self.log.delete)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(userinfo.objects.get(pk=self.owner.pk).unread_notification_count, 0)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+
+class OutboxTests(TestCase):
+    """Transactional outbox: delivery, retries with backoff and failure marking"""
+
+    def setUp(self):
+        self.owner = make_user('owner')
+        self.calls = []
+        self.failures_left = 0
+        handlers = mock.patch.dict(outbox._handlers, {'test_topic': self.handler})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def handler(self, content):
+        self.calls.append(content)
+        # Database effects of a failing attempt are rolled back with its savepoint
+        Log.objects.create(user=self.owner, content=content)
+        if self.failures_left:
+            self.failures_left -= 1
+            raise RuntimeError('temporary')
+
+    def make_due(self):
+        OutboxEvent.objects.update(available_at=timezone.now())
+
+    def test_event_is_written_with_the_transaction(self):
+        try:
+            with transaction.atomic():
+                outbox.enqueue('test_topic', content='rolled back')
+                raise RuntimeError('abort')
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        outbox.enqueue('test_topic', content='kept')
+        self.assertEqual(outbox.drain_outbox(), 1)
+        self.assertEqual(self.calls, ['kept'])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_attempt_is_retried_with_backoff(self):
+        self.failures_left = 2
+        outbox.enqueue('test_topic', content='retried')
+
+        before = timezone.now()
+        outbox.drain_outbox()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertFalse(event.failed)
+        self.assertIn('RuntimeError: temporary', event.last_error)
+        self.assertGreaterEqual(event.available_at, before + timedelta(seconds=outbox.OUTBOX_RETRY_BASE_SECONDS))
+        self.assertFalse(Log.objects.filter(content='retried').exists())
+
+        # Not due yet
+        self.assertEqual(outbox.drain_outbox(), 0)
+
+        self.make_due()
+        before = timezone.now()
+        outbox.drain_outbox()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 2)
+        self.assertGreaterEqual(event.available_at, before + timedelta(seconds=2 * outbox.OUTBOX_RETRY_BASE_SECONDS))
+
+        self.make_due()
+        outbox.drain_outbox()
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(Log.objects.filter(content='retried').count(), 1)
+
+    def test_event_is_marked_failed_after_max_attempts(self):
+        self.failures_left = 10
+        outbox.enqueue('test_topic', content='broken')
+
+        with mock.patch.object(outbox, 'OUTBOX_MAX_ATTEMPTS', 2):
+            outbox.drain_outbox()
+            self.make_due()
+            outbox.drain_outbox()
+            self.make_due()
+            self.assertEqual(outbox.drain_outbox(), 0)
+
+        event = OutboxEvent.objects.get()
+        self.assertTrue(event.failed)
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unknown_topic_counts_as_failure(self):
+        outbox.enqueue('no_such_topic')
+
+        outbox.drain_outbox()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('LookupError', event.last_error)
+
+    def test_failure_does_not_hold_back_other_events(self):
+        self.failures_left = 1
+        for i in range(5):
+            outbox.enqueue('test_topic', content=f'event {i}')
+
+        self.assertEqual(outbox.drain_outbox(batch_size=2), 5)
+
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        self.assertEqual(Log.objects.filter(content__startswith='event').count(), 4)
+
+
+class LogViewBufferTests(TestCase):
+    """Staged impressions folded into LogViews by the flusher"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user('owner')
+        self.viewer = make_user('viewer')
+        self.logs = [Log.objects.create(user=self.owner, content=f'log {i}') for i in range(3)]
+
+    def view_counts(self):
+        return dict(LogViews.objects.filter(user=self.viewer).values_list('log_id', 'view_count'))
+
+    def test_record_stages_without_touching_log_views(self):
+        log_ids = [self.logs[0].id, self.logs[1].id, self.logs[0].id]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(record_log_views(self.viewer.id, log_ids), 2)
+
+        self.assertEqual(LogViewImpression.objects.count(), 2)
+        self.assertFalse(LogViews.objects.exists())
+
+    def test_flush_folds_duplicates_into_existing_rows(self):
+        LogViews.objects.create(user=self.viewer, log=self.logs[0], view_count=3)
+        for _ in range(2):
+            record_log_views(self.viewer.id, [self.logs[0].id, self.logs[1].id])
+
+        self.assertEqual(flush_log_views(), 4)
+
+        self.assertEqual(self.view_counts(), {self.logs[0].id: 5, self.logs[1].id: 2})
+        self.assertFalse(LogViewImpression.objects.exists())
+        self.assertEqual(flush_log_views(), 0)
+
+    def test_flush_keeps_latest_view_time(self):
+        record_log_views(self.viewer.id, [self.logs[0].id])
+        record_log_views(self.viewer.id, [self.logs[0].id])
+        latest = timezone.now() + timedelta(minutes=5)
+        LogViewImpression.objects.filter(pk=LogViewImpression.objects.order_by('id').last().pk).update(viewed_at=latest)
+
+        flush_log_views()
+
+        self.assertEqual(LogViews.objects.get(user=self.viewer, log=self.logs[0]).viewed_at, latest)
+
+    def test_drain_consumes_all_batches(self):
+        for log in self.logs:
+            record_log_views(self.viewer.id, [log.id])
+        record_log_views(self.viewer.id, [self.logs[0].id])
+
+        self.assertEqual(drain_log_views(batch_size=2), 4)
+
+        self.assertEqual(self.view_counts(), {self.logs[0].id: 2, self.logs[1].id: 1, self.logs[2].id: 1})
+        self.assertFalse(LogViewImpression.objects.exists())
+
+    def test_beacon_stages_impressions(self):
+        self.client.force_login(self.viewer.user)
+        self.addCleanup(presence._pending.clear)
+
+        response = self.client.post(
+            reverse('track_batch_log_views'),
+            data={'log_sigs': [self.logs[0].sig, self.logs[1].sig, 'missing']},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.json(), {'success': True, 'total': 2})
+        self.assertEqual(LogViewImpression.objects.count(), 2)
+        self.assertFalse(LogViews.objects.exists())
+
+
+class DailyActivityTests(TestCase):
+    """Daily activity rollup and the cached streaks kept from it"""
+
+    def setUp(self):
+        self.user = make_user('writer')
+
+    def log_on(self, day, hour=12):
+        moment = datetime(day.year, day.month, day.day, hour, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            return Log.objects.create(user=self.user, content=f'log on {day}')
+
+    def streaks(self):
+        self.user.refresh_from_db()
+        return self.user.current_streak, self.user.max_streak, self.user.streak_last_date
+
+    def test_new_days_advance_the_streak(self):
+        first = self.log_on(date(2026, 3, 1))
+        self.assertTrue(first._first_log_of_day)
+        self.assertFalse(self.log_on(date(2026, 3, 1), hour=18)._first_log_of_day)
+        self.log_on(date(2026, 3, 2))
+        self.log_on(date(2026, 3, 3))
+        self.assertEqual(self.streaks(), (3, 3, date(2026, 3, 3)))
+
+        # A gap restarts the current streak and keeps the longest
+        self.log_on(date(2026, 3, 6))
+        self.assertEqual(self.streaks(), (1, 3, date(2026, 3, 6)))
+        self.assertEqual(activity.get_activity_by_date(self.user, 2026), {
+            date(2026, 3, 1): 2, date(2026, 3, 2): 1, date(2026, 3, 3): 1, date(2026, 3, 6): 1,
+        })
+        self.assertEqual(activity.get_total_activity(self.user), 5)
+
+    def test_deleting_a_day_recomputes_streaks(self):
+        logs = [self.log_on(date(2026, 3, day)) for day in (1, 2, 3, 4)]
+        extra = self.log_on(date(2026, 3, 2), hour=20)
+
+        extra.delete()
+        self.assertEqual(self.streaks(), (4, 4, date(2026, 3, 4)))
+
+        logs[1].delete()
+        self.assertEqual(self.streaks(), (2, 2, date(2026, 3, 4)))
+        self.assertFalse(DailyActivity.objects.filter(date=date(2026, 3, 2)).exists())
+
+    def test_days_follow_the_user_timezone(self):
+        self.user.timezone = 'Asia/Tokyo'
+        self.user.save()
+
+        self.log_on(date(2026, 3, 1), hour=20)  # 05:00 on March 2nd in Tokyo
+
+        self.assertEqual(activity.get_activity_by_date(self.user, 2026), {date(2026, 3, 2): 1})
+
+    def test_current_streak_expires_after_a_missed_day(self):
+        self.log_on(date(2026, 3, 1))
+        self.log_on(date(2026, 3, 2))
+        self.user.refresh_from_db()
+
+        self.assertEqual(activity.get_current_streak(self.user, date(2026, 3, 2)), 2)
+        self.assertEqual(activity.get_current_streak(self.user, date(2026, 3, 3)), 2)
+        self.assertEqual(activity.get_current_streak(self.user, date(2026, 3, 4)), 0)
+
+    def test_rebuild_restores_rollup_and_streaks(self):
+        for day in (1, 2, 3, 5):
+            self.log_on(date(2026, 3, day))
+        self.log_on(date(2026, 3, 5), hour=15)
+        expected_rows = set(DailyActivity.objects.values_list('date', 'count'))
+        expected_streaks = self.streaks()
+
+        DailyActivity.objects.all().delete()
+        userinfo.objects.update(current_streak=0, max_streak=0, streak_last_date=None)
+        call_command('rebuild_daily_activity', '--user', 'writer', stdout=io.StringIO())
+
+        self.assertEqual(set(DailyActivity.objects.values_list('date', 'count')), expected_rows)
+        self.assertEqual(self.streaks(), expected_streaks)
+        self.assertEqual(expected_streaks, (1, 3, date(2026, 3, 5)))
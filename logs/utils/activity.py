@@ -0,0 +1,209 @@
+"""
+Daily activity rollup - logs per user per local day, and cached streaks.
+
+DailyActivity holds one (user, date, count) row per day a user logged,
+dated in the user's timezone. The Log signals keep it current: a new log
+bumps its day, a deleted log takes it back off. The streak columns on
+userinfo (current_streak, max_streak, streak_last_date) advance when a new
+day appears and are recomputed from the rollup when a day disappears, so:
+
+- the streak reward after posting and the profile streaks are O(1) reads
+- the contribution heatmap reads at most one row per day of the year
+
+Rollup days keep the timezone the user had when they logged; changing the
+timezone (settings page) rebuilds that user's rollup. Run
+`python manage.py rebuild_daily_activity` to recompute everything from Log.
+"""
+import logging
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from logs.models import DailyActivity, Log
+from myapp.models import userinfo
+from myapp.timezone_utils import get_timezone
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ACTIVITY_REBUILD_BATCH_SIZE = 500  # Users rebuilt per transaction
+
+
+def local_date(user, moment):
+    """
+    Day of a moment in a user's timezone.
+
+    Args:
+        user: userinfo object
+        moment: Aware datetime (e.g. log.timestamp)
+    """
+    return moment.astimezone(get_timezone(user.timezone)).date()
+
+
+def _streak_runs(dates):
+    """
+    Streaks of ascending, distinct dates.
+
+    Returns:
+        Tuple (length of the last run, last date, longest run)
+    """
+    current = longest = 0
+    previous = None
+    for day in dates:
+        current = current + 1 if previous is not None and day == previous + timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, previous, longest
+
+
+def refresh_streaks(user_id):
+    """Recompute a user's cached streaks from their rollup (O(active days))."""
+    dates = DailyActivity.objects.filter(user_id=user_id).order_by('date').values_list('date', flat=True)
+    current, last_date, longest = _streak_runs(dates)
+    userinfo.objects.filter(pk=user_id).update(
+        current_streak=current, max_streak=longest, streak_last_date=last_date,
+    )
+
+
+def _advance_streaks(user_id, day):
+    """A user logged on a new day: extend or restart the current streak."""
+    current, longest, last_date = (
+        userinfo.objects.select_for_update()
+        .values_list('current_streak', 'max_streak', 'streak_last_date')
+        .get(pk=user_id)
+    )
+    if last_date is not None and day <= last_date:
+        # Day before the streak's end (e.g. after a timezone change)
+        refresh_streaks(user_id)
+        return
+    current = current + 1 if last_date == day - timedelta(days=1) else 1
+    userinfo.objects.filter(pk=user_id).update(
+        current_streak=current, max_streak=max(longest, current), streak_last_date=day,
+    )
+
+
+def record_log_activity(log):
+    """
+    Count a new log in its author's rollup.
+
+    Args:
+        log: Newly created Log
+
+    Returns:
+        True if it is the author's first log of that day
+    """
+    day = local_date(log.user, log.timestamp)
+    rows = DailyActivity.objects.filter(user_id=log.user_id, date=day)
+    with transaction.atomic():
+        if rows.update(count=F('count') + 1):
+            return False
+        try:
+            with transaction.atomic():
+                DailyActivity.objects.create(user_id=log.user_id, date=day, count=1)
+        except IntegrityError:
+            # Another log of the same day created the row first
+            rows.update(count=F('count') + 1)
+            return False
+        _advance_streaks(log.user_id, day)
+    return True
+
+
+def remove_log_activity(log):
+    """
+    Take a deleted log off its author's rollup (streaks are recomputed if its day empties).
+
+    Args:
+        log: Deleted Log
+    """
+    day = local_date(log.user, log.timestamp)
+    rows = DailyActivity.objects.filter(user_id=log.user_id, date=day)
+    with transaction.atomic():
+        if rows.filter(count__gt=1).update(count=F('count') - 1):
+            return
+        deleted, _ = rows.delete()
+        if deleted:
+            refresh_streaks(log.user_id)
+
+
+def get_current_streak(user, today):
+    """
+    Current streak of a user as of their local today (O(1), no queries).
+    A streak stays alive until the end of the day after its last log.
+
+    Args:
+        user: userinfo object
+        today: Today's date in the user's timezone
+    """
+    if user.streak_last_date is None or user.streak_last_date < today - timedelta(days=1):
+        return 0
+    return user.current_streak
+
+
+def get_activity_by_date(user, year):
+    """
+    Logs per local day of a user in one year (at most 366 rows).
+
+    Returns:
+        Dict of date -> count
+    """
+    return dict(
+        DailyActivity.objects.filter(user=user, date__year=year).values_list('date', 'count')
+    )
+
+
+def get_total_activity(user):
+    """Total number of logs of a user, summed from the rollup."""
+    return DailyActivity.objects.filter(user=user).aggregate(total=Sum('count'))['total'] or 0
+
+
+def _rebuild_batch(users):
+    """Recompute rollup rows and streaks of a batch of userinfo objects from Log."""
+    user_ids = [user.pk for user in users]
+    by_timezone = {}
+    for user in users:
+        by_timezone.setdefault(user.timezone, []).append(user.pk)
+
+    activity = []
+    for name, ids in by_timezone.items():
+        rows = (
+            Log.objects.filter(user_id__in=ids)
+            .annotate(day=TruncDate('timestamp', tzinfo=get_timezone(name)))
+            .values('user_id', 'day')
+            .annotate(total=Count('id'))
+            .order_by('user_id', 'day')
+        )
+        activity.extend(
+            DailyActivity(user_id=row['user_id'], date=row['day'], count=row['total']) for row in rows
+        )
+
+    dates = {user_id: [] for user_id in user_ids}
+    for row in activity:
+        dates[row.user_id].append(row.date)
+    for user in users:
+        user.current_streak, user.streak_last_date, user.max_streak = _streak_runs(sorted(dates[user.pk]))
+
+    with transaction.atomic():
+        DailyActivity.objects.filter(user_id__in=user_ids).delete()
+        DailyActivity.objects.bulk_create(activity, batch_size=1000)
+        userinfo.objects.bulk_update(users, ['current_streak', 'max_streak', 'streak_last_date'])
+
+
+def rebuild_daily_activity(queryset=None, batch_size=ACTIVITY_REBUILD_BATCH_SIZE):
+    """
+    Recompute the rollup and cached streaks of users from the Log table.
+
+    Args:
+        queryset: Optional userinfo queryset to limit the users rebuilt (default: all)
+        batch_size: Number of users rebuilt per transaction
+
+    Returns:
+        Number of users rebuilt
+    """
+    if queryset is None:
+        queryset = userinfo.objects.all()
+    users = list(queryset.only('id', 'timezone').order_by('id'))
+    for start in range(0, len(users), batch_size):
+        _rebuild_batch(users[start:start + batch_size])
+    if users:
+        logger.info(f'Rebuilt daily activity of {len(users)} users')
+    return len(users)
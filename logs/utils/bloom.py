@@ -0,0 +1,44 @@
+"""
+Minimal Bloom filter for set membership of integer IDs.
+
+Bits are stored as raw bytes so a filter can be cached as-is. Lookups may
+return false positives (at most about FALSE_POSITIVE_RATE at capacity) but
+never false negatives.
+"""
+import hashlib
+import math
+
+FALSE_POSITIVE_RATE = 0.01
+
+
+def _size_for(capacity, false_positive_rate):
+    """Optimal (bit count, hash count) for a capacity and false positive rate."""
+    bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+    hashes = max(1, int(round(bits / capacity * math.log(2))))
+    return bits, hashes
+
+
+class BloomFilter:
+    """Probabilistic set with add and membership tests."""
+
+    def __init__(self, capacity, bits=None, false_positive_rate=FALSE_POSITIVE_RATE):
+        self.bit_count, self.hash_count = _size_for(capacity, false_positive_rate)
+        byte_count = (self.bit_count + 7) // 8
+        self.bits = bytearray(bits) if bits and len(bits) == byte_count else bytearray(byte_count)
+
+    def _positions(self, value):
+        # Double hashing: h1 + i*h2 from one 128-bit digest
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def to_bytes(self):
+        return bytes(self.bits)
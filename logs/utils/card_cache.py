@@ -0,0 +1,116 @@
+"""
+Feed card fragment cache - viewer-independent card HTML cached per log.
+
+Most of a feed card (author block, content with mentions, snapshot, code,
+link, reaction counts and the comment thread) looks the same to everyone.
+That part is rendered once from myapp/feed_card.html and cached under the
+log's id and card_version (bumped by counter changes and edits) plus the
+author's updated_at. The few viewer-specific bits are left as
+<!--slot:...--> markers and filled in per request by render_log_card():
+
+- timesince:<epoch>                     relative times ("5 minutes")
+- log-actions                           delete button for the author
+- reaction:<emoji>                      highlight of the viewer's own reaction
+- comment-actions:<comment id>:<user>   delete button for comment/log owner
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from django.utils.timesince import timesince
+from logs.utils.hydration import prefetch_comment_threads
+
+# Configuration
+CARD_CACHE_TTL = 3600  # Cards also age out (comment authors' avatars are not versioned)
+
+SLOT_PATTERN = re.compile(r'<!--slot:(.*?)-->')
+
+REACTION_ACTIVE_CLASSES = 'bg-blue-500/10 text-blue-400 border border-blue-500/30'
+REACTION_INACTIVE_CLASSES = (
+    'bg-[#0d1117] text-gray-500 border border-[#21262d] hover:border-gray-600 hover:text-gray-300'
+)
+LOG_DELETE_BUTTON = (
+    '<button class="delete-log-btn text-gray-500 hover:text-red-400 transition-colors p-1" data-log-id="{}">\n'
+    '            <i class="fa fa-trash text-xs"></i>\n'
+    '        </button>'
+)
+COMMENT_DELETE_BUTTON = (
+    '<button onclick="deleteComment({}, \'{}\')" \n'
+    '                    class="text-gray-500 hover:text-red-400 transition-colors opacity-100 md:opacity-0 '
+    'md:group-hover/parent:opacity-100 md:group-hover/reply:opacity-100 p-1">\n'
+    '                <i class="fa fa-trash text-xs"></i>\n'
+    '            </button>'
+)
+
+
+def card_cache_key(log):
+    return f'log_card:{log.id}:{log.card_version}:{log.user.updated_at.timestamp()}'
+
+
+def prime_log_cards(logs):
+    """
+    Load the cached shared HTML for a page of logs, rendering and caching misses.
+    Comment threads are only prefetched for the logs that have to be rendered.
+
+    Args:
+        logs: List of Log objects (with user loaded)
+
+    Returns:
+        The same list, with log._card_html set
+    """
+    logs = list(logs)
+    keys = {log.id: card_cache_key(log) for log in logs}
+    cached = cache.get_many(keys.values())
+
+    missing = [log for log in logs if keys[log.id] not in cached]
+    if missing:
+        prefetch_comment_threads(missing)
+        rendered = {
+            keys[log.id]: render_to_string('myapp/feed_card.html', {'log': log})
+            for log in missing
+        }
+        cache.set_many(rendered, CARD_CACHE_TTL)
+        cached.update(rendered)
+
+    for log in logs:
+        log._card_html = cached[keys[log.id]]
+    return logs
+
+
+def render_log_card(log, viewer=None):
+    """
+    Render a log's card body for one viewer from the cached shared HTML.
+
+    Args:
+        log: Log object (ideally primed by prime_log_cards and hydrated with
+            hydrate_feed_logs, so the viewer's reaction is in memory)
+        viewer: userinfo object of the viewing user, or None if anonymous
+
+    Returns:
+        Safe HTML string
+    """
+    if not hasattr(log, '_card_html'):
+        prime_log_cards([log])
+
+    viewer_id = viewer.id if viewer is not None else None
+    viewer_reaction = log.get_user_reaction(viewer) if viewer is not None else None
+    viewer_emoji = viewer_reaction.emoji if viewer_reaction else None
+
+    def fill_slot(match):
+        name, _, args = match.group(1).partition(':')
+        if name == 'timesince':
+            return timesince(datetime.fromtimestamp(int(args), tz=dt_timezone.utc))
+        if name == 'log-actions':
+            return format_html(LOG_DELETE_BUTTON, log.sig) if viewer_id == log.user_id else ''
+        if name == 'reaction':
+            return REACTION_ACTIVE_CLASSES if args == viewer_emoji else REACTION_INACTIVE_CLASSES
+        if name == 'comment-actions':
+            comment_id, _, comment_user_id = args.partition(':')
+            if viewer_id is not None and viewer_id in (int(comment_user_id), log.user_id):
+                return format_html(COMMENT_DELETE_BUTTON, int(comment_id), log.sig)
+            return ''
+        return ''
+
+    return mark_safe(SLOT_PATTERN.sub(fill_slot, log._card_html))
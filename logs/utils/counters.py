@@ -0,0 +1,102 @@
+"""
+Engagement counters - denormalized reaction/comment counts on Log.
+
+The counter columns are kept current by the signals in logs/signals.py with
+atomic F() updates. reconcile_log_counters() recomputes them from the
+Reaction and Comment tables to repair drift (e.g. bulk deletes that bypass
+signals), refreshing hot_score for the logs it corrects.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from logs.models import Comment, Log, Reaction
+from logs.utils.trending import compute_hot_score
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = list(Log.REACTION_COUNT_FIELDS.values()) + ['comment_count', 'reply_count']
+
+
+def adjust_log_counter(log_id, field, delta):
+    """
+    Atomically add delta to one counter column of a log.
+    Decrements never go below zero. The log's card_version is bumped so its
+    cached feed card is re-rendered.
+
+    Args:
+        log_id: ID of the Log
+        field: Counter column name (see COUNTER_FIELDS)
+        delta: +1 or -1
+    """
+    logs = Log.objects.filter(pk=log_id)
+    if delta < 0:
+        logs = logs.filter(**{f'{field}__gte': -delta})
+    logs.update(**{field: F(field) + delta, 'card_version': F('card_version') + 1})
+
+
+def _count_subquery(model, **filters):
+    """Correlated COUNT(*) subquery over a model's rows for the outer log."""
+    rows = (
+        model.objects.filter(mindlog=OuterRef('pk'), **filters)
+        .order_by()
+        .values('mindlog')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def reconcile_log_counters(queryset=None, batch_size=1000):
+    """
+    Recompute counter columns from the source tables and fix rows that drifted.
+
+    Args:
+        queryset: Optional Log queryset to limit the logs checked (default: all)
+        batch_size: Number of logs checked per query
+
+    Returns:
+        Number of logs whose counters were corrected
+    """
+    if queryset is None:
+        queryset = Log.objects.all()
+
+    actual = {
+        f'actual_{field}': _count_subquery(Reaction, emoji=emoji)
+        for emoji, field in Log.REACTION_COUNT_FIELDS.items()
+    }
+    actual['actual_comment_count'] = _count_subquery(Comment, parent_comment__isnull=True)
+    actual['actual_reply_count'] = _count_subquery(Comment, parent_comment__isnull=False)
+
+    drifted = Q()
+    for field in COUNTER_FIELDS:
+        drifted |= ~Q(**{field: F(f'actual_{field}')})
+
+    fixed = 0
+    last_id = 0
+    while True:
+        batch_ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch_ids:
+            break
+        last_id = batch_ids[-1]
+
+        to_fix = list(
+            Log.objects.filter(pk__in=batch_ids)
+            .annotate(**actual)
+            .filter(drifted)
+            .only('pk', 'timestamp', 'card_version', *COUNTER_FIELDS)
+        )
+        for log in to_fix:
+            for field in COUNTER_FIELDS:
+                setattr(log, field, getattr(log, f'actual_{field}'))
+            engagement_score = log.total_reactions() * 2 + log.comment_count * 3 + log.reply_count * 3
+            log.hot_score = compute_hot_score(engagement_score, log.timestamp)
+            log.card_version += 1
+        if to_fix:
+            Log.objects.bulk_update(to_fix, COUNTER_FIELDS + ['hot_score', 'card_version'])
+            fixed += len(to_fix)
+
+    if fixed:
+        logger.info(f'Reconciled engagement counters on {fixed} logs')
+    return fixed
@@ -0,0 +1,79 @@
+"""
+Feed card hydration - attach everything a log card renders in a fixed number of queries.
+
+Log cards (feed_items.html, personal_log_cards.html) show the viewer's own
+reaction, the author follow state and the full comment thread (reaction and
+comment counts are columns on Log). Rendered naively that is several queries
+per card; hydrate_feed_logs() loads the same data for a whole page at once.
+"""
+from django.db.models import Prefetch, prefetch_related_objects
+from logs.models import Comment, Reaction
+from myapp.models import follow
+
+
+def prefetch_comment_threads(logs):
+    """Prefetch top-level comments and replies with their authors for a list of logs."""
+    # comment_item.html renders reply.replies too (always empty, replies are flattened)
+    replies_queryset = Comment.objects.select_related('user__user').prefetch_related('replies')
+    prefetch_related_objects(
+        logs,
+        Prefetch(
+            'comments',
+            queryset=Comment.objects.select_related('user__user', 'parent_comment').prefetch_related(
+                Prefetch('replies', queryset=replies_queryset)
+            ),
+        ),
+    )
+
+
+def hydrate_feed_logs(logs, viewer=None, comments=True):
+    """
+    Attach card data to a page of logs.
+
+    After hydration these calls are served from memory:
+    - log.get_user_reaction(viewer)
+    - log.comments.all / comment.replies.all (with authors)
+    - log.viewer_follows_author
+
+    Args:
+        logs: List of Log objects (one page of a feed)
+        viewer: userinfo object of the viewing user, or None if anonymous
+        comments: Prefetch comment threads (False when cached cards are used,
+            see logs.utils.card_cache.prime_log_cards)
+
+    Returns:
+        The same list, for chaining
+    """
+    logs = list(logs)
+    if not logs:
+        return logs
+
+    log_ids = [log.id for log in logs]
+
+    # Authors (no-op for logs already loaded with select_related)
+    prefetch_related_objects(logs, 'user__user')
+
+    # Comment threads: top-level comments and replies with their authors
+    if comments:
+        prefetch_comment_threads(logs)
+
+    # Viewer's own reactions and follow state
+    viewer_reactions = {}
+    followed_author_ids = set()
+    if viewer is not None:
+        viewer_reactions = {
+            reaction.mindlog_id: reaction
+            for reaction in Reaction.objects.filter(mindlog_id__in=log_ids, user=viewer)
+        }
+        followed_author_ids = set(
+            follow.objects.filter(
+                follower=viewer,
+                following_id__in={log.user_id for log in logs},
+            ).values_list('following_id', flat=True)
+        )
+
+    for log in logs:
+        log._viewer_reaction = (viewer.id if viewer is not None else None, viewer_reactions.get(log.id))
+        log.viewer_follows_author = log.user_id in followed_author_ids
+
+    return logs
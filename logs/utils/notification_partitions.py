@@ -0,0 +1,228 @@
+"""
+Optional monthly partitioning of the Notification table (PostgreSQL only).
+
+convert_to_partitioned() rebuilds logs_notification once as a table
+partitioned by RANGE ("timestamp"), with one partition per calendar month
+(logs_notification_pYYYYMM) plus a DEFAULT partition for anything outside
+the prepared months. The ORM and every query keep working unchanged: the
+parent keeps the table name, columns, indexes and foreign keys. Postgres
+requires the partition key in the primary key, so it becomes (id, timestamp);
+ids still come from one sequence and stay unique. A notification's timestamp
+never changes after the insert (merges into a coalesced group bump
+last_activity instead), so rows never move between partitions.
+
+After conversion:
+- ensure_notification_partitions() prepares the coming months (run monthly)
+- drop_notification_partitions() detaches and drops whole months that are
+  past retention, which is instant compared to deleting their rows
+
+Partitioning is opt-in: nothing changes until `python manage.py
+partition_notifications --convert` is run (see README, "Notification
+retention"). After that, `python manage.py partition_notifications` must run
+monthly - a month without its own partition falls into the DEFAULT
+partition, and that month's partition can then no longer be created - and
+`python manage.py prune_notifications --drop-months N` drops old months.
+"""
+import logging
+from datetime import date
+from django.db import connection, transaction
+from django.utils import timezone
+from logs.models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PARTITION_MONTHS_AHEAD = 2  # Empty partitions kept ready for the coming months
+
+
+def _table():
+    return Notification._meta.db_table
+
+
+def _partition_name(month):
+    return f'{_table()}_p{month:%Y%m}'
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _current_month():
+    today = timezone.now().date()
+    return date(today.year, today.month, 1)
+
+
+def is_partitioned():
+    """True if the Notification table is a partitioned Postgres table."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [_table()],
+        )
+        return cursor.fetchone()[0]
+
+
+def _create_partition(cursor, month):
+    """Create the partition of one month; returns False if it already exists."""
+    name = _partition_name(month)
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    if cursor.fetchone()[0]:
+        return False
+    cursor.execute(
+        f'CREATE TABLE {connection.ops.quote_name(name)} PARTITION OF {connection.ops.quote_name(_table())} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    )
+    return True
+
+
+def ensure_notification_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Create the partitions of the current month and the next `months_ahead` months.
+
+    Returns:
+        Number of partitions created
+    """
+    created = 0
+    month = _current_month()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            created += _create_partition(cursor, _add_months(month, offset))
+    return created
+
+
+def convert_to_partitioned(months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Rebuild the Notification table as a monthly partitioned table (one-time).
+
+    Runs in one transaction holding an exclusive lock on the table while the
+    rows are copied, so schedule it in a quiet period.
+
+    Returns:
+        Number of notifications copied
+
+    Raises:
+        ValueError: If the database is not PostgreSQL
+    """
+    if connection.vendor != 'postgresql':
+        raise ValueError('Notification partitioning needs PostgreSQL')
+    if is_partitioned():
+        return 0
+
+    table = _table()
+    legacy = f'{table}_legacy'
+    sequence = f'{table}_partitioned_id_seq'
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Deferred foreign key checks still pending on the table would block dropping it
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(f'LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE')
+
+        # Indexes and foreign keys to recreate on the partitioned table (not the primary key)
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s
+              AND indexname NOT IN (
+                  SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u')
+              )
+            """,
+            [table, table],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp"), max(id) FROM {qn(table)}')
+        oldest, max_id = cursor.fetchone()
+
+        # Same columns, defaults and checks; ids from a plain sequence
+        # (identity columns on partitioned tables need PostgreSQL 17)
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, "timestamp")')
+        cursor.execute(f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id')
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max_id or 1])
+
+        # Monthly partitions from the oldest notification on, plus a catch-all
+        month = _current_month()
+        first_month = date(oldest.year, oldest.month, 1) if oldest else month
+        while first_month <= _add_months(month, months_ahead):
+            _create_partition(cursor, first_month)
+            first_month = _add_months(first_month, 1)
+        cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+        copied = cursor.rowcount
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+
+        # The legacy table's index and constraint names are free again
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+    logger.info(f'Partitioned {table} by month ({copied} notifications copied)')
+    return copied
+
+
+def drop_notification_partitions(months):
+    """
+    Detach and drop the monthly partitions that ended more than `months` months ago.
+
+    Drops unread notifications too, so the unread counters of their
+    recipients are reconciled afterwards.
+
+    Args:
+        months: Number of whole months to keep before the current one
+
+    Returns:
+        List of dropped partition names
+    """
+    from myapp.models import userinfo
+    from logs.utils.notifications import reconcile_unread_counts
+
+    if not is_partitioned():
+        return []
+
+    qn = connection.ops.quote_name
+    cutoff = _add_months(_current_month(), -months)
+    prefix = f'{_table()}_p'
+    dropped = []
+    recipient_ids = set()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [_table()],
+        )
+        for (name,) in cursor.fetchall():
+            suffix = name[len(prefix):]
+            if not name.startswith(prefix) or not suffix.isdigit():
+                continue  # Default partition
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            if _add_months(month, 1) > cutoff:
+                continue
+
+            cursor.execute(f'SELECT DISTINCT recipient_id FROM {qn(name)} WHERE NOT is_read')
+            recipient_ids.update(row[0] for row in cursor.fetchall())
+            cursor.execute(f'ALTER TABLE {qn(_table())} DETACH PARTITION {qn(name)}')
+            cursor.execute(f'DROP TABLE {qn(name)}')
+            dropped.append(name)
+
+        if recipient_ids:
+            reconcile_unread_counts(userinfo.objects.filter(pk__in=recipient_ids))
+
+    if dropped:
+        logger.info(f'Dropped notification partitions: {", ".join(dropped)}')
+    return dropped
@@ -0,0 +1,163 @@
+"""
+Notification push channel - Server-Sent Events for notifications and unread counts.
+
+Each open stream (see myapp.views.notification_stream, served under ASGI) waits
+on an in-process wake-up event. New notifications, merges into a coalesced
+group and changes to a user's unread counter publish to the streams of this
+process as soon as the transaction commits, so lists and badges update
+instantly. The stream itself always reads the database - the unread counter
+and the notifications whose last_activity falls in the last
+STREAM_SETTLE_SECONDS - and it also checks every STREAM_POLL_SECONDS. Changes
+made by other processes, including the notifications written by the outbox
+worker (logs/utils/outbox.py), therefore arrive within STREAM_POLL_SECONDS,
+with no external broker.
+
+Reading a trailing window instead of "after the last one sent" keeps rows
+from being skipped when a transaction that started earlier commits later;
+each (id, last_activity) pair is sent once.
+"""
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.template.loader import render_to_string
+from django.utils import timezone
+from logs.models import Notification
+
+# Configuration
+STREAM_POLL_SECONDS = 5  # Database check interval without an in-process wake-up
+STREAM_KEEPALIVE_SECONDS = 15  # Comment line to keep idle connections open
+STREAM_MAX_SECONDS = 300  # Close after 5 minutes; EventSource reconnects by itself
+STREAM_RETRY_MS = 5000  # Reconnect delay sent to the browser
+STREAM_SETTLE_SECONDS = 30  # Trailing window re-read for late-committing notifications
+STREAM_BATCH_SIZE = 20  # Most notifications sent per check
+
+_subscribers = {}  # userinfo ID -> set of (event loop, asyncio.Event)
+_subscribers_lock = threading.Lock()
+
+
+def publish_notification_event(user_id):
+    """
+    Wake up this process's open streams of a user (safe to call from any thread).
+
+    Args:
+        user_id: userinfo ID whose notifications changed
+    """
+    with _subscribers_lock:
+        targets = list(_subscribers.get(user_id, ()))
+    for loop, wake_up in targets:
+        try:
+            loop.call_soon_threadsafe(wake_up.set)
+        except RuntimeError:
+            pass  # Loop already closed; the stream unsubscribes on its own
+
+
+def _subscribe(user_id):
+    subscription = (asyncio.get_running_loop(), asyncio.Event())
+    with _subscribers_lock:
+        _subscribers.setdefault(user_id, set()).add(subscription)
+    return subscription
+
+
+def _unsubscribe(user_id, subscription):
+    with _subscribers_lock:
+        subscriptions = _subscribers.get(user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscribers[user_id]
+
+
+def _recent_notifications(user_id):
+    """{id: last_activity} of the user's notifications active within the settle window."""
+    since = timezone.now() - timedelta(seconds=STREAM_SETTLE_SECONDS)
+    return dict(
+        Notification.objects.filter(recipient_id=user_id, last_activity__gte=since)
+        .values_list('id', 'last_activity')
+    )
+
+
+def _read_state(user_id, sent):
+    """
+    Current unread count and the notifications created or merged into since
+    they were last sent (sent maps id -> last_activity; updated and pruned here).
+    """
+    from myapp.models import userinfo
+    from logs.utils.notifications import prefetch_notification_objects
+
+    since = timezone.now() - timedelta(seconds=STREAM_SETTLE_SECONDS)
+    for notification_id in [i for i, last_activity in sent.items() if last_activity < since]:
+        del sent[notification_id]
+
+    count = userinfo.objects.filter(pk=user_id).values_list('unread_notification_count', flat=True).first() or 0
+    recent = (
+        Notification.objects.filter(recipient_id=user_id, last_activity__gte=since)
+        .select_related('actor__user', 'target_content_type', 'action_content_type')
+        .order_by('last_activity', 'id')[:STREAM_BATCH_SIZE + len(sent)]
+    )
+    changed = [n for n in recent if sent.get(n.id) != n.last_activity][:STREAM_BATCH_SIZE]
+    for notification in changed:
+        sent[notification.id] = notification.last_activity
+    return count, [_serialize_notification(n) for n in prefetch_notification_objects(changed)]
+
+
+def _serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'actor': notification.actor.user.username,
+        'actor_count': notification.actor_count,
+        'verb': notification.verb,
+        'is_read': notification.is_read,
+        'timestamp': notification.timestamp.isoformat(),
+        'last_activity': notification.last_activity.isoformat(),
+        'html': render_to_string('notifications/notification_item.html', {'notification': notification}),
+    }
+
+
+def _format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def notification_events(user_id):
+    """
+    Async generator of SSE messages for one user.
+
+    Emits `unread` ({"count": n}) on connect and whenever the count changes,
+    and `notification` (see _serialize_notification, including the rendered
+    list item) for each notification created or merged into while connected.
+    """
+    loop = asyncio.get_running_loop()
+    subscription = _subscribe(user_id)
+    wake_up = subscription[1]
+    try:
+        last_count = None
+        started = last_sent = loop.time()
+        # Notifications already active on connect are on the page the client just loaded
+        sent = await sync_to_async(_recent_notifications)(user_id)
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+
+        while loop.time() - started < STREAM_MAX_SECONDS:
+            wake_up.clear()
+            count, changed = await sync_to_async(_read_state)(user_id, sent)
+
+            for data in changed:
+                yield _format_event('notification', data)
+                last_sent = loop.time()
+            if count != last_count:
+                last_count = count
+                yield _format_event('unread', {'count': count})
+                last_sent = loop.time()
+            elif not changed and loop.time() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = loop.time()
+
+            if len(changed) == STREAM_BATCH_SIZE:
+                continue  # More waiting - read again right away
+            try:
+                await asyncio.wait_for(wake_up.wait(), STREAM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _unsubscribe(user_id, subscription)
@@ -1,16 +1,92 @@
 """
 Utility functions for notification system
+
+Notifications raised by one action are built unsaved (build_notification) and
+written together with send_notifications(), a single bulk INSERT. Reactions,
+comments and follows are coalesced into one unread row per (recipient, type,
+target) within NOTIFICATION_COALESCE_WINDOW ("alice and 12 others reacted to
+your log"); withdraw_notification() takes an actor back out.
+
+Each recipient's unread count is denormalized on userinfo.unread_notification_count.
+Single saves and deletions are counted by the signals in logs/signals.py;
+send_notifications() and the mark-read helpers below adjust it for the rows
+they write. reconcile_unread_counts()
+repairs drift. Every counter change and every merge into a group wakes the
+recipient's open notification streams (logs/utils/notification_stream.py).
 """
-from django.db.models import Q, Prefetch
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.contenttypes.models import ContentType
 from logs.models import Notification
+from logs.utils.notification_stream import publish_notification_event
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import logging
 
+logger = logging.getLogger(__name__)
 
-def create_notification(recipient, actor, verb, target, action_object=None, notification_type=''):
+# Configuration
+# Related objects loaded along with each generic target/action object type
+NOTIFICATION_OBJECT_RELATED = {
+    ('logs', 'log'): ('user__user',),
+    ('logs', 'comment'): ('user__user',),
+    ('myapp', 'userinfo'): ('user',),
+}
+NOTIFICATION_COALESCE_WINDOW = timedelta(hours=24)  # Merge into an unread group active this recently
+NOTIFICATION_RECENT_ACTORS = 10  # Actor IDs remembered per group (for withdrawals)
+NOTIFICATION_PAGE_SIZE = 20
+
+
+def adjust_unread_count(recipient_id, delta):
     """
-    Generic notification creator
+    Atomically add delta to a user's unread notification counter (never below zero).
+    
+    Args:
+        recipient_id: userinfo ID
+        delta: Positive or negative change
+    """
+    adjust_unread_counts([recipient_id], delta)
+
+
+def adjust_unread_counts(recipient_ids, delta):
+    """
+    Add the same delta to several users' unread counters with one UPDATE.
+    
+    Args:
+        recipient_ids: Iterable of userinfo IDs
+        delta: Positive or negative change
+    """
+    from myapp.models import userinfo
+    
+    recipient_ids = list(recipient_ids)
+    userinfo.objects.filter(pk__in=recipient_ids).update(
+        unread_notification_count=Greatest(F('unread_notification_count') + delta, Value(0))
+    )
+    publish_on_commit(recipient_ids)
+
+
+def publish_on_commit(recipient_ids):
+    """
+    Wake the recipients' open notification streams once the current transaction
+    commits, so they read the change (new or merged notifications, unread counts).
+    
+    Args:
+        recipient_ids: Iterable of userinfo IDs
+    """
+    recipient_ids = list(recipient_ids)
+    
+    def publish():
+        for recipient_id in recipient_ids:
+            publish_notification_event(recipient_id)
+    transaction.on_commit(publish)
+
+
+def build_notification(recipient, actor, verb, target, action_object=None, notification_type=''):
+    """
+    Build an unsaved notification (insert it with send_notifications)
     
     Args:
         recipient: userinfo object who receives the notification
@@ -21,7 +97,7 @@ def create_notification(recipient, actor, verb, target, action_object=None, noti
         notification_type: Type from NOTIFICATION_TYPES choices
     
     Returns:
-        Notification object
+        Unsaved Notification object
     """
     target_ct = ContentType.objects.get_for_model(target)
     
@@ -31,7 +107,7 @@ def create_notification(recipient, actor, verb, target, action_object=None, noti
         action_ct = ContentType.objects.get_for_model(action_object)
         action_id = action_object.pk
     
-    return Notification.objects.create(
+    return Notification(
         recipient=recipient,
         actor=actor,
         verb=verb,
@@ -39,8 +115,303 @@ def create_notification(recipient, actor, verb, target, action_object=None, noti
         target_object_id=target.pk,
         action_content_type=action_ct,
         action_object_id=action_id,
-        notification_type=notification_type
+        notification_type=notification_type,
+        recent_actor_ids=[actor.pk]
+    )
+
+
+def _group_filter(recipient_id, notification_type, target_ct_id, target_id):
+    """Rows of one coalescing group: (recipient, type, target), or (recipient, type) for follows"""
+    lookup = {'recipient_id': recipient_id, 'notification_type': notification_type}
+    if notification_type != 'follow':
+        lookup.update(target_content_type_id=target_ct_id, target_object_id=target_id)
+    return Notification.objects.filter(**lookup)
+
+
+def coalesce_notification(notification):
+    """
+    Merge a new notification into the recipient's matching unread group, if any
+    
+    The group's actor and action object move to the new event, and the actor is
+    counted once (repeat actions by the same actor don't inflate the count).
+    Only last_activity is bumped: timestamp is the list's (timestamp, id) keyset
+    cursor, so a group keeps its place instead of reappearing above a page the
+    reader already scrolled past.
+    
+    Args:
+        notification: Unsaved Notification of a type in Notification.COALESCED_TYPES
+    
+    Returns:
+        The updated group Notification, or None if there is no group to merge into
+    """
+    group = (
+        _group_filter(
+            notification.recipient_id, notification.notification_type,
+            notification.target_content_type_id, notification.target_object_id
+        )
+        .select_for_update()
+        .filter(is_read=False, last_activity__gte=timezone.now() - NOTIFICATION_COALESCE_WINDOW)
+        .order_by('-last_activity')
+        .first()
+    )
+    if group is None:
+        return None
+    
+    actor_ids = group.recent_actor_ids or [group.actor_id]
+    if notification.actor_id not in actor_ids and group.actor_id != notification.actor_id:
+        group.actor_count += 1
+    group.recent_actor_ids = (
+        [notification.actor_id] + [i for i in actor_ids if i != notification.actor_id]
+    )[:NOTIFICATION_RECENT_ACTORS]
+    group.actor_id = notification.actor_id
+    group.verb = notification.verb
+    group.target_content_type_id = notification.target_content_type_id
+    group.target_object_id = notification.target_object_id
+    group.action_content_type_id = notification.action_content_type_id
+    group.action_object_id = notification.action_object_id
+    group.last_activity = timezone.now()
+    group.save(update_fields=[
+        'actor_count', 'recent_actor_ids', 'actor', 'verb', 'target_content_type', 'target_object_id',
+        'action_content_type', 'action_object_id', 'last_activity',
+    ])
+    # The unread count doesn't change, but open streams show the merged group
+    publish_on_commit([group.recipient_id])
+    return group
+
+
+def _remove_actor(group, actor_id):
+    """
+    Take one actor out of a coalesced group that still has other actors (in memory).
+    
+    Returns:
+        List of changed fields, or None if the actor is the group's only one
+    """
+    remaining = [i for i in (group.recent_actor_ids or [group.actor_id]) if i != actor_id]
+    if group.actor_count <= 1 or not remaining:
+        return None
+    
+    group.actor_count -= 1
+    group.recent_actor_ids = remaining
+    update_fields = ['actor_count', 'recent_actor_ids']
+    if group.actor_id == actor_id:
+        # The withdrawn action was the one displayed; show the previous actor without it
+        group.actor_id = remaining[0]
+        group.action_content_type = None
+        group.action_object_id = None
+        update_fields += ['actor', 'action_content_type', 'action_object_id']
+        if group.notification_type == 'follow':
+            group.target_object_id = remaining[0]  # Follow targets are the follower's profile
+            update_fields.append('target_object_id')
+    return update_fields
+
+
+def withdraw_notification(recipient_id, notification_type, target, actor_id):
+    """
+    Take an actor back out of a notification (reaction removed, comment deleted, unfollow)
+    
+    Groups that only counted this actor are deleted; larger groups are decremented
+    and fall back to the next most recent actor. Only groups that still remember
+    the actor (the last NOTIFICATION_RECENT_ACTORS) can be corrected.
+    
+    Args:
+        recipient_id: userinfo ID of the recipient
+        notification_type: Type from NOTIFICATION_TYPES choices
+        target: The object the notification points at (the actor's profile for follows)
+        actor_id: userinfo ID of the actor to remove
+    """
+    target_ct = ContentType.objects.get_for_model(target)
+    
+    with transaction.atomic():
+        groups = (
+            _group_filter(recipient_id, notification_type, target_ct.id, target.pk)
+            .select_for_update()
+            .order_by('-last_activity')
+        )
+        for group in groups[:NOTIFICATION_RECENT_ACTORS]:
+            if actor_id in (group.recent_actor_ids or [group.actor_id]) or group.actor_id == actor_id:
+                update_fields = _remove_actor(group, actor_id)
+                if update_fields is None:
+                    group.delete()  # post_delete signal adjusts the unread counter
+                else:
+                    group.save(update_fields=update_fields)
+                return
+
+
+def hand_over_notifications(actor_id):
+    """
+    Take an actor whose account is being deleted out of coalesced groups, set-based.
+    
+    The deletion cascade removes the actor's rows and has already collected
+    the groups it is displayed on, so those are copied (shown as their previous
+    actor) before the originals go. Groups that merely count the actor (it
+    reacted, commented or followed) are decremented in one bulk update instead
+    of a withdrawal per cascaded reaction/comment/follow. The copies are bulk
+    inserted with the original timestamps; the caller reconciles unread counters.
+    
+    Args:
+        actor_id: userinfo ID of the user being deleted
+    """
+    from logs.models import Comment, Log, Reaction
+    from myapp.models import follow
+    
+    log_ct = ContentType.objects.get_for_model(Log)
+    acted_on = (
+        Q(notification_type='reaction', target_content_type=log_ct,
+          target_object_id__in=Reaction.objects.filter(user_id=actor_id).values('mindlog_id'))
+        | Q(notification_type='comment', target_content_type=log_ct,
+            target_object_id__in=Comment.objects.filter(user_id=actor_id, parent_comment__isnull=True).values('mindlog_id'))
+        | Q(notification_type='follow',
+            recipient_id__in=follow.objects.filter(follower_id=actor_id).values('following_id'))
+    )
+    
+    copies = []
+    decremented = []
+    groups = (
+        Notification.objects.filter(Q(actor_id=actor_id) | acted_on, actor_count__gt=1)
+        .exclude(recipient_id=actor_id)
     )
+    for group in groups:
+        if group.actor_id == actor_id:
+            if _remove_actor(group, actor_id) is not None:
+                group.pk = None
+                group._state.adding = True
+                copies.append(group)
+        elif actor_id in group.recent_actor_ids:
+            _remove_actor(group, actor_id)
+            decremented.append(group)
+    
+    if copies:
+        # auto_now_add stamps the copies with the current time; put the groups' times back
+        timestamps = [copy.timestamp for copy in copies]
+        Notification.objects.bulk_create(copies)
+        for copy, timestamp in zip(copies, timestamps):
+            copy.timestamp = timestamp
+        Notification.objects.bulk_update(copies, ['timestamp'])
+    if decremented:
+        Notification.objects.bulk_update(decremented, ['actor_count', 'recent_actor_ids'])
+
+
+def _deletion_cleanup(origin):
+    """
+    Cleanup accumulated over one delete operation (a cascade or QuerySet.delete()),
+    kept on the delete origin and applied once when the transaction commits
+    """
+    pending = getattr(origin, '_notification_cleanup', None)
+    if pending is None:
+        pending = {'unread': Counter(), 'action_objects': defaultdict(set)}
+        if origin is not None:
+            origin._notification_cleanup = pending
+        transaction.on_commit(lambda: _apply_deletion_cleanup(origin, pending))
+    return pending
+
+
+def _apply_deletion_cleanup(origin, pending):
+    if origin is not None:
+        origin.__dict__.pop('_notification_cleanup', None)
+    
+    with transaction.atomic():
+        for content_type_id, object_ids in pending['action_objects'].items():
+            notifications = Notification.objects.filter(
+                action_content_type_id=content_type_id, action_object_id__in=object_ids
+            )
+            notifications.exclude(notification_type__in=Notification.COALESCED_TYPES).delete()
+            # Coalesced groups still showing a deleted action keep their count but lose the quote
+            notifications.update(action_content_type=None, action_object_id=None)
+        
+        recipients_by_count = defaultdict(list)
+        for recipient_id, count in pending['unread'].items():
+            recipients_by_count[count].append(recipient_id)
+        for count, recipient_ids in recipients_by_count.items():
+            adjust_unread_counts(recipient_ids, -count)
+
+
+def defer_unread_decrement(origin, recipient_id):
+    """
+    Count a deleted unread notification against its recipient's counter.
+    All decrements of one delete operation are applied together on commit
+    (one UPDATE per distinct count).
+    
+    Args:
+        origin: The delete origin (post_delete's origin argument)
+        recipient_id: userinfo ID of the deleted notification's recipient
+    """
+    _deletion_cleanup(origin)['unread'][recipient_id] += 1
+
+
+def defer_action_object_cleanup(origin, obj):
+    """
+    Schedule removal of the notifications whose action object was deleted.
+    All objects of one delete operation are cleaned up on commit with one
+    statement per content type.
+    
+    Args:
+        origin: The delete origin (post_delete's origin argument)
+        obj: The deleted action object (e.g. a Comment)
+    """
+    content_type = ContentType.objects.get_for_model(obj)
+    _deletion_cleanup(origin)['action_objects'][content_type.id].add(obj.pk)
+
+
+def send_notifications(notifications):
+    """
+    Insert a batch of notifications with one bulk INSERT
+    
+    Reactions, comments and follows are first merged into the recipient's
+    open group (see coalesce_notification) and only start a new row when
+    there is none. bulk_create skips post_save, so the recipients' unread
+    counters are adjusted here instead of by the signal (one UPDATE per
+    distinct count, usually a single one).
+    
+    Args:
+        notifications: Iterable of unsaved Notification objects
+    
+    Returns:
+        List of saved (inserted or merged) Notification objects
+    """
+    notifications = list(notifications)
+    if not notifications:
+        return []
+    
+    with transaction.atomic():
+        merged = []
+        to_insert = []
+        for notification in notifications:
+            group = None
+            if notification.notification_type in Notification.COALESCED_TYPES:
+                group = coalesce_notification(notification)
+            if group is not None:
+                merged.append(group)
+            else:
+                to_insert.append(notification)
+        
+        created = Notification.objects.bulk_create(to_insert)
+        unread = Counter(n.recipient_id for n in created if not n.is_read)
+        recipients_by_count = defaultdict(list)
+        for recipient_id, count in unread.items():
+            recipients_by_count[count].append(recipient_id)
+        for count, recipient_ids in recipients_by_count.items():
+            adjust_unread_counts(recipient_ids, count)
+    
+    return created + merged
+
+
+def create_notification(recipient, actor, verb, target, action_object=None, notification_type=''):
+    """
+    Generic notification creator
+    
+    Args:
+        recipient: userinfo object who receives the notification
+        actor: userinfo object who triggered the notification
+        verb: String describing the action
+        target: The object being acted upon
+        action_object: Optional object representing the action itself
+        notification_type: Type from NOTIFICATION_TYPES choices
+    
+    Returns:
+        Notification object (the group it was merged into, for coalesced types)
+    """
+    notification = build_notification(recipient, actor, verb, target, action_object, notification_type)
+    return send_notifications([notification])[0]
 
 
 def get_user_notifications(user, unread_only=False, notification_type=None, limit=None, page_size=None, offset=0):
@@ -69,10 +440,11 @@ def get_user_notifications(user, unread_only=False, notification_type=None, limi
         recipient=user
     ).select_related(
         'actor__user',
+        'actor__coding_style',
         'recipient__user',
         'target_content_type',
         'action_content_type'
-    ).order_by('-timestamp')
+    ).order_by('-timestamp', '-id')
     
     # Apply filters
     if unread_only:
@@ -91,6 +463,114 @@ def get_user_notifications(user, unread_only=False, notification_type=None, limi
     return notifications
 
 
+def prefetch_notification_objects(notifications):
+    """
+    Resolve the target and action_object of a list of notifications in bulk
+    
+    select_related can't follow GenericForeignKeys, so templates would run a
+    query per row for each of them. Object IDs are grouped by content type and
+    each type is loaded with one query (plus NOTIFICATION_OBJECT_RELATED), then
+    assigned to the notifications. Deleted objects resolve to None.
+    
+    Args:
+        notifications: List of Notification objects (with the content types selected)
+    
+    Returns:
+        The same list, for chaining
+    """
+    notifications = list(notifications)
+    
+    wanted = defaultdict(set)  # ContentType -> object IDs
+    for notification in notifications:
+        wanted[notification.target_content_type].add(notification.target_object_id)
+        if notification.action_content_type is not None:
+            wanted[notification.action_content_type].add(notification.action_object_id)
+    
+    objects = {}  # (content type ID, object ID) -> object
+    for content_type, object_ids in wanted.items():
+        model = content_type.model_class()
+        if model is None:
+            continue  # Stale content type of a removed model
+        related = NOTIFICATION_OBJECT_RELATED.get((content_type.app_label, content_type.model), ())
+        for obj in model._default_manager.select_related(*related).filter(pk__in=object_ids):
+            objects[(content_type.id, obj.pk)] = obj
+    
+    for notification in notifications:
+        target = objects.get((notification.target_content_type_id, notification.target_object_id))
+        Notification.target.set_cached_value(notification, target)
+        if notification.action_content_type is not None:
+            action_object = objects.get((notification.action_content_type_id, notification.action_object_id))
+            Notification.action_object.set_cached_value(notification, action_object)
+    
+    return notifications
+
+
+def parse_notification_cursor(cursor):
+    """
+    Parse a compound "timestamp,id" cursor (same format as the feed's)
+    
+    Returns:
+        (timestamp, id) tuple, or (None, None) for no cursor
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None, None
+    
+    cursor_timestamp, _, cursor_id = cursor.partition(',')
+    cursor_timestamp = parse_datetime(cursor_timestamp)
+    if cursor_timestamp is None:
+        raise ValueError(f'Invalid notification cursor: {cursor!r}')
+    return cursor_timestamp, int(cursor_id)
+
+
+def get_notification_page(user, cursor=None, page_size=NOTIFICATION_PAGE_SIZE, unread_only=False, notification_type=None):
+    """
+    One page of a user's notifications with keyset pagination
+    
+    Seeks past the (timestamp, id) of the last notification shown using the
+    (recipient, -timestamp) index, so deep pages cost the same as the first
+    and notifications arriving in between don't shift later pages. One extra
+    row is fetched to tell whether there is a next page (no COUNT query).
+    
+    Args:
+        user: User object or userinfo object
+        cursor: next_cursor of the previous page (None for the first page)
+        page_size: Number of notifications per page
+        unread_only: Boolean to filter only unread notifications
+        notification_type: Optional type filter
+    
+    Returns:
+        Dictionary with 'items', 'next_cursor', 'has_next'
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    cursor_timestamp, cursor_id = parse_notification_cursor(cursor)
+    
+    notifications = get_user_notifications(user, unread_only=unread_only, notification_type=notification_type)
+    if cursor_timestamp is not None:
+        notifications = notifications.filter(
+            Q(timestamp__lt=cursor_timestamp) |
+            Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+        )
+    
+    items = list(notifications[:page_size + 1])
+    has_next = len(items) > page_size
+    items = prefetch_notification_objects(items[:page_size])
+    
+    next_cursor = None
+    if has_next:
+        next_cursor = f"{items[-1].timestamp.isoformat()},{items[-1].id}"
+    
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_next': has_next,
+    }
+
+
 def get_notification_count(user, unread_only=True):
     """
     Get count of notifications for badge display
@@ -108,12 +588,11 @@ def get_notification_count(user, unread_only=True):
     if hasattr(user, 'info'):
         user = user.info
     
-    query = Notification.objects.filter(recipient=user)
-    
     if unread_only:
-        query = query.filter(is_read=False)
+        # Single-row primary key read of the denormalized counter
+        return userinfo.objects.filter(pk=user.pk).values_list('unread_notification_count', flat=True).first() or 0
     
-    return query.count()
+    return Notification.objects.filter(recipient=user).count()
 
 
 def mark_as_read(notification_ids):
@@ -129,10 +608,20 @@ def mark_as_read(notification_ids):
     if isinstance(notification_ids, (int, str)):
         notification_ids = [notification_ids]
     
-    return Notification.objects.filter(
-        id__in=notification_ids,
-        is_read=False
-    ).update(is_read=True)
+    with transaction.atomic():
+        # Lock the unread rows so the counters are decremented exactly once
+        unread = list(
+            Notification.objects.select_for_update()
+            .filter(id__in=notification_ids, is_read=False)
+            .values_list('id', 'recipient_id')
+        )
+        if not unread:
+            return 0
+        updated = Notification.objects.filter(id__in=[row[0] for row in unread]).update(is_read=True)
+        for recipient_id, count in Counter(recipient_id for _, recipient_id in unread).items():
+            adjust_unread_count(recipient_id, -count)
+    
+    return updated
 
 
 def mark_all_as_read(user):
@@ -151,10 +640,71 @@ def mark_all_as_read(user):
     if hasattr(user, 'info'):
         user = user.info
     
-    return Notification.objects.filter(
-        recipient=user,
-        is_read=False
-    ).update(is_read=True)
+    with transaction.atomic():
+        updated = Notification.objects.filter(
+            recipient=user,
+            is_read=False
+        ).update(is_read=True)
+        if updated:
+            adjust_unread_count(user.pk, -updated)
+    
+    return updated
+
+
+def reconcile_unread_counts(queryset=None, batch_size=1000):
+    """
+    Recompute unread notification counters from the Notification table and fix drift.
+    
+    Args:
+        queryset: Optional userinfo queryset to limit the users checked (default: all)
+        batch_size: Number of users checked per query
+    
+    Returns:
+        Number of users whose counter was corrected
+    """
+    from myapp.models import userinfo
+    
+    if queryset is None:
+        queryset = userinfo.objects.all()
+    
+    actual = Coalesce(
+        Subquery(
+            Notification.objects.filter(recipient=OuterRef('pk'), is_read=False)
+            .order_by()
+            .values('recipient')
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    
+    fixed = 0
+    last_id = 0
+    while True:
+        batch_ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch_ids:
+            break
+        last_id = batch_ids[-1]
+        
+        to_fix = list(
+            userinfo.objects.filter(pk__in=batch_ids)
+            .annotate(actual_unread=actual)
+            .exclude(unread_notification_count=F('actual_unread'))
+            .only('pk', 'unread_notification_count')
+        )
+        for user in to_fix:
+            user.unread_notification_count = user.actual_unread
+        if to_fix:
+            # bulk_update skips userinfo.save() (no location/geo_cell side effects)
+            userinfo.objects.bulk_update(to_fix, ['unread_notification_count'])
+            fixed += len(to_fix)
+    
+    if fixed:
+        logger.info(f'Reconciled unread notification counters on {fixed} users')
+    return fixed
 
 
 def group_notifications_by_date(notifications):
@@ -200,7 +750,9 @@ def group_notifications_by_date(notifications):
 def delete_old_notifications(days=30):
     """
     Delete read notifications older than specified days
-    Useful for cleanup tasks
+    Useful for cleanup tasks (scheduled as `manage.py prune_notifications`)
+    
+    Deletes in bounded id-range chunks, see logs.utils.retention.
     
     Args:
         days: Number of days to keep notifications
@@ -208,11 +760,6 @@ def delete_old_notifications(days=30):
     Returns:
         Number of notifications deleted
     """
-    cutoff_date = timezone.now() - timedelta(days=days)
-    
-    count, _ = Notification.objects.filter(
-        is_read=True,
-        timestamp__lt=cutoff_date
-    ).delete()
+    from logs.utils.retention import prune_notifications
     
-    return count
+    return prune_notifications(days=days)
@@ -0,0 +1,147 @@
+"""
+Transactional outbox - side effects of signals carried out by a local worker.
+
+Signal receivers call enqueue(topic, **payload) instead of doing slow work
+(notification fan-out, mention parsing, storage calls) inside the request.
+The event row is written in the caller's transaction, so it exists exactly
+when the write that caused it commits. `python manage.py run_outbox_worker`
+polls the table and runs the handler registered for each topic:
+
+    @outbox_handler('delete_file')
+    def delete_file(name):
+        ...
+
+Delivery is at-least-once. A batch is claimed with SELECT ... FOR UPDATE
+SKIP LOCKED (several workers can run side by side on Postgres); each handler
+runs in a savepoint and its event is deleted in the same transaction, so
+database effects and the acknowledgement commit together. A failing event is
+retried with exponential backoff and marked failed after OUTBOX_MAX_ATTEMPTS.
+Handlers must tolerate a retry and objects deleted in the meantime.
+No external broker is involved.
+
+The worker runs in its own process, so the in-process wake-ups of
+logs/utils/notification_stream.py don't reach the web processes' streams;
+they pick up the worker's notifications through their STREAM_POLL_SECONDS
+database check.
+"""
+import logging
+import time
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from logs.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OUTBOX_BATCH_SIZE = 100  # Events claimed per transaction
+OUTBOX_POLL_SECONDS = 1.0  # Idle wait before polling again
+OUTBOX_MAX_ATTEMPTS = 8  # Attempts before an event is marked failed
+OUTBOX_RETRY_BASE_SECONDS = 5  # Backoff: 5s, 10s, 20s, ... capped below
+OUTBOX_RETRY_MAX_SECONDS = 3600
+
+_handlers = {}  # topic -> callable(**payload)
+
+
+def outbox_handler(topic):
+    """Register the function that processes events of a topic."""
+    def register(func):
+        _handlers[topic] = func
+        return func
+    return register
+
+
+def enqueue(topic, **payload):
+    """
+    Queue a side effect in the current transaction.
+
+    Args:
+        topic: Registered handler topic
+        **payload: JSON-serializable arguments for the handler (keep them to ids)
+
+    Returns:
+        OutboxEvent object
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS))
+
+
+def process_outbox_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Claim and process one batch of due events.
+
+    Args:
+        batch_size: Most events processed in this batch
+
+    Returns:
+        Number of events claimed (0 when the outbox is idle)
+    """
+    now = timezone.now()
+    due = OutboxEvent.objects.filter(failed=False, available_at__lte=now).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        events = list(due[:batch_size])
+        done = []
+        for event in events:
+            handler = _handlers.get(event.topic)
+            try:
+                if handler is None:
+                    raise LookupError(f'No outbox handler for topic {event.topic!r}')
+                with transaction.atomic():
+                    handler(**event.payload)
+            except Exception as error:
+                event.attempts += 1
+                event.last_error = f'{type(error).__name__}: {error}'
+                event.failed = event.attempts >= OUTBOX_MAX_ATTEMPTS
+                event.available_at = now + _retry_delay(event.attempts)
+                event.save(update_fields=['attempts', 'last_error', 'failed', 'available_at'])
+                log = logger.error if event.failed else logger.warning
+                log(f'Outbox event {event} failed (attempt {event.attempts}): {event.last_error}')
+            else:
+                done.append(event.id)
+
+        if done:
+            OutboxEvent.objects.filter(id__in=done).delete()
+
+    return len(events)
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Process due events until none are left (e.g. in tests or one-off runs).
+
+    Returns:
+        Number of events claimed
+    """
+    total = 0
+    while True:
+        claimed = process_outbox_batch(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+def run_outbox_worker(batch_size=OUTBOX_BATCH_SIZE, poll_seconds=OUTBOX_POLL_SECONDS):
+    """
+    Process events forever, polling while the outbox is idle.
+    """
+    logger.info('Outbox worker started')
+    while True:
+        close_old_connections()
+        if process_outbox_batch(batch_size) < batch_size:
+            time.sleep(poll_seconds)
+
+
+# ============= GENERIC HANDLERS =============
+
+@outbox_handler('delete_file')
+def delete_file(name):
+    """Delete a stored file (snapshots, replaced profile images); idempotent"""
+    if default_storage.exists(name):
+        default_storage.delete(name)
@@ -0,0 +1,67 @@
+"""
+Notification retention - bounded, throttled deletion of old notifications.
+
+A single `DELETE ... WHERE is_read AND timestamp < cutoff` over the whole
+table holds locks for its full duration and leaves a burst of dead rows.
+prune_notifications() walks the table in id ranges instead: every chunk is
+its own short transaction touching at most `chunk_size` ids, with a pause
+in between so autovacuum and regular traffic keep up.
+
+On Postgres the table can additionally be partitioned by month (see
+logs/utils/notification_partitions.py), where whole months are dropped
+instantly. Run by `python manage.py prune_notifications`.
+"""
+import logging
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from logs.models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RETENTION_DAYS = 30  # Read notifications older than this are deleted
+RETENTION_CHUNK_SIZE = 1000  # Ids covered per DELETE
+RETENTION_CHUNK_SLEEP = 0.1  # Seconds to pause after each chunk that deleted rows
+
+
+def prune_notifications(days=RETENTION_DAYS, read_only=True, chunk_size=RETENTION_CHUNK_SIZE,
+                        sleep_seconds=RETENTION_CHUNK_SLEEP):
+    """
+    Delete notifications older than `days` in bounded id-range chunks.
+
+    Args:
+        days: Age in days after which notifications are deleted
+        read_only: Only delete read notifications (unread ones stay until read)
+        chunk_size: Width of each id range (rows deleted per transaction at most)
+        sleep_seconds: Pause after each non-empty chunk (0 to disable)
+
+    Returns:
+        Number of notifications deleted
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    candidates = Notification.objects.filter(timestamp__lt=cutoff)
+    if read_only:
+        candidates = candidates.filter(is_read=True)
+
+    bounds = candidates.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+
+    deleted = 0
+    low = bounds['low']
+    while low <= bounds['high']:
+        high = low + chunk_size
+        with transaction.atomic():
+            # Deleting through the ORM keeps the unread counters right when unread rows go too
+            chunk_deleted, _ = candidates.filter(id__gte=low, id__lt=high).delete()
+        deleted += chunk_deleted
+        low = high
+        if chunk_deleted and sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    if deleted:
+        logger.info(f'Pruned {deleted} notifications older than {days} days')
+    return deleted
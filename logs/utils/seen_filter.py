@@ -0,0 +1,115 @@
+"""
+Seen-content filter - which logs a user has already viewed.
+
+Each user's most recent LogViews are kept as a Bloom filter in the cache
+(a few KB per user), so feeds can check "seen?" in memory instead of
+anti-joining the ever-growing LogViews table on every page. The filter is
+rebuilt from LogViews when it expires and updated in place by
+track_batch_log_views.
+
+Feeds use select_feed_page() to put unseen logs first: a page is filled
+with unseen logs while scanning ahead a bounded number of logs, and only
+topped up with seen ones when there are not enough unseen logs.
+"""
+from django.core.cache import cache
+from logs.models import LogViews
+from logs.utils.bloom import BloomFilter
+
+# Configuration
+SEEN_FILTER_CAPACITY = 2000  # Most recent views kept per user (~2.4KB at 1% false positives)
+SEEN_FILTER_TTL = 3600  # Rebuild from LogViews every hour
+SEEN_SCAN_FACTOR = 4  # Scan at most per_page * 4 logs looking for unseen ones
+
+
+def _cache_key(user_id):
+    return f'seen:filter:{user_id}'
+
+
+def build_seen_filter(user_id):
+    """
+    Build a user's seen filter from their most recent LogViews.
+
+    Returns:
+        BloomFilter of seen log IDs
+    """
+    seen = BloomFilter(SEEN_FILTER_CAPACITY)
+    log_ids = (
+        LogViews.objects.filter(user_id=user_id)
+        .order_by('-viewed_at')
+        .values_list('log_id', flat=True)[:SEEN_FILTER_CAPACITY]
+    )
+    for log_id in log_ids:
+        seen.add(log_id)
+    return seen
+
+
+def get_seen_filter(user_id):
+    """
+    Get a user's seen filter from the cache, rebuilding it when missing.
+
+    Returns:
+        BloomFilter supporting `log_id in seen`
+    """
+    bits = cache.get(_cache_key(user_id))
+    if bits is not None:
+        return BloomFilter(SEEN_FILTER_CAPACITY, bits)
+
+    seen = build_seen_filter(user_id)
+    cache.set(_cache_key(user_id), seen.to_bytes(), SEEN_FILTER_TTL)
+    return seen
+
+
+def mark_logs_seen(user_id, log_ids):
+    """
+    Add freshly viewed logs to a cached seen filter.
+    A user without a cached filter is skipped (the next rebuild reads LogViews).
+    """
+    key = _cache_key(user_id)
+    bits = cache.get(key)
+    if bits is None:
+        return
+    seen = BloomFilter(SEEN_FILTER_CAPACITY, bits)
+    for log_id in log_ids:
+        seen.add(log_id)
+    cache.set(key, seen.to_bytes(), SEEN_FILTER_TTL)
+
+
+def select_feed_page(fetch_logs, seen, per_page, cursor_timestamp=None, cursor_id=None):
+    """
+    Pick one feed page from a (-timestamp, -id) ordered source, unseen logs first.
+
+    The source is read in keyset batches until the page is full of unseen logs
+    or per_page * SEEN_SCAN_FACTOR logs were scanned; seen logs passed on the way
+    fill the rest of the page. The next cursor is the last log scanned, so the
+    next page continues after everything considered here.
+
+    Args:
+        fetch_logs: Callable(cursor_timestamp, cursor_id, limit) -> ordered list of logs
+        seen: Seen filter (BloomFilter) of the viewer
+        per_page: Page size
+        cursor_timestamp, cursor_id: Cursor of the previous page, or None
+
+    Returns:
+        Tuple (page, last_scanned_log, has_next)
+    """
+    unseen_logs = []
+    seen_logs = []
+    last_scanned = None
+    max_scan = per_page * SEEN_SCAN_FACTOR
+    scanned = 0
+
+    while True:
+        batch = fetch_logs(cursor_timestamp, cursor_id, per_page + 1)
+        for index, log in enumerate(batch):
+            if len(unseen_logs) == per_page or scanned == max_scan:
+                # Page decided; anything left in the source means another page
+                page = (unseen_logs + seen_logs)[:per_page]
+                return page, last_scanned, True
+            scanned += 1
+            last_scanned = log
+            (seen_logs if log.id in seen else unseen_logs).append(log)
+
+        if len(batch) < per_page + 1:
+            # Source exhausted
+            return (unseen_logs + seen_logs)[:per_page], last_scanned, False
+        cursor_timestamp, cursor_id = last_scanned.timestamp, last_scanned.id
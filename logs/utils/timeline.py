@@ -0,0 +1,305 @@
+"""
+Home timeline store - fan-out-on-write for the network feed.
+
+Each new log is copied into the TimelineEntry rows of every user whose
+network (direct follows + friends-of-friends) contains the author, so the
+network feed is a single keyset range scan instead of an IN-list query.
+
+Hybrid pull path: authors with a huge follower count are never fanned out.
+Their logs, and logs reached only through them (friends-of-friends via a
+high-fan-out account), are pulled at read time and merged with the stored
+timeline.
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from logs.models import Log, TimelineEntry
+from myapp.models import SecondDegreeLink, follow
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PULL_FOLLOWER_THRESHOLD = 1000  # Authors with this many followers are pulled at read time
+BACKFILL_LOGS_PER_AUTHOR = 50  # Recent logs copied when an author enters a timeline
+PULLED_AUTHORS_CACHE_KEY = 'timeline:pulled_authors'
+PULLED_AUTHORS_CACHE_TTL = 600  # Refresh the high-fan-out author set every 10 minutes
+PREVIOUS_PULLED_AUTHORS_CACHE_KEY = 'timeline:pulled_authors:previous'
+
+
+def get_pulled_author_ids():
+    """
+    Get IDs of high-fan-out authors whose logs are pulled at read time.
+
+    Returns:
+        frozenset of userinfo IDs
+    """
+    pulled = cache.get(PULLED_AUTHORS_CACHE_KEY)
+    if pulled is None:
+        pulled = frozenset(
+            follow.objects.values('following_id')
+            .annotate(follower_count=Count('id'))
+            .filter(follower_count__gte=PULL_FOLLOWER_THRESHOLD)
+            .values_list('following_id', flat=True)
+        )
+        cache.set(PULLED_AUTHORS_CACHE_KEY, pulled, PULLED_AUTHORS_CACHE_TTL)
+
+        # Authors that dropped below the threshold were never fanned out
+        previous = cache.get(PREVIOUS_PULLED_AUTHORS_CACHE_KEY)
+        cache.set(PREVIOUS_PULLED_AUTHORS_CACHE_KEY, pulled, None)
+        if previous:
+            for author_id in previous - pulled:
+                _backfill_former_pulled_author(author_id, pulled)
+    return pulled
+
+
+def _backfill_former_pulled_author(author_id, pulled_ids):
+    """Materialize what the pull path used to serve for an author that is no longer pulled."""
+    backfill_authors(_get_audience_ids(author_id, pulled_ids), [author_id])
+    # Timelines that reached the author's follows through them
+    followee_ids = set(
+        follow.objects.filter(follower_id=author_id).values_list('following_id', flat=True)
+    )
+    for follower_id in follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True):
+        backfill_authors([follower_id], followee_ids - {follower_id})
+
+
+def _get_network_ids(user_id):
+    """Get direct follows and friends-of-friends of a user (excluding the user)."""
+    primary_ids = set(
+        follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+    )
+    secondary_ids = set(
+        SecondDegreeLink.objects.filter(user_id=user_id).values_list('target_id', flat=True)
+    )
+    network_ids = primary_ids | secondary_ids
+    network_ids.discard(user_id)
+    return network_ids
+
+
+def _get_audience_ids(author_id, pulled_ids):
+    """
+    Get IDs of users whose network feed contains an author:
+    followers of the author, plus followers of those followers.
+    High-fan-out followers are not expanded (served by the pull path).
+    """
+    follower_ids = set(
+        follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    )
+    second_hop_ids = set(
+        follow.objects.filter(
+            following_id__in=follow.objects.filter(following_id=author_id)
+            .exclude(follower_id__in=pulled_ids)
+            .values('follower_id')
+        ).values_list('follower_id', flat=True)
+    )
+    audience_ids = follower_ids | second_hop_ids
+    audience_ids.discard(author_id)
+    return audience_ids
+
+
+def _bulk_insert_entries(owner_ids, logs):
+    """Insert timeline rows for every (owner, log) pair, skipping existing and own logs."""
+    entries = [
+        TimelineEntry(owner_id=owner_id, log_id=log.id, author_id=log.user_id, timestamp=log.timestamp)
+        for owner_id in owner_ids
+        for log in logs
+        if log.user_id != owner_id
+    ]
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+    return len(entries)
+
+
+def fan_out_log(log):
+    """
+    Push a newly created log into the timelines of the author's audience.
+
+    Args:
+        log: Log object that was just created
+
+    Returns:
+        Number of timeline rows written
+    """
+    pulled_ids = get_pulled_author_ids()
+    if log.user_id in pulled_ids:
+        # High-fan-out author - readers pull this log instead
+        return 0
+
+    audience_ids = _get_audience_ids(log.user_id, pulled_ids)
+    written = _bulk_insert_entries(audience_ids, [log])
+    logger.debug(f'Fanned out log {log.sig} to {written} timelines')
+    return written
+
+
+def backfill_authors(owner_ids, author_ids):
+    """
+    Copy the most recent logs of some authors into some timelines.
+    Used when authors enter a network (follow) and by rebuild_timelines.
+
+    Args:
+        owner_ids: Iterable of userinfo IDs whose timelines are filled
+        author_ids: Iterable of userinfo IDs whose logs are copied
+
+    Returns:
+        Number of timeline rows written
+    """
+    author_ids = set(author_ids) - get_pulled_author_ids()
+    owner_ids = set(owner_ids)
+    if not owner_ids or not author_ids:
+        return 0
+
+    recent_logs = list(
+        Log.objects.filter(user_id__in=author_ids)
+        .annotate(
+            recency_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('user_id'),
+                order_by=[F('timestamp').desc(), F('id').desc()],
+            )
+        )
+        .filter(recency_rank__lte=BACKFILL_LOGS_PER_AUTHOR)
+        .only('id', 'user_id', 'timestamp')
+    )
+    return _bulk_insert_entries(owner_ids, recent_logs)
+
+
+def on_follow(follower_id, following_id):
+    """
+    Update timelines after follower_id starts following following_id.
+
+    - The follower gains the followed user (primary) and everyone the
+      followed user follows (secondary).
+    - The follower's own followers gain the followed user (secondary).
+    """
+    pulled_ids = get_pulled_author_ids()
+    if following_id in pulled_ids:
+        # Both the author and everyone reached through them are pulled at read time
+        return
+
+    new_author_ids = set(
+        follow.objects.filter(follower_id=following_id).values_list('following_id', flat=True)
+    )
+    new_author_ids.add(following_id)
+    new_author_ids.discard(follower_id)
+    backfill_authors([follower_id], new_author_ids)
+
+    if follower_id not in pulled_ids:
+        follower_follower_ids = set(
+            follow.objects.filter(following_id=follower_id).values_list('follower_id', flat=True)
+        )
+        follower_follower_ids.discard(following_id)
+        backfill_authors(follower_follower_ids, [following_id])
+
+
+def on_unfollow(follower_id, following_id):
+    """
+    Evict logs that are no longer reachable after follower_id unfollows following_id.
+    Authors still reachable through another path are kept.
+    Runs after the SecondDegreeLink rows were updated (myapp receivers run first).
+    """
+    # 1. The follower loses the followed user and possibly their follows
+    candidate_ids = set(
+        follow.objects.filter(follower_id=following_id).values_list('following_id', flat=True)
+    )
+    candidate_ids.add(following_id)
+    unreachable_ids = candidate_ids - _get_network_ids(follower_id)
+    if unreachable_ids:
+        TimelineEntry.objects.filter(owner_id=follower_id, author_id__in=unreachable_ids).delete()
+
+    # 2. The follower's followers may lose the followed user as secondary network
+    follower_follower_ids = set(
+        follow.objects.filter(following_id=follower_id).values_list('follower_id', flat=True)
+    )
+    follower_follower_ids.discard(following_id)
+    if not follower_follower_ids:
+        return
+
+    still_reaching_ids = set(
+        follow.objects.filter(follower_id__in=follower_follower_ids, following_id=following_id)
+        .values_list('follower_id', flat=True)
+    ) | set(
+        SecondDegreeLink.objects.filter(user_id__in=follower_follower_ids, target_id=following_id)
+        .values_list('user_id', flat=True)
+    )
+    lost_ids = follower_follower_ids - still_reaching_ids
+    if lost_ids:
+        TimelineEntry.objects.filter(owner_id__in=lost_ids, author_id=following_id).delete()
+
+
+def rebuild_timeline(user_id):
+    """
+    Rebuild one user's timeline from scratch from the follow graph.
+
+    Returns:
+        Number of timeline rows written
+    """
+    TimelineEntry.objects.filter(owner_id=user_id).delete()
+    return backfill_authors([user_id], _get_network_ids(user_id))
+
+
+def _get_pulled_network_ids(user):
+    """
+    Get authors in the user's network that are served by the pull path:
+    high-fan-out authors the user reaches, and anyone the user reaches only
+    through a high-fan-out account they follow.
+    """
+    pulled_ids = get_pulled_author_ids()
+    if not pulled_ids:
+        return set()
+
+    primary_subquery = follow.objects.filter(follower=user).values('following_id')
+    author_ids = set(
+        follow.objects.filter(follower=user, following_id__in=pulled_ids)
+        .values_list('following_id', flat=True)
+    )
+    author_ids.update(
+        follow.objects.filter(follower_id__in=primary_subquery)
+        .filter(Q(following_id__in=pulled_ids) | Q(follower_id__in=pulled_ids))
+        .values_list('following_id', flat=True)
+    )
+    author_ids.discard(user.id)
+    return author_ids
+
+
+def get_timeline_logs(user, cursor_timestamp=None, cursor_id=None, limit=8):
+    """
+    Read one page of the user's network feed, newest first.
+
+    Args:
+        user: userinfo object
+        cursor_timestamp, cursor_id: Compound (timestamp, id) cursor of the last
+            log already shown, or None for the first page
+        limit: Maximum number of logs to return
+
+    Returns:
+        List of Log objects ordered by (-timestamp, -id)
+    """
+    entries = TimelineEntry.objects.filter(owner=user)
+    if cursor_timestamp is not None and cursor_id is not None:
+        entries = entries.filter(
+            Q(timestamp__lt=cursor_timestamp) |
+            Q(timestamp=cursor_timestamp, log_id__lt=cursor_id)
+        )
+    logs_list = [
+        entry.log for entry in
+        entries.select_related('log__user__user').order_by('-timestamp', '-log_id')[:limit]
+    ]
+
+    # Hybrid pull path for high-fan-out authors
+    pulled_author_ids = _get_pulled_network_ids(user)
+    if pulled_author_ids:
+        pulled_query = Log.objects.filter(user_id__in=pulled_author_ids)
+        if cursor_timestamp is not None and cursor_id is not None:
+            pulled_query = pulled_query.filter(
+                Q(timestamp__lt=cursor_timestamp) |
+                Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+            )
+        pulled_logs = pulled_query.select_related('user__user').order_by('-timestamp', '-id')[:limit]
+
+        merged = {log.id: log for log in logs_list}
+        for log in pulled_logs:
+            merged.setdefault(log.id, log)
+        logs_list = sorted(merged.values(), key=lambda log: (log.timestamp, log.id), reverse=True)[:limit]
+
+    return logs_list
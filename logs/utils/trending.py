@@ -1,69 +1,182 @@
 """
 Trending logs utility - Calculate engagement scores for hot/trending content
+
+Every log carries a time-decayed hot_score (Reddit style): the log10 of its
+engagement plus its creation time in units of HOT_SCORE_DECAY_SECONDS. A
+log's age never has to be recomputed - newer logs simply start higher - so
+the score only changes when engagement does and is kept current by the
+reaction/comment signals. "What's Hot" and the Hot feed read it through the
+(-hot_score, -id) index.
 """
-from django.db.models import Count, Q, F
+from django.core.cache import cache
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest, Log as Logarithm
 from django.utils import timezone
-from datetime import timedelta
-from logs.models import Log
+from datetime import datetime, timedelta, timezone as dt_timezone
+from logs.models import Comment, Log, Reaction
+import math
+
+# Configuration
+TRENDING_REFRESH_SECONDS = 60  # Recompute the ranking every minute
+HOT_SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HOT_SCORE_DECAY_SECONDS = 45000  # 12.5h newer is worth 10x the engagement
+
+# Engagement score: reactions*2 + comments*3 + replies*3 (over Log counter columns)
+ENGAGEMENT_SCORE = (
+    (F('like_count') + F('rocket_count') + F('insight_count') + F('sad_count')) * 2
+    + F('comment_count') * 3
+    + F('reply_count') * 3
+)
 
 
-def get_trending_logs(limit=5, hours=24):
+def compute_hot_score(engagement_score, timestamp):
     """
-    Get trending logs based on engagement in the last N hours
+    Time-decayed hotness of a log.
+    
+    Args:
+        engagement_score: Weighted engagement (see ENGAGEMENT_SCORE)
+        timestamp: When the log was created
+    
+    Returns:
+        Float score; higher is hotter
+    """
+    return math.log10(max(engagement_score, 1)) + _hot_score_age_term(timestamp)
+
+
+def _hot_score_age_term(timestamp):
+    return (timestamp - HOT_SCORE_EPOCH).total_seconds() / HOT_SCORE_DECAY_SECONDS
+
+
+def update_hot_score(log):
+    """
+    Recompute a log's hot_score from its counter columns in one UPDATE.
+    
+    Args:
+        log: Log object (only pk and timestamp are used)
+    """
+    engagement = Cast(Greatest(ENGAGEMENT_SCORE, Value(1)), FloatField())
+    Log.objects.filter(pk=log.pk).update(
+        hot_score=Logarithm(Value(10.0), engagement) + Value(_hot_score_age_term(log.timestamp))
+    )
+
+
+def rebuild_hot_scores(queryset=None, batch_size=1000):
+    """
+    Recompute hot_score for many logs from their counter columns.
+    
+    Returns:
+        Number of logs updated
+    """
+    if queryset is None:
+        queryset = Log.objects.all()
+    
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_id)
+            .annotate(engagement_score=ENGAGEMENT_SCORE)
+            .order_by('pk')
+            .only('pk', 'timestamp', 'hot_score')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].pk
+        for log in batch:
+            log.hot_score = compute_hot_score(log.engagement_score, log.timestamp)
+        Log.objects.bulk_update(batch, ['hot_score'])
+        updated += len(batch)
+    return updated
+
+
+def _compute_trending_ranking(limit, hours):
+    """
+    Rank engaged logs by hot_score, optionally only those from the last N hours.
+    
+    Returns:
+        List of (log_id, engagement_score, engaged_users) tuples, best first
+    """
+    now = timezone.now()
+    candidates = Log.objects.all()
+    if hours:
+        candidates = candidates.filter(timestamp__gte=now - timedelta(hours=hours))
+    
+    top = list(
+        candidates
+        .annotate(engagement_score=ENGAGEMENT_SCORE)
+        .filter(engagement_score__gt=0)  # Only show logs with engagement
+        .order_by('-hot_score', '-id')
+        .values_list('id', 'engagement_score')[:limit]
+    )
+    
+    # Unique engaged users (reactors and commenters) of the top logs only
+    engaged = {log_id: set() for log_id, _ in top}
+    for model in (Reaction, Comment):
+        pairs = model.objects.filter(mindlog_id__in=engaged).order_by().values_list('mindlog_id', 'user_id').distinct()
+        for log_id, user_id in pairs:
+            engaged[log_id].add(user_id)
+    
+    return [(log_id, score, len(engaged[log_id])) for log_id, score in top]
+
+
+def get_trending_logs(limit=5, hours=None):
+    """
+    Get the hottest engaged logs (What's Hot Now)
     
     Engagement Score = (reactions * 2) + (comments * 3) + (replies * 3)
-    - Used for ranking only
-    - Display shows actual count of unique engaged users
+    - Ranking uses the time-decayed hot_score, so logs fade out gradually
+    - Display shows the exact count of unique engaged users
     
     Args:
         limit: Number of trending logs to return (default 5)
-        hours: Time window in hours (default 24)
+        hours: Optional maximum log age in hours (default: no cutoff)
     
     Returns:
-        QuerySet of Log objects with engagement_score and total_engaged_users annotations
+        List of Log objects with engagement_score and total_engaged_users attributes
     """
-    cutoff_time = timezone.now() - timedelta(hours=hours)
+    cache_key = f'trending:ranking:{limit}:{hours}'
+    ranking = cache.get(cache_key)
+    if ranking is None:
+        ranking = _compute_trending_ranking(limit, hours)
+        cache.set(cache_key, ranking, TRENDING_REFRESH_SECONDS)
     
-    # Annotate logs with engagement metrics
-    trending_logs = Log.objects.filter(
-        timestamp__gte=cutoff_time
-    ).select_related(
+    logs_by_id = Log.objects.select_related(
         'user__user',
         'user__coding_style'
-    ).prefetch_related(
-        'reactions__user',
-        'comments__user'
-    ).annotate(
-        # Count individual engagement types
-        reaction_count=Count('reactions__user', distinct=True),
-        comment_count=Count('comments', filter=Q(comments__parent_comment__isnull=True), distinct=True),
-        reply_count=Count('comments', filter=Q(comments__parent_comment__isnull=False), distinct=True),
-    ).annotate(
-        # Calculate engagement score for ranking: reactions*2 + comments*3 + replies*3
-        engagement_score=F('reaction_count') * 2 + F('comment_count') * 3 + F('reply_count') * 3
-    ).filter(
-        engagement_score__gt=0  # Only show logs with engagement
-    ).order_by('-engagement_score')[:limit]
-    
-    # Calculate actual unique engaged users (to avoid double counting)
-    # A user who reacts AND comments should be counted once, not twice
-    trending_logs = list(trending_logs)  # Evaluate QuerySet to allow modification
-    
-    for log in trending_logs:
-        engaged_users = set()
-        
-        # Add all users who reacted (uses prefetched data, no extra query)
-        engaged_users.update(log.reactions.values_list('user_id', flat=True))
-        
-        # Add all users who commented or replied (uses prefetched data, no extra query)
-        engaged_users.update(log.comments.values_list('user_id', flat=True))
-        
-        # Set the actual unique count
-        log.total_engaged_users = len(engaged_users)
+    ).in_bulk([log_id for log_id, _, _ in ranking])
+    
+    trending_logs = []
+    for log_id, engagement_score, engaged_users in ranking:
+        log = logs_by_id.get(log_id)
+        if log is None:
+            continue  # Deleted since the ranking was computed
+        log.engagement_score = engagement_score
+        log.total_engaged_users = engaged_users
+        trending_logs.append(log)
     
     return trending_logs
 
 
+def get_hot_logs(cursor_score=None, cursor_id=None, limit=8):
+    """
+    Get logs ordered by hot_score with keyset pagination.
+    
+    Args:
+        cursor_score, cursor_id: hot_score and id of the last log of the previous page
+        limit: Number of logs to return
+    
+    Returns:
+        List of Log objects
+    """
+    query = Log.objects.all()
+    if cursor_score is not None and cursor_id is not None:
+        query = query.filter(
+            Q(hot_score__lt=cursor_score) |
+            Q(hot_score=cursor_score, id__lt=cursor_id)
+        )
+    return list(query.select_related('user__user').order_by('-hot_score', '-id')[:limit])
+
+
 def get_engagement_count(log):
     """
     Get total engagement count for a log (for display purposes)
@@ -77,12 +190,8 @@ def get_engagement_count(log):
     if hasattr(log, 'engagement_score'):
         return log.engagement_score
     
-    # Fallback: calculate on the fly
-    reactions = log.reactions.count()
-    comments = log.comments.filter(parent_comment__isnull=True).count()
-    replies = log.comments.filter(parent_comment__isnull=False).count()
-    
-    return (reactions * 2) + (comments * 3) + (replies * 3)
+    # Fallback: calculate from the counter columns
+    return (log.total_reactions() * 2) + (log.comment_count * 3) + (log.reply_count * 3)
 
 
 def format_engagement_text(engagement_count):
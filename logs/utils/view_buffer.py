@@ -0,0 +1,111 @@
+"""
+Write-behind buffer for log impressions (LogViews).
+
+The view beacon (track_batch_log_views) fires for every few cards scrolled
+past. Updating LogViews row by row there costs one write per log and races
+on the (user, log) unique constraint. Instead the beacon only appends one
+LogViewImpression row per log in a single INSERT and returns.
+
+flush_log_views() - run continuously by `python manage.py flush_log_views` -
+claims staged rows, deduplicates them by (user, log) and folds each batch
+into LogViews with one upsert per chunk:
+
+    INSERT ... ON CONFLICT (user_id, log_id)
+    DO UPDATE SET view_count = view_count + EXCLUDED.view_count
+
+Claimed rows are locked with SKIP LOCKED (on Postgres) and deleted in the
+same transaction as the upsert, so several flushers never count an
+impression twice and a failed flush leaves its rows for the next run.
+"""
+import logging
+from collections import defaultdict
+from django.db import connection, transaction
+from logs.models import LogViewImpression, LogViews
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+VIEW_FLUSH_BATCH_SIZE = 5000  # Staged impressions claimed per transaction
+VIEW_FLUSH_INTERVAL = 5.0  # Seconds between flushes of the worker
+VIEW_UPSERT_CHUNK_SIZE = 200  # LogViews rows per INSERT (4 parameters each)
+
+
+def record_log_views(user_id, log_ids):
+    """
+    Stage impressions of logs by a user (one INSERT, no reads).
+
+    Args:
+        user_id: userinfo ID of the viewer
+        log_ids: IDs of the viewed logs; duplicates count once
+
+    Returns:
+        Number of impressions staged
+    """
+    impressions = [LogViewImpression(user_id=user_id, log_id=log_id) for log_id in dict.fromkeys(log_ids)]
+    LogViewImpression.objects.bulk_create(impressions)
+    return len(impressions)
+
+
+def _upsert_log_views(cursor, rows):
+    """Add (user_id, log_id, viewed_at, view_count) rows onto LogViews."""
+    qn = connection.ops.quote_name
+    table = qn(LogViews._meta.db_table)
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, log_id, viewed_at, view_count) VALUES {values} '
+        f'ON CONFLICT (user_id, log_id) DO UPDATE SET '
+        f'view_count = {table}.view_count + EXCLUDED.view_count, viewed_at = EXCLUDED.viewed_at',
+        [value for row in rows for value in row],
+    )
+
+
+def flush_log_views(batch_size=VIEW_FLUSH_BATCH_SIZE):
+    """
+    Fold one batch of staged impressions into LogViews.
+
+    Args:
+        batch_size: Most staged rows claimed in this flush
+
+    Returns:
+        Number of staged rows consumed (0 when the buffer is empty)
+    """
+    staged = LogViewImpression.objects.order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        staged = staged.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        claimed = list(staged.values_list('id', 'user_id', 'log_id', 'viewed_at')[:batch_size])
+        if not claimed:
+            return 0
+
+        views = defaultdict(lambda: [None, 0])  # (user_id, log_id) -> [last viewed_at, count]
+        for _, user_id, log_id, viewed_at in claimed:
+            view = views[(user_id, log_id)]
+            view[0] = viewed_at if view[0] is None else max(view[0], viewed_at)
+            view[1] += 1
+
+        # Sorted keys give concurrent flushers the same lock order on LogViews
+        rows = [(user_id, log_id, viewed_at, count) for (user_id, log_id), (viewed_at, count) in sorted(views.items())]
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), VIEW_UPSERT_CHUNK_SIZE):
+                _upsert_log_views(cursor, rows[start:start + VIEW_UPSERT_CHUNK_SIZE])
+
+        LogViewImpression.objects.filter(id__in=[row[0] for row in claimed]).delete()
+
+    logger.debug(f'Flushed {len(claimed)} impressions into {len(rows)} log views')
+    return len(claimed)
+
+
+def drain_log_views(batch_size=VIEW_FLUSH_BATCH_SIZE):
+    """
+    Flush until the buffer is empty.
+
+    Returns:
+        Number of staged rows consumed
+    """
+    total = 0
+    while True:
+        flushed = flush_log_views(batch_size)
+        total += flushed
+        if flushed < batch_size:
+            return total
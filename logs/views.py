@@ -5,9 +5,12 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from .forms import LogForm, CommentForm
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.views.decorators.http import require_POST, require_GET
 from .models import Log, Reaction, Comment
-from .utils.streaks import get_24h_log_stats, streak_calculation, calculate_max_streak
+from .utils.hydration import hydrate_feed_logs
+from .utils.activity import get_current_streak
+from .utils.streaks import get_24h_log_stats
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.paginator import Paginator
@@ -74,6 +77,10 @@ def load_more_profile_logs(request, username):
     if has_next:
         logs = logs[:per_page]  # Remove the extra one
     
+    # Load reaction counts, viewer reaction and comments for the whole page
+    viewer = request.user.info if request.user.is_authenticated else None
+    hydrate_feed_logs(logs, viewer)
+    
     # Get new cursor (timestamp of last log)
     new_cursor = logs[-1].timestamp.isoformat() if logs else None
     
@@ -103,15 +110,15 @@ def save_log(request):
             log.code_snippet = raw_snippet[:10000] if raw_snippet else None
             log.link = request.POST.get('link', '').strip()
 
-            log.save()
-            
-            from myapp.timezone_utils import user_today
-            today = user_today(request.user)
-            logs = Log.objects.filter(user = request.user.info)
-            existing_logs_today = logs.filter(timestamp__date=today).exclude(sig=log.sig).exists() 
+            # Commit the log together with its fan-out, counters and queued outbox events
+            with transaction.atomic():
+                log.save()
             
-            if not existing_logs_today:
-                streak = streak_calculation(logs, request.user)
+            # First log of the day: the post_save rollup signal advanced the cached streak
+            if log._first_log_of_day:
+                from myapp.timezone_utils import user_today
+                author = userinfo.objects.only('current_streak', 'streak_last_date').get(pk=log.user_id)
+                streak = get_current_streak(author, user_today(request.user))
                 request.session['reward_message'] =  f"🔥 {streak} Day Streak!"
                 request.session['reward_emojis'] = ['🥳', '🔥']
             else: 
@@ -158,26 +165,30 @@ def toggle_reaction(request, sig):
     if emoji not in valid_emojis:
         return JsonResponse({'error': 'Invalid reaction'}, status=400)
     
-    try:
-        reaction = Reaction.objects.get(mindlog=log, user=user_info)
-        if reaction.emoji == emoji:
-            # Same reaction - remove it
-            reaction.delete()
-            status = 'removed'
-            user_reaction = None
-        else:
-            # Different reaction - update it
-            reaction.emoji = emoji
-            reaction.save()
-            status = 'updated'
+    # Commit the reaction together with its counters and queued outbox events
+    with transaction.atomic():
+        try:
+            reaction = Reaction.objects.get(mindlog=log, user=user_info)
+            if reaction.emoji == emoji:
+                # Same reaction - remove it
+                reaction.delete()
+                status = 'removed'
+                user_reaction = None
+            else:
+                # Different reaction - update it
+                reaction._previous_emoji = reaction.emoji  # Used by the counter signal
+                reaction.emoji = emoji
+                reaction.save()
+                status = 'updated'
+                user_reaction = emoji
+        except Reaction.DoesNotExist:
+            # No reaction - create new one
+            Reaction.objects.create(mindlog=log, user=user_info, emoji=emoji)
+            status = 'added'
             user_reaction = emoji
-    except Reaction.DoesNotExist:
-        # No reaction - create new one
-        Reaction.objects.create(mindlog=log, user=user_info, emoji=emoji)
-        status = 'added'
-        user_reaction = emoji
     
-    # Get updated counts
+    # Get updated counts (counter columns were updated by signals)
+    log.refresh_from_db(fields=list(Log.REACTION_COUNT_FIELDS.values()))
     counts = log.get_reaction_counts()
     
     return JsonResponse({
@@ -223,8 +234,10 @@ def add_comment(request, sig):
         # Store actual parent user as temporary attribute for signal handler
         if actual_parent_user:
             comment._actual_parent_user = actual_parent_user
-                
-        comment.save()
+        
+        # Commit the comment together with its counters and queued outbox events
+        with transaction.atomic():
+            comment.save()
         
         # Return JSON for AJAX
         return JsonResponse({
@@ -367,13 +380,15 @@ def track_log_view(request):
 def track_batch_log_views(request):
     """
     Track multiple log views in a single request (more efficient).
+    Impressions are staged and folded into LogViews by `manage.py flush_log_views`.
     
     Expects POST data:
     - log_sigs: Array of log signatures being viewed
     """
     import json
-    from .models import Log, LogViews
-    from django.utils import timezone
+    from .models import Log
+    from .utils.seen_filter import mark_logs_seen
+    from .utils.view_buffer import record_log_views
     
     try:
         data = json.loads(request.body)
@@ -384,44 +399,16 @@ def track_batch_log_views(request):
         
         user = request.user.info
         
-        # Get all logs by signature
-        logs = Log.objects.filter(sig__in=log_sigs)
-        log_map = {log.sig: log for log in logs}
-        
-        # Get existing views for these logs
-        existing_views = LogViews.objects.filter(
-            user=user,
-            log__in=logs
-        ).select_related('log')
-        existing_view_map = {view.log.sig: view for view in existing_views}
-        
-        created_count = 0
-        updated_count = 0
+        # Resolve signatures; unknown ones are skipped
+        log_ids = list(Log.objects.filter(sig__in=log_sigs).values_list('id', flat=True))
+        queued_count = record_log_views(user.id, log_ids)
         
-        for sig in log_sigs:
-            if sig not in log_map:
-                continue  # Log doesn't exist
-            
-            if sig in existing_view_map:
-                # Increment view count and update timestamp
-                view = existing_view_map[sig]
-                view.view_count += 1
-                view.viewed_at = timezone.now()
-                view.save(update_fields=['view_count', 'viewed_at'])
-                updated_count += 1
-            else:
-                # Create new view
-                LogViews.objects.create(
-                    user=user,
-                    log=log_map[sig]
-                )
-                created_count += 1
+        # Keep the cached seen filter (feed demotion) current
+        mark_logs_seen(user.id, log_ids)
         
         return JsonResponse({
             'success': True,
-            'created': created_count,
-            'updated': updated_count,
-            'total': created_count + updated_count
+            'total': queued_count
         })
         
     except json.JSONDecodeError:
@@ -1,8 +1,10 @@
 from django.core.paginator import Paginator, EmptyPage
 from itertools import chain
 from .models import follow, skill, userinfo
-from django.db.models import Q, Count, Exists, OuterRef, Subquery, Value, FloatField
-from django.db.models.functions import Coalesce
+from .utils.social_graph import get_second_degree_ids
+from django.core.cache import cache
+from django.db.models import Q, Count, Exists, F, OuterRef, Subquery, Value, FloatField, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.utils.timezone import now
 from datetime import timedelta
 from decimal import Decimal
@@ -10,19 +12,6 @@ import random
 import math
 
 
-def get_explore_users(filter_dev, request, count=200, order_by='-created_at'):
-    # Step 1: Get followed user IDs and current user ID
-    followed_ids = follow.objects.filter(
-        follower=request.user.info
-    ).values_list('following_id', flat=True)
-
-    exclude_ids = list(followed_ids) + [request.user.info.id]
-
-    # Step 2: Use `.only()` to limit fields fetched from DB for performance
-    users = filter_dev.exclude(id__in=exclude_ids).only('id', 'profile_image', 'user__username').order_by(order_by)[:count]
-    return users
-
-
 # =============================================================================
 # LOCAL FEED - MVP CONFIGURATION
 # =============================================================================
@@ -127,7 +116,7 @@ def _get_local_recommendation_reason(log, distance_km, shared_skills_count=0):
         }
 
 
-def get_local_feed_logs(user):
+def get_local_feed_logs(user, cursor_timestamp=None, cursor_id=None, limit=8):
     """
     Get logs for Local feed - MVP simple algorithm.
     
@@ -136,8 +125,18 @@ def get_local_feed_logs(user):
     - Distance must be within LOCAL_RADIUS_KM (250 km)
     - Sort logs by most recent first
     - Preserves existing local recommendation label
+    
+    Candidates are prefiltered in SQL by the authors' geo_cell (bounding box
+    of the radius) and paginated with the (timestamp, id) keyset; exact
+    distances are only computed for the scanned candidates.
+    
+    Args:
+        user: userinfo object
+        cursor_timestamp, cursor_id: Compound cursor of the last log already shown
+        limit: Maximum number of logs to return
     """
     from logs.models import Log
+    from .utils.geolocation import geo_cells_within_q
     
     user_lat = user.latitude
     user_lon = user.longitude
@@ -146,50 +145,66 @@ def get_local_feed_logs(user):
     if not user_lat or not user_lon:
         return []
     
-    # Get user's skills for recommendation label
-    user_skills = set(user.skills.values_list('id', flat=True)) if hasattr(user, 'skills') else set()
-    
-    # Fetch logs from users with coordinates
-    nearby_users_logs = list(
+    # Logs from users whose grid cell intersects the radius bounding box
+    candidates = (
         Log.objects
         .exclude(user=user)
-        .filter(user__latitude__isnull=False, user__longitude__isnull=False)
+        .filter(geo_cells_within_q(user_lat, user_lon, LOCAL_RADIUS_KM, field='user__geo_cell'))
         .select_related('user__user')
-        .prefetch_related('user__skills')
-        .annotate(
-            reaction_count=Count('reactions', distinct=True),
-            comment_count=Count('comments', distinct=True),
-        )
-        .order_by('-timestamp')  # Pre-sort by timestamp for efficiency
+        .order_by('-timestamp', '-id')
     )
     
-    # Filter by distance and add metadata
+    # Scan candidates in keyset order until the page is full
     local_logs = []
-    for log in nearby_users_logs:
-        author_lat = log.user.latitude
-        author_lon = log.user.longitude
-        
-        if not author_lat or not author_lon:
-            continue
-        
-        # Calculate distance
-        distance = haversine_distance(user_lat, user_lon, author_lat, author_lon)
-        
-        # Filter: only include logs within LOCAL_RADIUS_KM
-        if distance > LOCAL_RADIUS_KM:
-            continue
+    batch_size = max(limit * 2, 20)
+    while len(local_logs) < limit:
+        batch = candidates
+        if cursor_timestamp is not None and cursor_id is not None:
+            batch = batch.filter(
+                Q(timestamp__lt=cursor_timestamp) |
+                Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+            )
+        batch = list(batch[:batch_size])
         
-        # Calculate shared skills for recommendation label
-        author_skills = set(log.user.skills.values_list('id', flat=True)) if hasattr(log.user, 'skills') else set()
-        shared_count = len(user_skills.intersection(author_skills))
+        for log in batch:
+            author_lat = log.user.latitude
+            author_lon = log.user.longitude
+            if not author_lat or not author_lon:
+                continue
+            
+            # Exact distance (the cell prefilter includes the box corners)
+            distance = haversine_distance(user_lat, user_lon, author_lat, author_lon)
+            if distance > LOCAL_RADIUS_KM:
+                continue
+            
+            log.distance_km = distance
+            local_logs.append(log)
+            if len(local_logs) == limit:
+                break
         
-        # Add metadata
-        log.distance_km = distance
+        if len(batch) < batch_size:
+            break
+        cursor_timestamp, cursor_id = batch[-1].timestamp, batch[-1].id
+    
+    # Shared skills for the recommendation label, for the whole page in one query
+    user_skills = set(user.skills.values_list('id', flat=True))
+    shared_counts = {}
+    if user_skills and local_logs:
+        shared_counts = dict(
+            userinfo.skills.through.objects
+            .filter(userinfo_id__in={log.user_id for log in local_logs}, skill_id__in=user_skills)
+            .values('userinfo_id')
+            .annotate(shared=Count('id'))
+            .values_list('userinfo_id', 'shared')
+        )
+    
+    # Add metadata
+    for log in local_logs:
         log.feed_type = 'local'
         log.is_secondary_network = False
-        log.recommendation_reason = _get_local_recommendation_reason(log, distance, shared_count)
-        
-        local_logs.append(log)
+        log.recommendation_reason = _get_local_recommendation_reason(
+            log, log.distance_km, shared_counts.get(log.user_id, 0)
+        )
     
     # Already sorted by timestamp (most recent first) from the query
     return local_logs
@@ -218,29 +233,76 @@ def get_secondary_network_user_ids(user, primary_network_ids):
     if not primary_network_ids:
         return set()
     
-    # Users followed by people I follow
-    secondary_ids = set(
-        follow.objects.filter(follower_id__in=primary_network_ids)
-        .exclude(following=user)  # Exclude self
-        .exclude(following_id=user.id)  # Also exclude by ID
-        .exclude(following_id__in=primary_network_ids)  # Exclude direct follows
-        .values_list('following_id', flat=True)
-    )
+    # Users followed by people I follow (materialized, see utils/social_graph.py)
+    secondary_ids = get_second_degree_ids(user)
+    secondary_ids -= primary_network_ids  # Exclude direct follows
+    secondary_ids.discard(user.id)  # Exclude self
     return secondary_ids
 
 
-def _get_secondary_recommendation_reason(log, current_user, primary_network_ids):
+# "Followed by" labels are cached per (viewer, author) for a short time
+FOLLOWED_BY_CACHE_TTL = 120  # 2 minutes
+
+
+def _get_followed_by(current_user, author_ids, primary_network_ids):
+    """
+    Resolve who in the user's network follows each author, for a whole page at once.
+    
+    One windowed query returns the first three followers from the primary
+    network per author plus the total per author; results are cached per
+    (viewer, author).
+    
+    Returns:
+        Dictionary of author ID -> (list of up to 3 usernames, total count)
+    """
+    cache_keys = {author_id: f'followed_by:{current_user.id}:{author_id}' for author_id in author_ids}
+    cached = cache.get_many(cache_keys.values())
+    followed_by = {
+        author_id: cached[key] for author_id, key in cache_keys.items() if key in cached
+    }
+    
+    missing_ids = set(author_ids) - set(followed_by)
+    if missing_ids:
+        resolved = {author_id: ([], 0) for author_id in missing_ids}
+        mutual_follows = (
+            follow.objects.filter(follower_id__in=primary_network_ids, following_id__in=missing_ids)
+            .annotate(
+                rank=Window(expression=RowNumber(), partition_by=F('following_id'), order_by=F('id').asc()),
+                total=Window(expression=Count('id'), partition_by=F('following_id')),
+            )
+            .filter(rank__lte=3)
+            .order_by('following_id', 'rank')
+            .values_list('following_id', 'follower__user__username', 'total')
+        )
+        for author_id, username, total in mutual_follows:
+            names, _ = resolved[author_id]
+            names.append(username)
+            resolved[author_id] = (names, total)
+        
+        cache.set_many(
+            {cache_keys[author_id]: value for author_id, value in resolved.items()},
+            FOLLOWED_BY_CACHE_TTL,
+        )
+        followed_by.update(resolved)
+    
+    return followed_by
+
+
+def _get_secondary_recommendation_reason(names, total_count, primary_network_ids):
     """
     Generate recommendation reason for SECONDARY NETWORK logs only.
     Similar to LinkedIn/Instagram "Followed by X" or "Suggested for you" labels.
     
+    Args:
+        names: Usernames (up to 3) from the user's network who follow the author
+        total_count: Total number of people in the user's network who follow the author
+        primary_network_ids: IDs of users the current user follows
+    
     Returns a dict with:
     - text: The display text (e.g., "Followed by @john")
     - subtext: Optional secondary text
     - icon: Icon class for display
     """
-    log_author = log.user
-    
     if not primary_network_ids:
         return {
             'text': 'Suggested for you',
@@ -248,14 +310,7 @@ def _get_secondary_recommendation_reason(log, current_user, primary_network_ids)
             'icon': 'fa-user-plus'
         }
     
-    # Find who from user's network follows this author
-    mutual_follows = follow.objects.filter(
-        follower_id__in=primary_network_ids,
-        following=log_author
-    ).select_related('follower__user')[:3]
-    
-    if mutual_follows:
-        names = [f.follower.user.username for f in mutual_follows]
+    if names:
         count = len(names)
         
         if count == 1:
@@ -271,11 +326,6 @@ def _get_secondary_recommendation_reason(log, current_user, primary_network_ids)
                 'icon': 'fa-users'
             }
         else:
-            # Check total count for "and X others"
-            total_count = follow.objects.filter(
-                follower_id__in=primary_network_ids,
-                following=log_author
-            ).count()
             others = total_count - 1
             return {
                 'text': f'@{names[0]} and {others} others follow',
@@ -290,7 +340,7 @@ def _get_secondary_recommendation_reason(log, current_user, primary_network_ids)
     }
 
 
-def get_personalized_feed(request, type='network', page=1, per_page=7, cursor=None):
+def get_personalized_feed(request, type='network', page=1, per_page=7, cursor=None, cards=True):
     """
     Personalized feed algorithm for home page with cursor-based pagination.
     
@@ -300,16 +350,22 @@ def get_personalized_feed(request, type='network', page=1, per_page=7, cursor=No
       * Secondary network: friends-of-friends
     - 'local': Logs ranked by proximity and relevance
     - 'global': Logs sorted by timestamp (most recent first)
+    - Network and global pages put logs the viewer has already seen last
+    - 'hot': All logs sorted by time-decayed hot_score
     
     Args:
-        cursor: Compound cursor "timestamp,id" for efficient pagination (None for first page)
+        cursor: Compound cursor "timestamp,id" ("hot_score,id" for 'hot') for efficient pagination (None for first page)
         page: Legacy parameter for backward compatibility (ignored when cursor is used)
         per_page: Number of items to return
+        cards: Load the cached card HTML for rendering feed_items.html (False for the JSON API)
     
     Returns:
         Dictionary with 'items', 'next_cursor', 'has_next'
     """
     from logs.models import Log, Reaction, Comment
+    from logs.utils.card_cache import prime_log_cards
+    from logs.utils.hydration import hydrate_feed_logs
+    from logs.utils.seen_filter import get_seen_filter, select_feed_page
     from django.utils.dateparse import parse_datetime
     from django.db.models import Q
     
@@ -338,72 +394,53 @@ def get_personalized_feed(request, type='network', page=1, per_page=7, cursor=No
     
     if type == 'network':
         # NETWORK FEED: Pure recency-based sorting with cursor pagination
-        # Fetches logs from both primary and secondary connections sorted by timestamp
-        
-        # Get secondary network IDs
-        secondary_network_ids = get_secondary_network_user_ids(user, primary_network_ids)
+        # Reads the precomputed home timeline (primary + secondary network logs,
+        # filled by fan-out on write) with one keyset range scan on
+        # (owner, timestamp, id), merged with logs pulled from high-fan-out authors
+        # Already-seen logs (per the viewer's seen filter) sink below unseen ones
+        from logs.utils.timeline import get_timeline_logs
         
-        # Combine both primary and secondary network IDs
-        all_network_ids = primary_network_ids | secondary_network_ids
-        
-        # Build query with cursor-based filtering
-        query = Log.objects.filter(user_id__in=all_network_ids)
-        
-        if cursor_timestamp is not None and cursor_id is not None:
-            # Fetch logs older than cursor using compound cursor (timestamp, id)
-            # This guarantees no duplicates even when timestamps are identical
-            query = query.filter(
-                Q(timestamp__lt=cursor_timestamp) |
-                Q(timestamp=cursor_timestamp, id__lt=cursor_id)
-            )
-        
-        # Fetch per_page + 1 to check if there are more items
-        logs_list = list(
-            query
-            .select_related('user__user')  # Prevent N+1 queries
-            .annotate(
-                reaction_count=Count('reactions', distinct=True),
-                comment_count=Count('comments', distinct=True),
-            )
-            .order_by('-timestamp', '-id')  # Deterministic ordering: newest first, then highest ID
-            [:per_page + 1]
+        logs_list, last_scanned, has_next = select_feed_page(
+            lambda ts, log_id, limit: get_timeline_logs(user, ts, log_id, limit=limit),
+            get_seen_filter(user.id), per_page, cursor_timestamp, cursor_id,
         )
         
         # Add minimal metadata (only what's needed for display)
         primary_id_set = primary_network_ids  # Reuse set for O(1) lookup
+        secondary_author_ids = {log.user_id for log in logs_list if log.user_id not in primary_id_set}
+        followed_by = _get_followed_by(user, secondary_author_ids, primary_network_ids) if secondary_author_ids and primary_network_ids else {}
         for log in logs_list:
             log.feed_type = 'network'
             log.is_secondary_network = log.user_id not in primary_id_set
             # Add recommendation reason ONLY for secondary network
             if log.is_secondary_network:
-                log.recommendation_reason = _get_secondary_recommendation_reason(log, user, primary_network_ids)
+                names, total_count = followed_by.get(log.user_id, ([], 0))
+                log.recommendation_reason = _get_secondary_recommendation_reason(names, total_count, primary_network_ids)
             else:
                 log.recommendation_reason = None
         
     elif type == 'global':
         # GLOBAL FEED: Pure recency-based sorting with cursor pagination
-        # Simple timestamp-based sorting - most recent logs first
+        # Simple timestamp-based sorting - most recent logs first, seen logs sink
         
-        query = Log.objects.all()
-        
-        if cursor_timestamp is not None and cursor_id is not None:
-            # Fetch logs older than cursor using compound cursor (timestamp, id)
-            # This guarantees no duplicates even when timestamps are identical
-            query = query.filter(
-                Q(timestamp__lt=cursor_timestamp) |
-                Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+        def fetch_global_logs(cursor_timestamp, cursor_id, limit):
+            query = Log.objects.all()
+            if cursor_timestamp is not None and cursor_id is not None:
+                # Fetch logs older than cursor using compound cursor (timestamp, id)
+                # This guarantees no duplicates even when timestamps are identical
+                query = query.filter(
+                    Q(timestamp__lt=cursor_timestamp) |
+                    Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+                )
+            return list(
+                query
+                .select_related('user__user')  # Prevent N+1 queries
+                .order_by('-timestamp', '-id')  # Deterministic ordering: newest first, then highest ID
+                [:limit]
             )
         
-        # Fetch per_page + 1 to check if there are more items
-        logs_list = list(
-            query
-            .select_related('user__user')  # Prevent N+1 queries
-            .annotate(
-                reaction_count=Count('reactions', distinct=True),
-                comment_count=Count('comments', distinct=True),
-            )
-            .order_by('-timestamp', '-id')  # Deterministic ordering: newest first, then highest ID
-            [:per_page + 1]
+        logs_list, last_scanned, has_next = select_feed_page(
+            fetch_global_logs, get_seen_filter(user.id), per_page, cursor_timestamp, cursor_id,
         )
         
         # Add minimal metadata
@@ -412,33 +449,54 @@ def get_personalized_feed(request, type='network', page=1, per_page=7, cursor=No
             log.is_secondary_network = False
             log.recommendation_reason = None
         
-    else:
-        # LOCAL FEED: Simple proximity-based filtering (within 250km) + timestamp sorting
-        logs_list = get_local_feed_logs(user)
+    elif type == 'hot':
+        # HOT FEED: Keyset scan of the (-hot_score, -id) index
+        from logs.utils.trending import get_hot_logs
         
-        # Apply cursor-based filtering for local feed using compound cursor
-        if cursor_timestamp is not None and cursor_id is not None:
-            logs_list = [
-                log for log in logs_list 
-                if log.timestamp < cursor_timestamp or 
-                   (log.timestamp == cursor_timestamp and log.id < cursor_id)
-            ]
+        cursor_score = None
+        if cursor:
+            try:
+                cursor_score, cursor_id = cursor.split(',', 1)
+                cursor_score, cursor_id = float(cursor_score), int(cursor_id)
+            except (ValueError, TypeError):
+                cursor_score, cursor_id = None, None
         
-        # Limit to per_page + 1
-        logs_list = logs_list[:per_page + 1]
-    
-    # Cursor-based pagination logic
-    has_next = len(logs_list) > per_page
+        # Fetch per_page + 1 to check if there are more items
+        logs_list = get_hot_logs(cursor_score, cursor_id, limit=per_page + 1)
+        
+        for log in logs_list:
+            log.feed_type = 'hot'
+            log.is_secondary_network = False
+            log.recommendation_reason = None
+        
+    else:
+        # LOCAL FEED: Simple proximity-based filtering (within 250km) + timestamp sorting
+        # Fetch per_page + 1 to check if there are more items
+        logs_list = get_local_feed_logs(user, cursor_timestamp, cursor_id, limit=per_page + 1)
     
-    if has_next:
-        # Remove the extra item used for has_next check
-        logs_list = logs_list[:per_page]
+    # Cursor-based pagination logic (network/global pages come from select_feed_page)
+    if type not in ('network', 'global'):
+        has_next = len(logs_list) > per_page
+        
+        if has_next:
+            # Remove the extra item used for has_next check
+            logs_list = logs_list[:per_page]
+        last_scanned = logs_list[-1] if logs_list else None
     
-    # Generate next cursor from last item (compound cursor: "timestamp,id")
+    # Generate next cursor from the last log considered (compound cursor: "timestamp,id" or "hot_score,id")
     next_cursor = None
-    if has_next and logs_list:
-        last_item = logs_list[-1]
-        next_cursor = f"{last_item.timestamp.isoformat()},{last_item.id}"
+    if has_next and last_scanned is not None:
+        last_item = last_scanned
+        if type == 'hot':
+            next_cursor = f"{last_item.hot_score!r},{last_item.id}"
+        else:
+            next_cursor = f"{last_item.timestamp.isoformat()},{last_item.id}"
+    
+    # Cached shared card HTML (comments are only loaded for cards that must be rendered),
+    # then the viewer's reaction and follow state for the per-viewer overlays
+    if cards:
+        prime_log_cards(logs_list)
+    hydrate_feed_logs(logs_list, user, comments=False)
     
     # Return cursor-based response
     return {
@@ -0,0 +1,34 @@
+"""
+Rebuild the materialized friends-of-friends links from the follow table.
+
+Usage:
+    python manage.py rebuild_second_degree_links              # every user
+    python manage.py rebuild_second_degree_links --missing    # only users without links yet
+    python manage.py rebuild_second_degree_links --user alice
+"""
+from django.core.management.base import BaseCommand
+from myapp.models import SecondDegreeLink, userinfo
+from myapp.utils.social_graph import rebuild_second_degree_links
+
+
+class Command(BaseCommand):
+    help = "Rebuild second-degree network links (friends-of-friends path counts)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the links of this username")
+        parser.add_argument('--missing', action='store_true', help="Only rebuild users that have no links")
+
+    def handle(self, *args, **options):
+        users = userinfo.objects.all()
+        if options['user']:
+            users = users.filter(user__username=options['user'])
+        if options['missing']:
+            users = users.exclude(id__in=SecondDegreeLink.objects.values('user_id'))
+
+        rebuilt = 0
+        written = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            written += rebuild_second_degree_links(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} users ({written} links)"))
@@ -1,10 +1,10 @@
-from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
+from myapp.utils.presence import record_presence
 
 
 class UpdateLastSeenMiddleware(MiddlewareMixin):
     def process_view(self, request, view_func, view_args, view_kwargs):
         if request.user.is_authenticated:
-            request.user.info.last_seen = timezone.now()
-            request.user.info.save(update_fields=['last_seen'])
+            # Cached and written to the database in throttled batches (see myapp/utils/presence.py)
+            record_presence(request.user.info.pk)
         return None
\ No newline at end of file
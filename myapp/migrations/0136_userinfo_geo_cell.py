@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 18:13
+
+import math
+
+from django.db import migrations, models
+
+
+def backfill_geo_cells(apps, schema_editor):
+    # Same 1° grid as myapp.utils.geolocation.compute_geo_cell
+    userinfo = apps.get_model('myapp', 'userinfo')
+    users = list(
+        userinfo.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .only('id', 'latitude', 'longitude')
+    )
+    for user in users:
+        lat_row = int(math.floor(min(float(user.latitude), 89.999999) + 90))
+        lon_column = int(math.floor(float(user.longitude) + 180)) % 360
+        user.geo_cell = lat_row * 360 + lon_column
+    userinfo.objects.bulk_update(users, ['geo_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0135_remove_ip_geolocation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinfo',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_geo_cells, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0136_userinfo_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecondDegreeLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path_count', models.PositiveIntegerField(default=1)),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='second_degree_sources', to='myapp.userinfo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='second_degree_links', to='myapp.userinfo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-path_count'], name='myapp_secon_user_id_ad0b45_idx'), models.Index(fields=['target', 'user'], name='myapp_secon_target__283745_idx')],
+                'unique_together': {('user', 'target')},
+            },
+        ),
+    ]
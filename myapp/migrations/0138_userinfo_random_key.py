@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 18:33
+
+import random
+
+import myapp.models.users
+from django.db import migrations, models
+
+
+def backfill_random_keys(apps, schema_editor):
+    # AddField evaluates the default once; give every existing row its own key
+    userinfo = apps.get_model('myapp', 'userinfo')
+    users = list(userinfo.objects.only('id'))
+    for user in users:
+        user.random_key = random.random()
+    userinfo.objects.bulk_update(users, ['random_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0137_seconddegreelink'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinfo',
+            name='random_key',
+            field=models.FloatField(db_index=True, default=myapp.models.users.generate_random_key, editable=False),
+        ),
+        migrations.RunPython(backfill_random_keys, reverse_code=migrations.RunPython.noop),
+    ]
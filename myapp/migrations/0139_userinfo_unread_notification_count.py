@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 18:34
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    userinfo = apps.get_model('myapp', 'userinfo')
+    Notification = apps.get_model('logs', 'Notification')
+    unread = (
+        Notification.objects.filter(recipient=OuterRef('pk'), is_read=False)
+        .order_by()
+        .values('recipient')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    userinfo.objects.update(
+        unread_notification_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0138_userinfo_random_key'),
+        ('logs', '0024_log_card_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinfo',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_unread_counts, reverse_code=migrations.RunPython.noop),
+    ]
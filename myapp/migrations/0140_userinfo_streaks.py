@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 18:58
+
+from datetime import timedelta
+
+import pytz
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_activity(apps, schema_editor):
+    userinfo = apps.get_model('myapp', 'userinfo')
+    Log = apps.get_model('logs', 'Log')
+    DailyActivity = apps.get_model('logs', 'DailyActivity')
+
+    # Logs per user per local day, one aggregate per timezone in use
+    for name in userinfo.objects.values_list('timezone', flat=True).distinct():
+        try:
+            tz = pytz.timezone(name)
+        except pytz.exceptions.UnknownTimeZoneError:
+            tz = pytz.UTC
+        rows = (
+            Log.objects.filter(user__timezone=name)
+            .annotate(day=TruncDate('timestamp', tzinfo=tz))
+            .values('user_id', 'day')
+            .annotate(total=Count('id'))
+            .order_by('user_id', 'day')
+        )
+        DailyActivity.objects.bulk_create(
+            (DailyActivity(user_id=row['user_id'], date=row['day'], count=row['total']) for row in rows.iterator()),
+            batch_size=1000,
+        )
+
+    # Streaks from the rollup
+    streaks = {}  # userinfo ID -> [current, longest, last date]
+    for user_id, day in DailyActivity.objects.order_by('user_id', 'date').values_list('user_id', 'date').iterator():
+        streak = streaks.setdefault(user_id, [0, 0, None])
+        streak[0] = streak[0] + 1 if streak[2] == day - timedelta(days=1) else 1
+        streak[1] = max(streak[1], streak[0])
+        streak[2] = day
+    users = [
+        userinfo(pk=user_id, current_streak=current, max_streak=longest, streak_last_date=last_date)
+        for user_id, (current, longest, last_date) in streaks.items()
+    ]
+    userinfo.objects.bulk_update(users, ['current_streak', 'max_streak', 'streak_last_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0139_userinfo_unread_notification_count'),
+        ('logs', '0029_dailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinfo',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userinfo',
+            name='max_streak',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userinfo',
+            name='streak_last_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_daily_activity, reverse_code=migrations.RunPython.noop),
+    ]
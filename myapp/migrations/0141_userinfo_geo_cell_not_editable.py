@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0140_userinfo_streaks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userinfo',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
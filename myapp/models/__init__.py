@@ -1,2 +1,2 @@
-from .users import userinfo, education, experience, follow
+from .users import userinfo, education, experience, follow, SecondDegreeLink
 from .filter import skill, user_status, CodingStyle
\ No newline at end of file
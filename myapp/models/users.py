@@ -1,4 +1,5 @@
 from django.db import models
+import random
 import uuid
 from django.contrib.auth.models import User
 from django.urls import reverse
@@ -6,6 +7,9 @@ from .filter import skill, user_status, CodingStyle
 from phonenumber_field.modelfields import PhoneNumberField
 from django.utils import timezone
 
+def generate_random_key():
+    return random.random()
+
 class userinfo(models.Model):
     GENDER_CHOICES = [
     ('M', 'Male'),
@@ -41,6 +45,10 @@ class userinfo(models.Model):
     # Legacy fields for backward compatibility
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_index=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_index=True)
+    # Grid cell of latitude/longitude for bounding-box prefilters (see utils/geolocation.py)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    # Uniform random key for index-backed random sampling (see utils/sampling.py)
+    random_key = models.FloatField(default=generate_random_key, db_index=True, editable=False)
     website = models.URLField(blank=True, null=True)
     phone = PhoneNumberField(blank=True, null=True)
     gender = models.CharField(max_length=25, null=True, blank=True, choices=GENDER_CHOICES)
@@ -58,7 +66,13 @@ class userinfo(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     needs_profile_completion = models.BooleanField(default=False)
-    last_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)  # Written in throttled batches by myapp/utils/presence.py
+    # Denormalized unread notification count (maintained by logs/signals.py and logs/utils/notifications.py)
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
+    # Cached logging streaks (maintained from logs.DailyActivity, see logs/utils/activity.py)
+    current_streak = models.PositiveIntegerField(default=0, editable=False)
+    max_streak = models.PositiveIntegerField(default=0, editable=False)
+    streak_last_date = models.DateField(null=True, blank=True, editable=False)  # Last local day of the current streak
     timezone = models.CharField(max_length=63, default='UTC', help_text="User's timezone for displaying dates/times")
     
     def get_best_location(self):
@@ -85,11 +99,26 @@ class userinfo(models.Model):
         # No location available
         return (None, None, None)
     
+    # Columns maintained with atomic updates elsewhere; a full save() of an
+    # instance loaded earlier in the request would write back stale values
+    MAINTAINED_FIELDS = ('unread_notification_count', 'current_streak', 'max_streak', 'streak_last_date', 'last_seen')
+    
     def save(self, *args, **kwargs):
-        """Override save to sync legacy latitude/longitude fields"""
+        """Override save to sync legacy latitude/longitude fields and the geo cell"""
+        from myapp.utils.geolocation import compute_geo_cell
         lat, lon, _ = self.get_best_location()
         self.latitude = lat
         self.longitude = lon
+        self.geo_cell = compute_geo_cell(lat, lon)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Ordinary saves of an existing profile leave the maintained columns alone
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        elif update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -159,4 +188,26 @@ class follow(models.Model):
     
     class Meta:
         unique_together = ('follower', 'following') 
+
+
+class SecondDegreeLink(models.Model):
+    """
+    Materialized friends-of-friends: user -> someone -> target.
+    path_count is the number of people the user follows who follow the target
+    (mutual strength). Maintained incrementally by follow signals, see
+    utils/social_graph.py. Targets may also be direct follows.
+    """
+    user = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='second_degree_links')
+    target = models.ForeignKey(userinfo, on_delete=models.CASCADE, related_name='second_degree_sources')
+    path_count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('user', 'target')
+        indexes = [
+            models.Index(fields=['user', '-path_count']),
+            models.Index(fields=['target', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.user.username} ⇢ {self.target.user.username} ({self.path_count})"
         
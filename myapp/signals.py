@@ -1,13 +1,14 @@
 from django.dispatch import receiver
 from allauth.account.signals import user_signed_up, user_logged_in
 from django.contrib.auth.models import User
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, pre_delete, pre_save
 from myapp.models import userinfo, education 
 from django.dispatch import receiver
-from django.core.files.storage import default_storage
+from logs.utils import outbox
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
-from .models import userinfo, education
+from .models import userinfo, education, follow
+from .utils.social_graph import add_follow_paths, remove_follow_paths, remove_user_paths
 
 @receiver(post_save, sender=User)
 def create_related_user_models(sender, instance, created, **kwargs):
@@ -21,10 +22,13 @@ def handle_new_social_signup(request, user, **kwargs):
         user.info.needs_profile_completion = True
         user.info.save()
 
+# Storage calls for replaced/deleted profile images run in the outbox worker
 @receiver(pre_save, sender=userinfo)
-def delete_old_userinfo_profile_image(sender, instance, **kwargs):
+def delete_old_userinfo_profile_image(sender, instance, update_fields=None, **kwargs):
     if not instance.pk:  # If this is a new instance, skip
         return
+    if update_fields is not None and 'profile_image' not in update_fields:
+        return  # Partial save that cannot change the image
     
     try:
         old_instance = userinfo.objects.only('profile_image').get(pk=instance.pk)
@@ -34,15 +38,38 @@ def delete_old_userinfo_profile_image(sender, instance, **kwargs):
     # Skip if old profile_image is empty or the default
     if (old_instance.profile_image and old_instance.profile_image.name and 
         old_instance.profile_image != instance.profile_image and 
-        old_instance.profile_image.name != old_instance.profile_image.field.default and 
-        default_storage.exists(old_instance.profile_image.name)):
-        default_storage.delete(old_instance.profile_image.name)
+        old_instance.profile_image.name != old_instance.profile_image.field.default):
+        # Queued in post_save, once the new image is saved
+        instance._replaced_profile_image = old_instance.profile_image.name
+
+@receiver(post_save, sender=userinfo)
+def queue_replaced_profile_image_deletion(sender, instance, **kwargs):
+    name = instance.__dict__.pop('_replaced_profile_image', None)
+    if name:
+        outbox.enqueue('delete_file', name=name)
         
 @receiver(post_delete, sender=userinfo)
 def delete_userinfo_profile_image_on_delete(sender, instance, **kwargs):
     # Skip if profile_image is empty or the default
     if (instance.profile_image and instance.profile_image.name and 
         instance.profile_image.name != instance.profile_image.field.default):
-        if default_storage.exists(instance.profile_image.name):
-            default_storage.delete(instance.profile_image.name)
-            
\ No newline at end of file
+        outbox.enqueue('delete_file', name=instance.profile_image.name)
+            
+
+# Second-degree network (friends-of-friends) maintenance.
+# These run before the timeline receivers in logs/signals.py (myapp is
+# installed first), which read the updated links.
+@receiver(post_save, sender=follow)
+def add_second_degree_paths(sender, instance, created, **kwargs):
+    if created:
+        add_follow_paths(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=follow)
+def remove_second_degree_paths(sender, instance, origin=None, **kwargs):
+    # Follows cascaded from an account deletion are handled in remove_user_second_degree_paths
+    if isinstance(origin, follow) or getattr(origin, 'model', None) is follow:
+        remove_follow_paths(instance.follower_id, instance.following_id)
+
+@receiver(pre_delete, sender=userinfo)
+def remove_user_second_degree_paths(sender, instance, **kwargs):
+    remove_user_paths(instance.id)
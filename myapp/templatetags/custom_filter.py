@@ -1,8 +1,7 @@
 from django import template
 from myapp.models import follow
+from myapp.utils.presence import is_recent
 import urllib.parse
-from django.utils import timezone
-from datetime import timedelta
 from django.utils.timesince import timesince
 
 register = template.Library()
@@ -17,10 +16,7 @@ def lstrip(value):
 
 @register.filter
 def is_online(last_seen):
-    if not last_seen:
-        return False
-    now = timezone.now()
-    return now - last_seen < timedelta(minutes=5)
+    return is_recent(last_seen)
 
 @register.filter
 def get_item(dictionary, key):
@@ -1,3 +1,484 @@
-from django.test import TestCase
+import io
+import math
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from logs.models import Log, Reaction
+from myapp.algorithms import _get_followed_by, _get_secondary_recommendation_reason, get_local_feed_logs
+from myapp.models import SecondDegreeLink, follow, userinfo
+from myapp.utils import presence, spatial_index
+from myapp.utils.geolocation import compute_geo_cell, geo_cells_within_q
+from myapp.utils.recommendations import get_recommended_developers
+from myapp.utils.sampling import random_sample
+from myapp.utils.spatial_index import to_unit_vector
 
-# Create your tests here.
+
+def make_user(username, latitude=None, longitude=None):
+    user = User.objects.create_user(username, f'{username}@example.com', 'password')
+    info = userinfo.objects.get_or_create(user=user)[0]
+    if latitude is not None:
+        info.browser_latitude = Decimal(str(latitude))
+        info.browser_longitude = Decimal(str(longitude))
+        info.browser_location_updated_at = timezone.now()
+        info.save()
+    return info
+
+
+class LocalFeedTests(TestCase):
+    """Geo cell prefilter and keyset scan of the Local feed"""
+
+    def setUp(self):
+        self.viewer = make_user('viewer', 52.52, 13.40)  # Berlin
+        self.nearby = make_user('nearby', 52.39, 13.06)  # Potsdam, ~30 km
+        self.corner = make_user('corner', 54.60, 17.00)  # Inside the bounding box, ~330 km
+        self.far = make_user('far', 48.86, 2.35)  # Paris
+
+    def test_save_keeps_geo_cell_in_sync(self):
+        self.assertEqual(self.viewer.geo_cell, compute_geo_cell(52.52, 13.40))
+        self.viewer.browser_latitude = self.viewer.browser_longitude = None
+        self.viewer.save()
+        self.assertIsNone(userinfo.objects.get(pk=self.viewer.pk).geo_cell)
+
+    def test_cells_wrap_around_the_antimeridian(self):
+        east = make_user('east', 10.0, 179.6)
+        west = make_user('west', 10.0, -179.6)
+        cells = userinfo.objects.filter(geo_cells_within_q(10.0, 179.6, 250))
+        self.assertTrue({east, west} <= set(cells))
+
+    def test_only_logs_within_the_radius(self):
+        expected = [Log.objects.create(user=self.nearby, content='near')]
+        for author in (self.corner, self.far, self.viewer):
+            Log.objects.create(user=author, content='elsewhere')
+
+        prefiltered = userinfo.objects.filter(geo_cells_within_q(52.52, 13.40, 250))
+        self.assertIn(self.corner, prefiltered)  # Dropped by the exact distance check
+        self.assertNotIn(self.far, prefiltered)
+
+        logs = get_local_feed_logs(self.viewer)
+        self.assertEqual(logs, expected)
+        self.assertLess(logs[0].distance_km, 40)
+        self.assertEqual(logs[0].feed_type, 'local')
+
+    def test_scan_continues_past_out_of_radius_candidates(self):
+        older = [Log.objects.create(user=self.nearby, content=f'near {i}') for i in range(3)]
+        for i in range(30):  # More than one scan batch of prefilter-only matches
+            Log.objects.create(user=self.corner, content=f'corner {i}')
+        newer = Log.objects.create(user=self.nearby, content='newest')
+
+        first = get_local_feed_logs(self.viewer, limit=2)
+        self.assertEqual(first, [newer, older[2]])
+        last = first[-1]
+        second = get_local_feed_logs(self.viewer, last.timestamp, last.pk, limit=2)
+        self.assertEqual(second, [older[1], older[0]])
+
+
+class DeveloperKDTreeTests(SimpleTestCase):
+    """Nearest-neighbour queries on the spatial index"""
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.coordinates = {
+            user_id: (rng.uniform(-90, 90), rng.uniform(-180, 180)) for user_id in range(1, 400)
+        }
+        self.coordinates[400] = (89.9, 10.0)  # Near the pole
+        self.coordinates[401] = (0.0, -179.9)  # Across the antimeridian
+        self.index = spatial_index.DeveloperIndex(
+            (user_id, to_unit_vector(lat, lon)) for user_id, (lat, lon) in self.coordinates.items()
+        )
+
+    def brute_force(self, latitude, longitude, k, max_distance_km=None, exclude_ids=()):
+        query = to_unit_vector(latitude, longitude)
+        distances = sorted(
+            (spatial_index.chord_to_km(math.dist(query, to_unit_vector(lat, lon))), user_id)
+            for user_id, (lat, lon) in self.coordinates.items()
+            if user_id not in exclude_ids
+        )
+        if max_distance_km is not None:
+            distances = [row for row in distances if row[0] <= max_distance_km]
+        return [user_id for _, user_id in distances[:k]]
+
+    def test_matches_brute_force(self):
+        for latitude, longitude in ((52.5, 13.4), (-33.9, 151.2), (89.0, -120.0), (0.0, 179.9)):
+            found = self.index.nearest(latitude, longitude, k=5, exclude_ids={1, 2})
+            self.assertEqual([user_id for user_id, _ in found], self.brute_force(latitude, longitude, 5, exclude_ids={1, 2}))
+            self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+
+    def test_radius_and_overlay(self):
+        self.assertEqual([user_id for user_id, _ in self.index.nearest(0.0, 179.95, k=1)], [401])
+        self.index.upsert(500, 0.0, 179.96)
+        self.index.remove(401)
+        found = self.index.nearest(0.0, 179.95, k=3, max_distance_km=50)
+        self.assertEqual([user_id for user_id, _ in found], [500])
+        self.assertLess(found[0][1], 2)
+
+
+class DeveloperIndexRebuildTests(SimpleTestCase):
+    """Background rebuilds of the process-local spatial index"""
+
+    def setUp(self):
+        self.points = [(1, to_unit_vector(52.52, 13.40)), (2, to_unit_vector(48.86, 2.35))]
+        self.loading = threading.Event()
+        self.release = threading.Event()
+        self.block_load = False
+        patcher = mock.patch.object(spatial_index, '_load_points', side_effect=self.load_points)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.reset_index)
+        self.reset_index()
+
+    def reset_index(self):
+        spatial_index._index = None
+        spatial_index._rebuilding = False
+        spatial_index._rebuild_changes = None
+
+    def load_points(self):
+        points = list(self.points)
+        if self.block_load:
+            self.loading.set()
+            self.release.wait(5)
+        return points
+
+    def wait_for_rebuild(self):
+        for thread in threading.enumerate():
+            if thread.name == 'developer-index-rebuild':
+                thread.join(5)
+
+    def nearest_ids(self, index):
+        return [user_id for user_id, _ in index.nearest(50.0, 8.0, k=10)]
+
+    def test_first_build_is_synchronous(self):
+        index = spatial_index.get_developer_index()
+        self.assertEqual(len(index), 2)
+        self.assertIs(spatial_index.get_developer_index(), index)
+
+    def test_stale_index_serves_while_rebuilding(self):
+        old = spatial_index.get_developer_index()
+        self.points.append((3, to_unit_vector(50.11, 8.68)))
+        self.block_load = True
+
+        with mock.patch.object(spatial_index, 'INDEX_MAX_AGE_SECONDS', -1):
+            self.assertIs(spatial_index.get_developer_index(), old)
+            self.assertTrue(self.loading.wait(5))
+            # Still served, and no second rebuild is started
+            self.assertIs(spatial_index.get_developer_index(), old)
+            self.assertEqual(spatial_index._load_points.call_count, 2)
+
+            # Writes during the rebuild reach the old overlay and the new index
+            spatial_index.update_developer_location(4, 50.0, 8.0)
+            spatial_index.update_developer_location(2, None, None)
+            self.assertEqual(self.nearest_ids(old), [4, 1])
+
+            self.release.set()
+            self.wait_for_rebuild()
+
+        new = spatial_index._index
+        self.assertIsNot(new, old)
+        self.assertEqual(self.nearest_ids(new), [4, 3, 1])
+        self.assertFalse(spatial_index._rebuilding)
+
+    def test_failed_rebuild_keeps_old_index(self):
+        old = spatial_index.get_developer_index()
+        spatial_index._load_points.side_effect = RuntimeError('database unavailable')
+
+        with mock.patch.object(spatial_index, 'INDEX_MAX_AGE_SECONDS', -1):
+            self.assertIs(spatial_index.get_developer_index(), old)
+            self.wait_for_rebuild()
+
+        self.assertIs(spatial_index._index, old)
+        self.assertFalse(spatial_index._rebuilding)
+        self.assertIsNone(spatial_index._rebuild_changes)
+
+
+class SecondDegreeLinkTests(TestCase):
+    """Incremental maintenance of the materialized friends-of-friends links"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [make_user(f'user{i}') for i in range(6)]
+
+    def expected_links(self):
+        following = {}
+        for follower_id, following_id in follow.objects.values_list('follower_id', 'following_id'):
+            following.setdefault(follower_id, set()).add(following_id)
+        links = {}
+        for user_id, middle_ids in following.items():
+            for middle_id in middle_ids:
+                for target_id in following.get(middle_id, ()):
+                    if target_id != user_id:
+                        links[(user_id, target_id)] = links.get((user_id, target_id), 0) + 1
+        return links
+
+    def stored_links(self):
+        return {(user_id, target_id): count for user_id, target_id, count in
+                SecondDegreeLink.objects.values_list('user_id', 'target_id', 'path_count')}
+
+    def test_random_follows_and_unfollows_match_the_graph(self):
+        rng = random.Random(6)
+        for _ in range(60):
+            follower, following = rng.sample(self.users, 2)
+            relation = follow.objects.filter(follower=follower, following=following).first()
+            if relation:
+                relation.delete()
+            else:
+                follow.objects.create(follower=follower, following=following)
+            self.assertEqual(self.stored_links(), self.expected_links())
+
+    def test_account_deletion_drops_paths_through_it(self):
+        a, b, c, d = self.users[:4]
+        for follower, following in ((a, b), (b, c), (a, d), (d, c), (c, a)):
+            follow.objects.create(follower=follower, following=following)
+        self.assertEqual(self.stored_links()[(a.pk, c.pk)], 2)
+
+        d.user.delete()
+        self.assertEqual(self.stored_links(), self.expected_links())
+        self.assertEqual(self.stored_links()[(a.pk, c.pk)], 1)
+
+    def test_rebuild_command_fills_missing_users(self):
+        a, b, c = self.users[:3]
+        follow.objects.create(follower=a, following=b)
+        follow.objects.create(follower=b, following=c)
+        SecondDegreeLink.objects.all().delete()
+
+        call_command('rebuild_second_degree_links', '--missing', stdout=io.StringIO())
+        self.assertEqual(self.stored_links(), self.expected_links())
+
+    def test_recommendation_reason_counts_people_you_follow(self):
+        me, target = self.users[:2]
+        for middle in self.users[2:4]:
+            follow.objects.create(follower=me, following=middle)
+            follow.objects.create(follower=middle, following=target)
+
+        recommendations = get_recommended_developers(me, use_cache=False)
+        reasons = {candidate.pk: reason for candidate, _, reason in recommendations}
+        self.assertEqual(reasons[target.pk], 'Followed by 2 people you follow')
+
+
+class FollowedByLabelTests(TestCase):
+    """One-query "followed by" labels for secondary-network authors"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('viewer')
+        self.friends = [make_user(f'friend{i}') for i in range(4)]
+        self.authors = [make_user(f'author{i}') for i in range(3)]
+        for friend in self.friends:
+            follow.objects.create(follower=self.viewer, following=friend)
+        # author0 is followed by all four friends, author1 by one, author2 by none
+        for friend in self.friends:
+            follow.objects.create(follower=friend, following=self.authors[0])
+        follow.objects.create(follower=self.friends[2], following=self.authors[1])
+        self.primary_ids = {friend.pk for friend in self.friends}
+
+    def test_whole_page_in_one_query_then_cached(self):
+        author_ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            followed_by = _get_followed_by(self.viewer, author_ids, self.primary_ids)
+        self.assertEqual(followed_by, {
+            self.authors[0].pk: (['friend0', 'friend1', 'friend2'], 4),
+            self.authors[1].pk: (['friend2'], 1),
+            self.authors[2].pk: ([], 0),
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(_get_followed_by(self.viewer, author_ids, self.primary_ids), followed_by)
+
+    def test_label_text(self):
+        labels = [
+            _get_secondary_recommendation_reason(names, total, self.primary_ids)['text']
+            for names, total in ((['ann'], 1), (['ann', 'bob'], 2), (['ann', 'bob', 'cy'], 4), ([], 0))
+        ]
+        self.assertEqual(labels, ['@ann follows', '@ann and @bob follow', '@ann and 3 others follow', 'Suggested for you'])
+
+
+class FeedApiTests(TestCase):
+    """Compact versioned JSON feed with ETag revalidation"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('viewer')
+        self.author = make_user('author')
+        follow.objects.create(follower=self.viewer, following=self.author)
+        self.logs = [Log.objects.create(user=self.author, content=f'log {i}') for i in range(3)]
+        self.client.force_login(self.viewer.user)
+        # Requests queue last_seen writes for the process; don't flush them at exit
+        self.addCleanup(presence._pending.clear)
+
+    def get(self, **headers):
+        return self.client.get(reverse('feed_api'), {'feed': 'network', 'limit': 2}, headers=headers)
+
+    def test_compact_page_with_author_table(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload['version'], 1)
+        self.assertEqual([log['sig'] for log in payload['logs']], [self.logs[2].sig, self.logs[1].sig])
+        self.assertEqual({log['author'] for log in payload['logs']}, {self.author.pk})
+        self.assertEqual(payload['authors'], {str(self.author.pk): {
+            'username': 'author', 'name': 'author', 'avatar': self.author.profile_image.url, 'following': True,
+        }})
+        self.assertTrue(payload['has_next'])
+
+        next_page = self.client.get(reverse('feed_api'), {'feed': 'network', 'limit': 2, 'cursor': payload['next_cursor']})
+        self.assertEqual([log['sig'] for log in next_page.json()['logs']], [self.logs[0].sig])
+
+    def test_unchanged_page_revalidates_to_304(self):
+        etag = self.get()['ETag']
+        not_modified = self.get(if_none_match=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        Reaction.objects.create(user=self.viewer, mindlog=self.logs[2], emoji='🚀')
+        changed = self.get(if_none_match=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['logs'][0]['my_reaction'], '🚀')
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_invalid_limit(self):
+        response = self.client.get(reverse('feed_api'), {'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RandomSampleTests(TestCase):
+    """Index-backed random sampling by random_key"""
+
+    def setUp(self):
+        self.users = [make_user(f'user{i}') for i in range(20)]
+        self.queryset = userinfo.objects.all()
+
+    def test_sample_is_distinct_and_filtered(self):
+        excluded = {user.pk for user in self.users[:5]}
+        with CaptureQueriesContext(connection) as queries:
+            sample = random_sample(self.queryset.exclude(pk__in=excluded), 8)
+        self.assertEqual(len(sample), 8)
+        self.assertEqual(len({user.pk for user in sample}), 8)
+        self.assertFalse(excluded & {user.pk for user in sample})
+        self.assertFalse(any('RANDOM()' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_probes_wrap_around_the_key_range(self):
+        with mock.patch('myapp.utils.sampling.random.random', return_value=0.9999999):
+            self.assertEqual(len(random_sample(self.queryset, 6)), 6)
+
+    def test_small_queryset_returns_everything(self):
+        few = self.queryset.filter(pk__in=[user.pk for user in self.users[:3]])
+        self.assertEqual(set(random_sample(few, 10)), set(self.users[:3]))
+        self.assertEqual(random_sample(self.queryset, 0), [])
+
+    def test_every_row_can_be_picked(self):
+        # Evenly spread keys; a row is picked when a probe lands in the gap before it
+        for index, user in enumerate(self.users):
+            userinfo.objects.filter(pk=user.pk).update(random_key=index / len(self.users))
+        picked = set()
+        for _ in range(200):
+            picked.update(user.pk for user in random_sample(self.queryset, 3))
+        self.assertEqual(picked, {user.pk for user in self.users})
+
+
+class PresenceTests(TestCase):
+    """Throttled last_seen: cache refreshes, batched writes and online checks"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [make_user(f'user{i}') for i in range(2)]
+        self.earlier = timezone.now() - timedelta(hours=1)
+        userinfo.objects.update(last_seen=self.earlier)
+        for user in self.users:
+            user.refresh_from_db()
+        # Other tests' requests leave state behind for reused ids
+        presence._pending.clear()
+        presence._refreshed.clear()
+        self.addCleanup(presence._pending.clear)
+        self.addCleanup(presence._refreshed.clear)
+        # No flush is due unless a test asks for one
+        flush_clock = mock.patch.object(presence, '_last_flush', time.monotonic())
+        flush_clock.start()
+        self.addCleanup(flush_clock.stop)
+
+    def persisted_last_seen(self, user):
+        return userinfo.objects.get(pk=user.pk).last_seen
+
+    def test_requests_only_touch_the_cache(self):
+        with self.assertNumQueries(0):
+            presence.record_presence(self.users[0].pk)
+            first = cache.get(presence._cache_key(self.users[0].pk))
+            presence.record_presence(self.users[0].pk)
+
+        # Throttled: the second request within PRESENCE_CACHE_REFRESH didn't refresh the entry
+        self.assertEqual(cache.get(presence._cache_key(self.users[0].pk)), first)
+        self.assertEqual(presence._pending, {self.users[0].pk: first})
+        self.assertEqual(self.persisted_last_seen(self.users[0]), self.earlier)
+
+    def test_flush_writes_queued_users_in_one_update(self):
+        for user in self.users:
+            presence.record_presence(user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(presence.flush_presence(), 2)
+
+        for user in self.users:
+            self.assertGreater(self.persisted_last_seen(user), self.earlier)
+        self.assertEqual(presence._pending, {})
+
+    def test_recently_persisted_users_are_skipped(self):
+        presence.record_presence(self.users[0].pk)
+        presence.flush_presence()
+        written = self.persisted_last_seen(self.users[0])
+
+        presence._refreshed.clear()
+        presence.record_presence(self.users[0].pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(presence.flush_presence(), 0)
+        self.assertEqual(self.persisted_last_seen(self.users[0]), written)
+
+    def test_failed_flush_is_retried(self):
+        presence.record_presence(self.users[0].pk)
+        queued = dict(presence._pending)
+
+        with mock.patch.object(userinfo.objects, 'bulk_update', side_effect=DatabaseError('down')):
+            with self.assertLogs(presence.logger, 'ERROR'):
+                self.assertEqual(presence.flush_presence(), 0)
+
+        # Requeued and no persist marker, so the next flush writes it
+        self.assertEqual(presence._pending, queued)
+        self.assertEqual(presence.flush_presence(), 1)
+        self.assertEqual(self.persisted_last_seen(self.users[0]), queued[self.users[0].pk])
+
+    def test_request_flushes_when_due(self):
+        presence._last_flush = time.monotonic() - presence.PRESENCE_FLUSH_SECONDS
+
+        presence.record_presence(self.users[0].pk)
+
+        self.assertEqual(presence._pending, {})
+        self.assertGreater(self.persisted_last_seen(self.users[0]), self.earlier)
+
+    def test_online_check_prefers_the_cache(self):
+        online, offline = self.users
+        self.assertFalse(presence.is_online(online))
+
+        presence.record_presence(online.pk)
+
+        self.assertTrue(presence.is_online(online))
+        self.assertFalse(presence.is_online(offline))
+        last_seen = presence.get_last_seen_many([online, offline])
+        self.assertEqual(last_seen[offline.pk], self.earlier)
+
+        # An expired cache entry falls back to the persisted column
+        cache.clear()
+        self.assertFalse(presence.is_online(online))
+
+    def test_middleware_records_authenticated_requests(self):
+        self.client.force_login(self.users[0].user)
+
+        self.client.get(reverse('contribute_page'))
+
+        self.assertIn(self.users[0].pk, presence._pending)
+        self.assertTrue(presence.is_online(self.users[0]))
@@ -5,24 +5,39 @@ import pytz
 from django.utils import timezone as django_timezone
 
 
-def get_user_timezone(user):
+def get_timezone(name):
     """
-    Get user's timezone object.
+    Get a timezone object by name, falling back to UTC.
     
     Args:
-        user: Django User object (should have .info attribute)
+        name: Timezone name (e.g. userinfo.timezone)
     
     Returns:
         pytz timezone object
     """
-    if user and hasattr(user, 'info') and user.info.timezone:
+    if name:
         try:
-            return pytz.timezone(user.info.timezone)
+            return pytz.timezone(name)
         except pytz.exceptions.UnknownTimeZoneError:
             pass
     return pytz.UTC
 
 
+def get_user_timezone(user):
+    """
+    Get user's timezone object.
+    
+    Args:
+        user: Django User object (should have .info attribute)
+    
+    Returns:
+        pytz timezone object
+    """
+    if user and hasattr(user, 'info'):
+        return get_timezone(user.info.timezone)
+    return pytz.UTC
+
+
 def to_user_timezone(dt, user):
     """
     Convert UTC datetime to user's local timezone.
@@ -13,6 +13,7 @@ urlpatterns = [
     path("skills/<uuid:uuid>", views.signup_skills, name="signup_skills"),
     path("", views.home_page, name="index"),
     path('load-more-feed/', views.load_more_feed, name='load_more_feed'),
+    path('api/v1/feed/', views.feed_api, name='feed_api'),
     path('feed/log/<str:log_sig>/', views.view_log_in_feed, name='view_log_in_feed'),
     
     path("explore-dev/", views.explore_dev, name="explore_dev"),
@@ -39,6 +40,7 @@ urlpatterns = [
     path('notifications/load-more/', views.load_more_notifications, name='load_more_notifications'),
     path('notifications/mark-all-read/', views.mark_all_read, name='mark_all_read'),
     path('notifications/count/', views.get_notification_count_api, name='get_notification_count'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('notifications/<int:notification_id>/mark-read/', views.mark_notification_read, name='mark_notification_read'),
     
     # Geolocation (browser-only)
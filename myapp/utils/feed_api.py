@@ -0,0 +1,81 @@
+"""
+Compact JSON feed API - log records plus a deduplicated author table.
+
+Used by /api/v1/feed/. Each log record carries only ids, content and counts;
+author details appear once per page in the `authors` table. Responses carry
+an ETag of the body, so a client revalidating an unchanged page with
+If-None-Match gets an empty 304.
+"""
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, set_response_etag
+
+# Configuration
+FEED_API_VERSION = 1
+FEED_API_MAX_LIMIT = 50
+COMPACT_JSON = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def serialize_log(log, viewer=None):
+    """
+    Compact record of one feed log (hydrated with hydrate_feed_logs).
+
+    Returns:
+        Dictionary of JSON-serializable fields
+    """
+    reaction = log.get_user_reaction(viewer) if viewer is not None else None
+    reason = getattr(log, 'recommendation_reason', None)
+    return {
+        'sig': log.sig,
+        'author': log.user_id,
+        'ts': log.timestamp.isoformat(),
+        'content': log.content,
+        'code': log.code_snippet or None,
+        'link': log.link or None,
+        'image': log.snap_shot.url if log.snap_shot else None,
+        'reactions': log.get_reaction_counts(),
+        'comments': log.total_comments(),
+        'my_reaction': reaction.emoji if reaction else None,
+        'reason': reason['text'] if reason else None,
+    }
+
+
+def serialize_author(author, viewer_follows=False):
+    return {
+        'username': author.user.username,
+        'name': author.user.get_full_name() or author.user.username,
+        'avatar': author.profile_image.url if author.profile_image else None,
+        'following': viewer_follows,
+    }
+
+
+def serialize_feed_page(feed_result, viewer=None):
+    """
+    Build the API payload for one page returned by get_personalized_feed.
+
+    Returns:
+        Dictionary with 'version', 'logs', 'authors', 'next_cursor', 'has_next'
+    """
+    logs = feed_result['items']
+    authors = {}
+    for log in logs:
+        if log.user_id not in authors:
+            authors[log.user_id] = serialize_author(log.user, getattr(log, 'viewer_follows_author', False))
+
+    return {
+        'version': FEED_API_VERSION,
+        'logs': [serialize_log(log, viewer) for log in logs],
+        'authors': {str(author_id): author for author_id, author in authors.items()},
+        'next_cursor': feed_result['next_cursor'],
+        'has_next': feed_result['has_next'],
+    }
+
+
+def conditional_json_response(request, data):
+    """
+    Compact JsonResponse with an ETag of its body; 304 if the client already has it.
+    """
+    response = JsonResponse(data, json_dumps_params=COMPACT_JSON)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Cookie'])
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
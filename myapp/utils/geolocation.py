@@ -12,8 +12,10 @@ Rules:
 """
 
 import logging
+import math
 from datetime import timedelta
 from decimal import Decimal
+from django.db.models import Q
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,81 @@ logger = logging.getLogger(__name__)
 # Freshness interval - 24 hours
 LOCATION_FRESHNESS_HOURS = 24
 
+# Grid cells for bounding-box prefilters (userinfo.geo_cell)
+GEO_CELL_DEGREES = 1  # 1° x 1° cells (~111 km of latitude)
+GEO_CELL_COLUMNS = 360 // GEO_CELL_DEGREES
+KM_PER_DEGREE_LAT = 111.32
+
+
+def compute_geo_cell(latitude, longitude):
+    """
+    Get the grid cell index of a coordinate.
+    Cells are numbered row by row: lat_row * GEO_CELL_COLUMNS + lon_column.
+    
+    Returns:
+        int cell index, or None if the coordinate is missing
+    """
+    if latitude is None or longitude is None:
+        return None
+    lat_row = int(math.floor((min(float(latitude), 89.999999) + 90) / GEO_CELL_DEGREES))
+    lon_column = int(math.floor((float(longitude) + 180) / GEO_CELL_DEGREES)) % GEO_CELL_COLUMNS
+    return lat_row * GEO_CELL_COLUMNS + lon_column
+
+
+def geo_cells_within_q(latitude, longitude, radius_km, field='geo_cell'):
+    """
+    Build a Q filter matching every grid cell that intersects the bounding box
+    of a circle. One contiguous cell range per latitude row, so the filter is
+    a handful of index range scans. Exact distances still need to be checked.
+    
+    Args:
+        latitude, longitude: Center of the circle
+        radius_km: Radius in kilometers
+        field: Lookup path of the geo_cell column (e.g. 'user__geo_cell')
+    
+    Returns:
+        Q object
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 89.999999)
+    
+    # Widest longitude span is at the latitude closest to a pole
+    widest_lat = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest_lat))
+    lon_delta = 180.0 if cos_lat < 1e-6 else radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    
+    if lon_delta >= 180.0:
+        column_ranges = [(0, GEO_CELL_COLUMNS - 1)]
+    else:
+        first_column = int(math.floor((longitude - lon_delta + 180) / GEO_CELL_DEGREES))
+        last_column = int(math.floor((longitude + lon_delta + 180) / GEO_CELL_DEGREES))
+        if last_column - first_column + 1 >= GEO_CELL_COLUMNS:
+            column_ranges = [(0, GEO_CELL_COLUMNS - 1)]
+        elif first_column < 0:
+            # Box crosses the antimeridian on the west side
+            column_ranges = [(first_column + GEO_CELL_COLUMNS, GEO_CELL_COLUMNS - 1), (0, last_column)]
+        elif last_column >= GEO_CELL_COLUMNS:
+            # Box crosses the antimeridian on the east side
+            column_ranges = [(first_column, GEO_CELL_COLUMNS - 1), (0, last_column - GEO_CELL_COLUMNS)]
+        else:
+            column_ranges = [(first_column, last_column)]
+    
+    first_row = int(math.floor((min_lat + 90) / GEO_CELL_DEGREES))
+    last_row = int(math.floor((max_lat + 90) / GEO_CELL_DEGREES))
+    
+    cells_q = Q()
+    for row in range(first_row, last_row + 1):
+        for first, last in column_ranges:
+            cells_q |= Q(**{
+                f'{field}__gte': row * GEO_CELL_COLUMNS + first,
+                f'{field}__lte': row * GEO_CELL_COLUMNS + last,
+            })
+    return cells_q
+
 
 def is_location_fresh(user_info):
     """
@@ -84,9 +161,16 @@ def update_location(user_info, latitude, longitude):
             'browser_location_updated_at',
             'browser_permission_status',
             'latitude',
-            'longitude'
+            'longitude',
+            'geo_cell'
         ])
         
+        # Move the user in this process's nearby-developers index
+        from .nearby_developers import invalidate_nearby_cache
+        from .spatial_index import update_developer_location
+        update_developer_location(user_info.id, user_info.latitude, user_info.longitude)
+        invalidate_nearby_cache(user_info)
+        
         logger.info(f"Updated location for user {user_info.user.username}: ({latitude}, {longitude})")
         return True
         
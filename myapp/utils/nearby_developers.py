@@ -3,11 +3,9 @@ Nearby Developers Feature
 Identifies and ranks geographically closest developers to a user for the Local tab.
 Includes diversity filtering to ensure varied results.
 """
-from django.db.models import Q, Count, Prefetch
 from django.core.cache import cache
 from myapp.models import userinfo, follow
-from myapp.algorithms import haversine_distance
-from decimal import Decimal
+from myapp.utils.spatial_index import get_developer_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +13,7 @@ logger = logging.getLogger(__name__)
 # Configuration
 MAX_DISTANCE_KM = 500  # Maximum distance to consider (km)
 CACHE_TTL_SECONDS = 600  # Cache results for 10 minutes
+CANDIDATES_PER_RESULT = 6  # Nearest neighbours fetched per result, headroom for the diversity filter
 
 
 def get_nearby_developers(user, limit=10, exclude_following=False):
@@ -48,28 +47,26 @@ def get_nearby_developers(user, limit=10, exclude_following=False):
         logger.debug(f'Cache hit for nearby developers: user {user.id}')
         return cached
     
-    # Get candidate pool - users with coordinates
-    candidates = _get_candidate_pool(user, exclude_following)
-    
-    # Calculate distances
-    scored_candidates = []
-    for candidate in candidates:
-        if not candidate.latitude or not candidate.longitude:
-            continue
-        
-        distance = haversine_distance(
-            user_lat, user_lon,
-            float(candidate.latitude), float(candidate.longitude)
+    # Nearest candidates across the whole user base from the spatial index
+    exclude_ids = {user.id}
+    if exclude_following:
+        exclude_ids.update(
+            follow.objects.filter(follower=user).values_list('following_id', flat=True)
         )
-        
-        # Skip if too far
-        if distance > MAX_DISTANCE_KM:
-            continue
-        
-        scored_candidates.append((candidate, distance))
+    nearest = get_developer_index().nearest(
+        user_lat, user_lon,
+        k=limit * CANDIDATES_PER_RESULT,
+        max_distance_km=MAX_DISTANCE_KM,
+        exclude_ids=exclude_ids,
+    )
     
-    # Sort by distance (ascending - closest first)
-    scored_candidates.sort(key=lambda x: x[1])
+    # Load candidates, keeping the nearest-first order
+    candidates = _get_candidates(candidate_id for candidate_id, _ in nearest)
+    scored_candidates = [
+        (candidates[candidate_id], distance)
+        for candidate_id, distance in nearest
+        if candidate_id in candidates
+    ]
     
     # Apply diversity filter
     diverse_results = _apply_diversity_filter(scored_candidates, limit * 3)
@@ -84,31 +81,25 @@ def get_nearby_developers(user, limit=10, exclude_following=False):
     return results
 
 
-def _get_candidate_pool(user, exclude_following=False):
+def _get_candidates(candidate_ids):
     """
-    Get pool of candidate developers with coordinates.
-    """
-    # Base queryset - exclude self, only users with coordinates
-    candidates = userinfo.objects.exclude(id=user.id).filter(
-        user__is_active=True,
-        latitude__isnull=False,
-        longitude__isnull=False
-    ).select_related(
-        'user',
-        'coding_style'
-    ).prefetch_related(
-        'skills'
-    )
-    
-    # Optionally exclude already following
-    if exclude_following:
-        following_ids = follow.objects.filter(
-            follower=user
-        ).values_list('following_id', flat=True)
-        candidates = candidates.exclude(id__in=following_ids)
+    Load candidate developers by ID.
     
-    # Limit candidate pool for performance
-    return candidates[:200]
+    Returns:
+        Dictionary of userinfo ID -> userinfo
+    """
+    return {
+        candidate.id: candidate
+        for candidate in userinfo.objects.filter(
+            id__in=list(candidate_ids),
+            user__is_active=True,
+        ).select_related(
+            'user',
+            'coding_style'
+        ).prefetch_related(
+            'skills'
+        )
+    }
 
 
 def _apply_diversity_filter(scored_candidates, target_count):
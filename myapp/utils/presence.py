@@ -0,0 +1,178 @@
+"""
+Presence - throttled last-seen tracking and online checks.
+
+Every authenticated request marks its user as seen (UpdateLastSeenMiddleware).
+Writing userinfo.last_seen each time costs a row UPDATE per request, polling
+and view beacons included. Instead:
+
+- The latest timestamp lives in the cache (presence:{id}), refreshed at most
+  every PRESENCE_CACHE_REFRESH seconds per user and process.
+- Refreshed users are queued in the process and written in one bulk UPDATE
+  once per PRESENCE_FLUSH_SECONDS (by the next request of the process, and
+  at process exit). Users written within the last PRESENCE_PERSIST_INTERVAL
+  carry a cache marker and are skipped; the marker is only set once their
+  write succeeded, so a failed or never-run flush doesn't suppress the next one.
+- Online checks read the cache first and fall back to the column, so a user
+  whose cache entry expired is judged by the persisted timestamp.
+
+The cache is what processes share: with a shared backend (CACHES pointing at
+Redis or Memcached) every process sees the same timestamps and markers. The
+default LocMemCache is per process, so each process then writes a user's
+last_seen once per interval and online checks only see requests served by
+the same process (otherwise the persisted column).
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from myapp.models import userinfo
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PRESENCE_ONLINE_WINDOW = timedelta(minutes=5)  # Seen this recently = online
+PRESENCE_CACHE_REFRESH = 60  # Seconds before the same process refreshes a user's cache entry
+PRESENCE_CACHE_TTL = 1800  # Cached timestamps outlive the online window comfortably
+PRESENCE_PERSIST_INTERVAL = 600  # Write last_seen to the database at most every 10 minutes per user
+PRESENCE_FLUSH_SECONDS = 30  # Queued last_seen writes are flushed this often per process
+
+_lock = threading.Lock()
+_pending = {}  # userinfo ID -> last_seen waiting for the next flush
+_refreshed = {}  # userinfo ID -> monotonic time of this process's last cache write
+_last_flush = time.monotonic()
+
+
+def _cache_key(user_id):
+    return f'presence:{user_id}'
+
+
+def _persist_key(user_id):
+    return f'presence:persisted:{user_id}'
+
+
+def record_presence(user_id):
+    """
+    Mark a user as seen now (called on every authenticated request).
+
+    Args:
+        user_id: userinfo ID
+    """
+    global _last_flush
+    clock = time.monotonic()
+    with _lock:
+        if clock - _refreshed.get(user_id, float('-inf')) < PRESENCE_CACHE_REFRESH:
+            refresh = False
+        else:
+            _refreshed[user_id] = clock
+            refresh = True
+        flush_due = clock - _last_flush >= PRESENCE_FLUSH_SECONDS
+        if flush_due:
+            _last_flush = clock
+
+    if refresh:
+        now = timezone.now()
+        cache.set(_cache_key(user_id), now, PRESENCE_CACHE_TTL)
+        with _lock:
+            _pending[user_id] = now
+
+    if flush_due:
+        flush_presence()
+
+
+def flush_presence():
+    """
+    Write this process's queued last_seen values in one bulk UPDATE,
+    skipping users persisted within PRESENCE_PERSIST_INTERVAL.
+
+    Returns:
+        Number of users written
+    """
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        # Forget refresh times older than the throttle so the map stays small
+        cutoff = time.monotonic() - PRESENCE_CACHE_REFRESH
+        for user_id in [user_id for user_id, refreshed in _refreshed.items() if refreshed < cutoff]:
+            del _refreshed[user_id]
+
+    if not pending:
+        return 0
+    persisted = cache.get_many([_persist_key(user_id) for user_id in pending])
+    pending = {
+        user_id: last_seen for user_id, last_seen in pending.items()
+        if _persist_key(user_id) not in persisted
+    }
+    if not pending:
+        return 0
+    try:
+        userinfo.objects.bulk_update(
+            [userinfo(pk=user_id, last_seen=last_seen) for user_id, last_seen in pending.items()],
+            ['last_seen'],
+        )
+    except Exception:
+        logger.exception(f'Failed to persist last_seen for {len(pending)} users')
+        with _lock:
+            # Retry with the next flush unless a newer value was queued meanwhile
+            for user_id, last_seen in pending.items():
+                _pending.setdefault(user_id, last_seen)
+        return 0
+    cache.set_many({_persist_key(user_id): True for user_id in pending}, PRESENCE_PERSIST_INTERVAL)
+    return len(pending)
+
+
+# Don't lose the queue when the process stops (e.g. a worker restart)
+atexit.register(flush_presence)
+
+
+def get_last_seen_many(users):
+    """
+    Freshest known last-seen time of several users (one cache round trip).
+
+    Args:
+        users: userinfo objects
+
+    Returns:
+        Dict of userinfo ID -> datetime (or None)
+    """
+    users = list(users)
+    cached = cache.get_many([_cache_key(user.pk) for user in users])
+    last_seen = {}
+    for user in users:
+        value = cached.get(_cache_key(user.pk))
+        if value is None or (user.last_seen and user.last_seen > value):
+            value = user.last_seen
+        last_seen[user.pk] = value
+    return last_seen
+
+
+def apply_presence(users):
+    """
+    Overlay cached last-seen times onto userinfo objects before rendering,
+    so templates using `last_seen|is_online` see the fast store.
+
+    Returns:
+        The same userinfo objects, as a list
+    """
+    users = list(users)
+    last_seen = get_last_seen_many(users)
+    for user in users:
+        user.last_seen = last_seen[user.pk]
+    return users
+
+
+def is_online(user):
+    """
+    True if the user was seen within PRESENCE_ONLINE_WINDOW.
+
+    Args:
+        user: userinfo object
+    """
+    return is_recent(get_last_seen_many([user])[user.pk])
+
+
+def is_recent(last_seen):
+    """True if a last-seen time falls within PRESENCE_ONLINE_WINDOW."""
+    return bool(last_seen) and timezone.now() - last_seen < PRESENCE_ONLINE_WINDOW
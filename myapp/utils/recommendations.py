@@ -2,12 +2,14 @@
 Developer Recommendation System
 Provides personalized developer recommendations based on multiple factors
 """
-from django.db.models import Count, Q, F, Prefetch, Value, IntegerField
+from django.db.models import Count, Q, F, Value, IntegerField
 from django.db.models.functions import Coalesce
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
-from myapp.models import userinfo, follow
+from myapp.models import userinfo, SecondDegreeLink
+from myapp.utils.social_graph import get_path_counts
+from myapp.utils.sampling import random_sample
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,6 +46,9 @@ def get_recommended_developers(user, limit=10, offset=0, exclude_following=True,
     # Get candidate pool
     candidates = _get_candidate_pool(user, exclude_following)
     
+    # Followed-by counts for every candidate in one query
+    user._path_counts = get_path_counts(user, [candidate.id for candidate in candidates])
+    
     # Score each candidate
     scored_candidates = []
     for candidate in candidates:
@@ -75,9 +80,9 @@ def _get_candidate_pool(user, exclude_following=True):
     Get pool of candidate developers to recommend
     
     Strategy:
-    1. Same coding style users
-    2. Same location users
-    3. Users with mutual connections
+    1. Users followed by people the user follows (strongest second-degree links)
+    2. Same coding style users
+    3. Same location users
     4. Active users
     
     Optimized with select_related and prefetch_related
@@ -89,9 +94,6 @@ def _get_candidate_pool(user, exclude_following=True):
     ).select_related(
         'user',
         'coding_style'
-    ).prefetch_related(
-        Prefetch('followers', queryset=follow.objects.select_related('follower')),
-        Prefetch('following', queryset=follow.objects.select_related('following'))
     ).annotate(
         follower_count=Count('followers', distinct=True),
         following_count=Count('following', distinct=True)
@@ -107,15 +109,21 @@ def _get_candidate_pool(user, exclude_following=True):
                    Q(city=user.city) | \
                    Q(state=user.state)
     
-    # Get users with commonality first (up to 200)
-    priority_candidates = list(candidates.filter(base_filters)[:200])
+    # Friends-of-friends followed by the most people the user follows (up to 100)
+    second_degree_ids = SecondDegreeLink.objects.filter(user=user).order_by('-path_count').values('target_id')[:100]
+    second_degree_candidates = list(candidates.filter(id__in=second_degree_ids))
+    
+    # Get users with commonality next (up to 200)
+    priority_candidates = list(candidates.filter(base_filters).exclude(
+        id__in=[c.id for c in second_degree_candidates]
+    )[:200])
     
-    # Add some random diverse candidates (up to 50)
-    diverse_candidates = list(candidates.exclude(
-        id__in=[c.id for c in priority_candidates]
-    ).order_by('?')[:50])
+    # Add some random diverse candidates (up to 50), sampled by random_key instead of ORDER BY RANDOM()
+    diverse_candidates = random_sample(candidates.exclude(
+        id__in=[c.id for c in second_degree_candidates + priority_candidates]
+    ), 50)
     
-    return priority_candidates + diverse_candidates
+    return second_degree_candidates + priority_candidates + diverse_candidates
 
 
 def _calculate_recommendation_score(current_user, candidate):
@@ -128,12 +136,12 @@ def _calculate_recommendation_score(current_user, candidate):
     score = 0
     reasons = []
     
-    # 1. Mutual Connections (25 points) - Highest priority
-    mutual_count = _get_mutual_connections_count(current_user, candidate)
-    if mutual_count > 0:
-        mutual_score = min(mutual_count * 5, 25)
-        score += mutual_score
-        reasons.append(f"{mutual_count} mutual connection{'s' if mutual_count > 1 else ''}")
+    # 1. Followed by people you follow (25 points) - Highest priority
+    followed_by_count = _get_followed_by_following_count(current_user, candidate)
+    if followed_by_count > 0:
+        followed_by_score = min(followed_by_count * 5, 25)
+        score += followed_by_score
+        reasons.append(f"Followed by {followed_by_count} {'people' if followed_by_count > 1 else 'person'} you follow")
     
     # 2. Location Proximity (20 points)
     # Only score location if both users have location data
@@ -178,27 +186,17 @@ def _calculate_recommendation_score(current_user, candidate):
     return min(score, 100), reason_text
 
 
-def _get_mutual_connections_count(user1, user2):
+def _get_followed_by_following_count(user1, user2):
     """
-    Count mutual connections between two users
-    Uses prefetched data to avoid N+1 queries
-    
-    Mutual connections = people that both user1 and user2 are following
+    Count the people user1 follows who follow user2
+    (the materialized second-degree path count)
     """
-    # Cache user1's following set to avoid repeated queries
-    if not hasattr(user1, '_following_cache'):
-        user1._following_cache = set(user1.following.values_list('following_id', flat=True))
-    
-    # Use prefetched data if available, otherwise query
-    if hasattr(user2, '_prefetched_objects_cache') and 'following' in user2._prefetched_objects_cache:
-        # Use prefetched follow objects
-        user2_following = {f.following_id for f in user2.following.all()}
-    else:
-        # Fallback to query (should be cached by select_related)
-        user2_following = set(user2.following.values_list('following_id', flat=True))
-    
-    # Count intersection
-    return len(user1._following_cache & user2_following)
+    # Path counts for the whole candidate pool are loaded by get_recommended_developers
+    if not hasattr(user1, '_path_counts'):
+        user1._path_counts = {}
+    if user2.id not in user1._path_counts:
+        user1._path_counts.update(get_path_counts(user1, [user2.id]))
+    return user1._path_counts.get(user2.id, 0)
 
 
 def _is_active_user(user):
@@ -0,0 +1,61 @@
+"""
+Random sampling of developers without ORDER BY RANDOM().
+
+Every userinfo row has a uniform random_key in [0, 1) (indexed). A sample is
+taken by jumping to a few random points of the key range and reading the next
+rows in key order, wrapping around at 1.0. Each probe is an index range scan,
+so the cost depends on the sample size, not on the table size.
+
+A filtered queryset that has fewer rows than requested simply returns all of
+them (the probes wrap around the whole key range).
+"""
+import math
+import random
+
+# Configuration
+SAMPLE_PROBES = 5  # Random starting points per sample (more probes = less clustered samples)
+
+
+def _read_from(queryset, start, limit, seen):
+    """Rows with random_key >= start in key order, wrapping to the beginning of the range."""
+    rows = list(queryset.filter(random_key__gte=start).exclude(pk__in=seen).order_by('random_key')[:limit])
+    if len(rows) < limit:
+        seen = seen | {row.pk for row in rows}
+        rows += list(
+            queryset.filter(random_key__lt=start).exclude(pk__in=seen).order_by('random_key')[:limit - len(rows)]
+        )
+    return rows
+
+
+def random_sample(queryset, count, probes=SAMPLE_PROBES):
+    """
+    Pick up to `count` random rows of a userinfo queryset.
+
+    Args:
+        queryset: userinfo queryset (filters/excludes/annotations are kept)
+        count: Number of rows wanted
+        probes: Number of random starting points
+
+    Returns:
+        List of model instances in random order
+    """
+    if count <= 0:
+        return []
+
+    probes = max(1, min(probes, count))
+    per_probe = math.ceil(count / probes)
+    sample = {}
+    for _ in range(probes):
+        for row in _read_from(queryset, random.random(), per_probe, set(sample)):
+            sample[row.pk] = row
+        if len(sample) >= count:
+            break
+
+    if len(sample) < count:
+        # Probes overlapped or the queryset is small: top up from another random point
+        for row in _read_from(queryset, random.random(), count - len(sample), set(sample)):
+            sample[row.pk] = row
+
+    rows = list(sample.values())[:count]
+    random.shuffle(rows)
+    return rows
@@ -0,0 +1,133 @@
+"""
+Materialized second-degree network (friends-of-friends with path counts).
+
+SecondDegreeLink(user, target, path_count) holds, for every user, each
+account followed by someone the user follows, and how many such people
+there are. Rows are adjusted incrementally by the follow signals in
+myapp/signals.py instead of re-deriving the graph join on every request.
+"""
+from django.db.models import Count, F
+from myapp.models import SecondDegreeLink, follow
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _increment_links(user_ids, target_ids):
+    """Add one path to every (user, target) pair, creating missing links."""
+    user_ids, target_ids = list(user_ids), list(target_ids)
+    pairs = {(user_id, target_id) for user_id in user_ids for target_id in target_ids if user_id != target_id}
+    if not pairs:
+        return
+
+    links = SecondDegreeLink.objects.filter(user_id__in=set(user_ids), target_id__in=set(target_ids))
+    existing = set(links.values_list('user_id', 'target_id'))
+    if existing:
+        links.update(path_count=F('path_count') + 1)
+
+    missing = pairs - existing
+    if missing:
+        SecondDegreeLink.objects.bulk_create(
+            [SecondDegreeLink(user_id=user_id, target_id=target_id, path_count=1) for user_id, target_id in missing],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+def _decrement_links(user_ids, target_ids):
+    """Remove one path from every (user, target) pair, dropping links with no path left."""
+    user_ids, target_ids = list(user_ids), list(target_ids)
+    if not user_ids or not target_ids:
+        return
+    links = SecondDegreeLink.objects.filter(user_id__in=set(user_ids), target_id__in=set(target_ids))
+    links.filter(path_count__gte=1).update(path_count=F('path_count') - 1)
+    links.filter(path_count=0).delete()
+
+
+def add_follow_paths(follower_id, following_id):
+    """
+    Update links after follower_id starts following following_id.
+
+    - follower -> following -> X: the follower gains a path to everyone the
+      followed user follows.
+    - F -> follower -> following: the follower's followers gain a path to
+      the followed user.
+    """
+    _increment_links(
+        [follower_id],
+        follow.objects.filter(follower_id=following_id).values_list('following_id', flat=True),
+    )
+    _increment_links(
+        follow.objects.filter(following_id=follower_id).values_list('follower_id', flat=True),
+        [following_id],
+    )
+
+
+def remove_follow_paths(follower_id, following_id):
+    """Reverse add_follow_paths after follower_id unfollows following_id."""
+    _decrement_links(
+        [follower_id],
+        follow.objects.filter(follower_id=following_id).values_list('following_id', flat=True),
+    )
+    _decrement_links(
+        follow.objects.filter(following_id=follower_id).values_list('follower_id', flat=True),
+        [following_id],
+    )
+
+
+def remove_user_paths(user_id):
+    """
+    Drop every path that runs through a user who is being deleted
+    (their own links and links to them are removed by cascade).
+    """
+    _decrement_links(
+        follow.objects.filter(following_id=user_id).values_list('follower_id', flat=True),
+        follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True),
+    )
+
+
+def rebuild_second_degree_links(user_id):
+    """
+    Recompute one user's links from the follow table.
+
+    Returns:
+        Number of links written
+    """
+    path_counts = (
+        follow.objects.filter(
+            follower_id__in=follow.objects.filter(follower_id=user_id).values('following_id')
+        )
+        .exclude(following_id=user_id)
+        .values('following_id')
+        .annotate(path_count=Count('id'))
+    )
+    links = [
+        SecondDegreeLink(user_id=user_id, target_id=row['following_id'], path_count=row['path_count'])
+        for row in path_counts
+    ]
+    SecondDegreeLink.objects.filter(user_id=user_id).delete()
+    SecondDegreeLink.objects.bulk_create(links, batch_size=1000)
+    return len(links)
+
+
+def get_second_degree_ids(user):
+    """
+    Get IDs of everyone followed by someone the user follows (may include direct follows).
+
+    Returns:
+        set of userinfo IDs
+    """
+    return set(SecondDegreeLink.objects.filter(user=user).values_list('target_id', flat=True))
+
+
+def get_path_counts(user, target_ids):
+    """
+    Get how many people the user follows who follow each target.
+
+    Returns:
+        Dictionary of target ID -> path count (targets without a path are missing)
+    """
+    return dict(
+        SecondDegreeLink.objects.filter(user=user, target_id__in=target_ids)
+        .values_list('target_id', 'path_count')
+    )
@@ -0,0 +1,293 @@
+"""
+Process-local spatial index of developer coordinates.
+
+Coordinates are stored as 3D unit vectors on a static KD-tree, so nearest
+neighbours by straight-line (chord) distance are nearest by great-circle
+distance too, with no special cases at the poles or the antimeridian.
+
+Updates from update_location() go to a small overlay that is searched by
+brute force next to the tree; the tree is rebuilt when the overlay grows or
+the index gets old (other worker processes only see each other's writes
+after a rebuild). Only the first build blocks a request: later rebuilds run
+on a background thread while the old tree and its overlay keep serving.
+"""
+import heapq
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EARTH_RADIUS_KM = 6371.0
+INDEX_MAX_AGE_SECONDS = 600  # Rebuild from the database every 10 minutes
+OVERLAY_REBUILD_SIZE = 256  # Rebuild once this many points changed since the last build
+
+
+def to_unit_vector(latitude, longitude):
+    """Convert a latitude/longitude in degrees to an (x, y, z) point on the unit sphere."""
+    lat = math.radians(float(latitude))
+    lon = math.radians(float(longitude))
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+
+
+def km_to_chord(distance_km):
+    """Convert a great-circle distance to the straight-line distance on the unit sphere."""
+    return 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def chord_to_km(chord):
+    """Convert a unit-sphere chord length back to a great-circle distance."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class DeveloperKDTree:
+    """
+    Static 3D KD-tree over (user_id, unit vector) points.
+    The tree is stored implicitly: the median of each index range is the node.
+    """
+
+    def __init__(self, points):
+        """
+        Args:
+            points: Iterable of (user_id, (x, y, z)) tuples
+        """
+        points = list(points)
+        self.ids = [user_id for user_id, _ in points]
+        self.vectors = [vector for _, vector in points]
+        self.order = list(range(len(points)))
+        self._build(0, len(self.order), 0)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _build(self, lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        vectors = self.vectors
+        self.order[lo:hi] = sorted(self.order[lo:hi], key=lambda i: vectors[i][axis])
+        mid = (lo + hi) // 2
+        next_axis = (axis + 1) % 3
+        self._build(lo, mid, next_axis)
+        self._build(mid + 1, hi, next_axis)
+
+    def nearest(self, vector, k, max_chord=2.0, skip=None):
+        """
+        Find the k nearest points to a vector.
+
+        Args:
+            vector: (x, y, z) query point
+            k: Number of neighbours
+            max_chord: Ignore points further than this chord length
+            skip: Optional set of user IDs to leave out
+
+        Returns:
+            List of (chord_squared, user_id) sorted nearest first
+        """
+        heap = []  # Max-heap of (-chord_squared, user_id), size <= k
+        skip = skip or ()
+        bound = [max_chord * max_chord]
+        order, vectors, ids = self.order, self.vectors, self.ids
+
+        def search(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            point = vectors[order[mid]]
+            dx = point[0] - vector[0]
+            dy = point[1] - vector[1]
+            dz = point[2] - vector[2]
+            dist2 = dx * dx + dy * dy + dz * dz
+            user_id = ids[order[mid]]
+            if dist2 <= bound[0] and user_id not in skip:
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist2, user_id))
+                elif dist2 < -heap[0][0]:
+                    heapq.heapreplace(heap, (-dist2, user_id))
+                if len(heap) == k:
+                    bound[0] = min(bound[0], -heap[0][0])
+
+            diff = vector[axis] - point[axis]
+            next_axis = (axis + 1) % 3
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(near[0], near[1], next_axis)
+            if diff * diff <= bound[0]:
+                search(far[0], far[1], next_axis)
+
+        search(0, len(order), 0)
+        return sorted((-neg_dist2, user_id) for neg_dist2, user_id in heap)
+
+
+class DeveloperIndex:
+    """
+    KD-tree plus an overlay of points changed since it was built.
+    Thread-safe; one instance per process (see get_developer_index).
+    """
+
+    def __init__(self, points):
+        self._lock = threading.Lock()
+        self._tree = DeveloperKDTree(points)
+        self._overlay = {}  # user_id -> vector, or None if removed
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._tree)
+
+    @property
+    def is_stale(self):
+        return (
+            time.monotonic() - self.built_at > INDEX_MAX_AGE_SECONDS
+            or len(self._overlay) >= OVERLAY_REBUILD_SIZE
+        )
+
+    def upsert(self, user_id, latitude, longitude):
+        """Add or move one developer without rebuilding the tree."""
+        with self._lock:
+            self._overlay[user_id] = to_unit_vector(latitude, longitude)
+
+    def remove(self, user_id):
+        """Drop one developer (e.g. location cleared) without rebuilding the tree."""
+        with self._lock:
+            self._overlay[user_id] = None
+
+    def nearest(self, latitude, longitude, k, max_distance_km=None, exclude_ids=None):
+        """
+        Find the k developers closest to a coordinate.
+
+        Args:
+            latitude, longitude: Query coordinate
+            k: Number of developers to return
+            max_distance_km: Optional search radius
+            exclude_ids: Optional set of user IDs to leave out
+
+        Returns:
+            List of (user_id, distance_km) sorted nearest first
+        """
+        vector = to_unit_vector(latitude, longitude)
+        max_chord = km_to_chord(max_distance_km) if max_distance_km is not None else 2.0
+
+        with self._lock:
+            overlay = dict(self._overlay)
+        skip = set(exclude_ids or ()) | set(overlay)
+
+        results = self._tree.nearest(vector, k, max_chord=max_chord, skip=skip)
+
+        # Changed points are few - check them directly
+        max_chord2 = max_chord * max_chord
+        for user_id, point in overlay.items():
+            if point is None or (exclude_ids and user_id in exclude_ids):
+                continue
+            dist2 = sum((a - b) * (a - b) for a, b in zip(point, vector))
+            if dist2 <= max_chord2:
+                results.append((dist2, user_id))
+        results.sort()
+
+        return [(user_id, chord_to_km(math.sqrt(dist2))) for dist2, user_id in results[:k]]
+
+
+_index = None
+_index_lock = threading.Lock()  # Guards _index, _rebuilding and _rebuild_changes
+_build_lock = threading.RLock()  # One build at a time
+_rebuilding = False
+_rebuild_changes = None  # user_id -> (latitude, longitude) or None, applied while a build loads points
+
+
+def _load_points():
+    from myapp.models import userinfo
+    rows = userinfo.objects.filter(
+        user__is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).values_list('id', 'latitude', 'longitude')
+    return [(user_id, to_unit_vector(lat, lon)) for user_id, lat, lon in rows.iterator()]
+
+
+def rebuild_developer_index():
+    """
+    Build the index from the database and swap it in.
+    Location writes made while the points load are carried over to the new index.
+
+    Returns:
+        The new DeveloperIndex
+    """
+    global _index, _rebuild_changes
+    with _build_lock:
+        with _index_lock:
+            _rebuild_changes = {}
+        try:
+            start = time.monotonic()
+            index = DeveloperIndex(_load_points())
+        except Exception:
+            with _index_lock:
+                _rebuild_changes = None
+            raise
+
+        with _index_lock:
+            for user_id, location in _rebuild_changes.items():
+                if location is None:
+                    index.remove(user_id)
+                else:
+                    index.upsert(user_id, *location)
+            _rebuild_changes = None
+            _index = index
+        logger.info(f'Built developer spatial index: {len(index)} points in {time.monotonic() - start:.2f}s')
+        return index
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    from django.db import connection
+    try:
+        rebuild_developer_index()
+    except Exception as e:
+        logger.error(f"Error rebuilding developer spatial index: {e}")
+    finally:
+        connection.close()
+        with _index_lock:
+            _rebuilding = False
+
+
+def get_developer_index():
+    """
+    Get the process-local developer index.
+
+    The first call builds it. Once it is stale, a rebuild starts on a
+    background thread and the current index keeps serving until it is done.
+
+    Returns:
+        DeveloperIndex
+    """
+    global _rebuilding
+    index = _index
+    if index is None:
+        with _build_lock:
+            if _index is None:
+                return rebuild_developer_index()
+            return _index
+
+    if index.is_stale:
+        with _index_lock:
+            start_rebuild = not _rebuilding
+            _rebuilding = True
+        if start_rebuild:
+            threading.Thread(target=_rebuild_in_background, name='developer-index-rebuild', daemon=True).start()
+    return index
+
+
+def update_developer_location(user_id, latitude, longitude):
+    """
+    Apply a location write to this process's index (no-op before the first build).
+    """
+    location = None if latitude is None or longitude is None else (latitude, longitude)
+    with _index_lock:
+        index = _index
+        if _rebuild_changes is not None:
+            _rebuild_changes[user_id] = location
+    if index is None:
+        return
+    if location is None:
+        index.remove(user_id)
+    else:
+        index.upsert(user_id, latitude, longitude)
@@ -5,7 +5,7 @@ from django.utils import timezone
 from django.utils.timezone import now, localtime
 from datetime import timedelta
 from django.db.models import F, Avg
-from django.http import Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth import login,logout,authenticate
 from django.urls import reverse, reverse_lazy
@@ -15,11 +15,11 @@ from logs.forms import LogForm
 from django.contrib.auth.models import User
 from .models import userinfo, user_status, education, experience, CodingStyle
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, PageNotAnInteger
+from django.core.paginator import Paginator
 from django.db.models import Q
 from django.template.loader import render_to_string
 from itertools import groupby
-from .algorithms import get_explore_users, get_personalized_feed, top_skills_list
+from .algorithms import get_personalized_feed, top_skills_list
 from allauth.account.views import PasswordChangeView
 from django.contrib import messages
 from datetime import date, timedelta
@@ -27,7 +27,10 @@ from datetime import date, timedelta
 #Logs
 from logs.models import Log
 from logs.views import build_contribution_months
-from logs.utils.streaks import streak_calculation, calculate_max_streak
+from logs.utils.activity import get_activity_by_date, get_current_streak, get_total_activity
+from logs.utils.hydration import hydrate_feed_logs
+from .utils.feed_api import FEED_API_MAX_LIMIT, conditional_json_response, serialize_feed_page
+from .utils.presence import apply_presence
 
 # Create your views here.
 class CustomPasswordChangeView(PasswordChangeView):
@@ -93,9 +96,14 @@ def signup_about(request, uuid):
 def signup_character(request, uuid):
     form = Postsignup_infoForm(instance=request.user.info)
     if request.method == 'POST':
+        previous_timezone = request.user.info.timezone
         form = Postsignup_infoForm(request.POST, instance=request.user.info)
         if form.is_valid():
-            form.save()
+            userinfo_obj = form.save()
+            if userinfo_obj.timezone != previous_timezone:
+                # Re-date the activity rollup (heatmap, streaks) in the new timezone
+                from logs.utils.activity import rebuild_daily_activity
+                rebuild_daily_activity(userinfo.objects.filter(pk=userinfo_obj.pk))
             reverse_url = reverse("signup_skills", args=[request.user.info.uuid])
             return redirect(reverse_url)
     context = {
@@ -145,7 +153,7 @@ def home_page(request):
     trending_logs = []
     if feed_type == 'global':
         from logs.utils.trending import get_trending_logs
-        trending_logs = get_trending_logs(limit=5, hours=24)
+        trending_logs = get_trending_logs(limit=5)
     
     logform = LogForm()
     
@@ -182,23 +190,46 @@ def load_more_feed(request):
 
     cursor = request.GET.get('cursor', None)
     type = request.GET.get('feed', 'all')
-
-    suggested_peoples = get_explore_users(filter_dev=userinfo.objects.all(), request=request, count=7, order_by='?')
     
     # Use cursor-based pagination
     feed_result = get_personalized_feed(request, type=type, per_page=7, cursor=cursor)
     
     html = render_to_string('myapp/feed_items.html', {
         'feed_items': feed_result['items'], 
-        'suggested_peoples': suggested_peoples
     }, request=request)
 
-    return JsonResponse({
+    return conditional_json_response(request, {
         'html': html,
         'has_next': feed_result['has_next'],
         'next_cursor': feed_result['next_cursor']
     })
 
+@login_required
+def feed_api(request):
+    """
+    Versioned JSON feed: compact log records plus a deduplicated author table.
+    
+    Query params:
+    - feed: network / global / local / hot (default network)
+    - cursor: next_cursor of the previous page
+    - limit: page size (default 7, max 50)
+    
+    Honours If-None-Match: an unchanged page returns 304 Not Modified.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 7)), 1), FEED_API_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    feed_result = get_personalized_feed(
+        request,
+        type=request.GET.get('feed', 'network'),
+        per_page=limit,
+        cursor=request.GET.get('cursor') or None,
+        cards=False,
+    )
+    return conditional_json_response(request, serialize_feed_page(feed_result, request.user.info))
+
 @login_required
 def view_log_in_feed(request, log_sig):
     """
@@ -229,9 +260,10 @@ def view_log_in_feed(request, log_sig):
     if not log_in_feed:
         # Prepend target log and limit to 20 total items
         feed_items = [target_log] + list(feed_items)[:19]
+        hydrate_feed_logs([target_log], request.user.info)
     
     # Fetch trending logs
-    trending_logs = get_trending_logs(limit=5, hours=24)
+    trending_logs = get_trending_logs(limit=5)
     
     logform = LogForm()
     context = {
@@ -267,45 +299,28 @@ def user_profile(request, user_name):
     #streak and other logs calculations
     logs = Log.objects.filter(user = userinfo_obj).order_by("-timestamp")
     
-    # Paginate recent logs (first 10 for initial load)
-    logs_paginator = Paginator(logs, 10)
-    recent_logs_page = logs_paginator.page(1)
-    recent_logs = list(recent_logs_page.object_list)
-    has_more_logs = recent_logs_page.has_next()
+    # Recent logs (first 10 for initial load); an 11th row tells whether there are more
+    recent_logs_page = list(logs[:11])
+    has_more_logs = len(recent_logs_page) > 10
+    recent_logs = hydrate_feed_logs(recent_logs_page[:10], request.user.info)
     
     # Get cursor for pagination (last log's timestamp)
     initial_cursor = recent_logs[-1].timestamp.isoformat() if recent_logs else None
     
-    total_logs = logs.count()
-    last_log_date = timezone.localtime(logs.first().timestamp).date() if total_logs else None
+    last_log_date = timezone.localtime(recent_logs[0].timestamp).date() if recent_logs else None
     
-    
-    streak_count = streak_calculation(logs, userinfo_obj.user)
-    max_streak_count = calculate_max_streak(logs)
+    # Totals, streaks and the heatmap come from the daily activity rollup (logs/utils/activity.py)
+    from myapp.timezone_utils import get_timezone
+    profile_today = timezone.now().astimezone(get_timezone(userinfo_obj.timezone)).date()
+    total_logs = get_total_activity(userinfo_obj)
+    streak_count = get_current_streak(userinfo_obj, profile_today)
+    max_streak_count = userinfo_obj.max_streak
     
     year = int(request.GET.get('year', timezone.now().year))
     
-    # Get user's timezone for accurate date conversion
-    from myapp.timezone_utils import get_user_timezone
-    import pytz
-    user_tz = get_user_timezone(userinfo_obj.user)
-    
-    # Optimized: Use database aggregation with timezone conversion
-    from django.db.models.functions import TruncDate
-    from django.db.models import Count
-    
-    # Aggregate logs by date at database level, converting to user's timezone
-    log_heat_map = logs.filter(
-        timestamp__year=year
-    ).annotate(
-        log_date=TruncDate('timestamp', tzinfo=user_tz)
-    ).values('log_date').annotate(
-        count=Count('id')
-    ).order_by('log_date')
-    
-    # Build efficient lookup dict
-    log_map = {item['log_date'].strftime('%Y-%m-%d'): item['count'] 
-               for item in log_heat_map}
+    # Logs per day of the year, in the user's timezone
+    log_map = {day.strftime('%Y-%m-%d'): count
+               for day, count in get_activity_by_date(userinfo_obj, year).items()}
 
     # Prepare full 1-year grid
     start_date = date(year, 1, 1)
@@ -323,7 +338,7 @@ def user_profile(request, user_name):
         
     contribution_months = build_contribution_months(contribution_days)
     log_year_count =  sum(log_map.values())
-    years_available = logs.dates('timestamp', 'year')
+    years_available = userinfo_obj.daily_activity.dates('date', 'year')
     
     section = request.GET.get('section', 'overview') 
     print(section)
@@ -410,6 +425,7 @@ def user_profile(request, user_name):
                 redirect_url = reverse('user_profile', args=[request.user.username])
                 return redirect(f'{redirect_url}?section=info')  
                 
+    apply_presence([userinfo_obj])  # Online badge from the presence cache
     context = {
         'userinfo_obj': userinfo_obj,
         'social_links': social_links,
@@ -552,6 +568,7 @@ def follow_list(request, username):
         p = Paginator(list, 25)
         page_number = request.GET.get('page')
         page_obj = p.get_page(page_number)
+        page_obj.object_list = apply_presence(page_obj.object_list)  # Online badges from the presence cache
         
         # Calculate counts for context
         followers_count = userinfo_obj.get_followers().count()
@@ -750,8 +767,13 @@ def settings_page(request):
         from django.contrib import messages
         from django.shortcuts import redirect
         if new_timezone in pytz.all_timezones:
+            timezone_changed = userinfo_obj.timezone != new_timezone
             userinfo_obj.timezone = new_timezone
             userinfo_obj.save()
+            if timezone_changed:
+                # Re-date the activity rollup (heatmap, streaks) in the new timezone
+                from logs.utils.activity import rebuild_daily_activity
+                rebuild_daily_activity(userinfo.objects.filter(pk=userinfo_obj.pk))
             messages.success(request, 'Timezone updated successfully!')
         else:
             messages.error(request, 'Invalid timezone selected.')
@@ -859,27 +881,15 @@ def get_coding_styles(request):
 @login_required
 def notification_page(request):
     """
-    Display notifications page with grouped notifications and pagination
+    Display notifications page with grouped notifications and keyset pagination
     """
-    from logs.utils.notifications import get_user_notifications, get_notification_count, group_notifications_by_date
-    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-    
-    # Get all notifications for the user (without limit for pagination)
-    all_notifications = get_user_notifications(request.user)
-    
-    # Paginate notifications (20 per page)
-    paginator = Paginator(all_notifications, 20)
-    page = request.GET.get('page', 1)
+    from logs.utils.notifications import get_notification_page, get_notification_count, group_notifications_by_date
     
-    try:
-        notifications = paginator.page(page)
-    except PageNotAnInteger:
-        notifications = paginator.page(1)
-    except EmptyPage:
-        notifications = paginator.page(paginator.num_pages)
+    # First page (20 per page); further pages come from load_more_notifications
+    page = get_notification_page(request.user)
     
     # Group by date
-    grouped_notifications = group_notifications_by_date(notifications)
+    grouped_notifications = group_notifications_by_date(page['items'])
     
     # Get unread count
     notification_count = get_notification_count(request.user, unread_only=True)
@@ -888,8 +898,8 @@ def notification_page(request):
         'grouped_notifications': grouped_notifications,
         'notification_count': notification_count,
         'active_notifications': True,
-        'page_obj': notifications,
-        'paginator': paginator,
+        'has_next': page['has_next'],
+        'next_cursor': page['next_cursor'],
     }
     
     return render(request, 'myapp/notification.html', context)
@@ -918,13 +928,36 @@ def get_notification_count_api(request):
     """
     from logs.utils.notifications import get_notification_count
     
+    # Primary key read of the denormalized counter; unchanged counts revalidate as 304
     count = get_notification_count(request.user, unread_only=True)
     
-    return JsonResponse({
+    return conditional_json_response(request, {
         'count': count
     })
 
 
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of new and updated notifications and unread counts.
+    Needs ASGI (e.g. uvicorn DevMate.asgi:application); under WSGI it answers
+    204 No Content, which stops EventSource and the client keeps polling.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    from logs.utils.notification_stream import notification_events
+    
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    user_id = await userinfo.objects.filter(user=user).values_list('id', flat=True).afirst()
+    response = StreamingHttpResponse(notification_events(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+
 @login_required
 @require_POST
 def mark_notification_read(request, notification_id):
@@ -954,32 +987,20 @@ def mark_notification_read(request, notification_id):
 def load_more_notifications(request):
     """
     AJAX endpoint to load more notifications for pagination
+    
+    Query params:
+    - cursor: next_cursor of the previous page
     """
-    from logs.utils.notifications import get_user_notifications, group_notifications_by_date
-    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+    from logs.utils.notifications import get_notification_page, group_notifications_by_date
     from django.template.loader import render_to_string
     
-    page = request.GET.get('page', 2)
-    
-    # Get all notifications
-    all_notifications = get_user_notifications(request.user)
-    
-    # Paginate
-    paginator = Paginator(all_notifications, 20)
-    
     try:
-        notifications = paginator.page(page)
-    except PageNotAnInteger:
-        return JsonResponse({'error': 'Invalid page number'}, status=400)
-    except EmptyPage:
-        return JsonResponse({
-            'html': '',
-            'has_more': False,
-            'next_page': None
-        })
+        page = get_notification_page(request.user, cursor=request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
     
     # Group by date
-    grouped_notifications = group_notifications_by_date(notifications)
+    grouped_notifications = group_notifications_by_date(page['items'])
     
     # Render HTML for notifications
     html = render_to_string('notifications/notification_list_partial.html', {
@@ -988,9 +1009,8 @@ def load_more_notifications(request):
     
     return JsonResponse({
         'html': html,
-        'has_more': notifications.has_next(),
-        'next_page': notifications.next_page_number() if notifications.has_next() else None,
-        'current_page': notifications.number
+        'has_more': page['has_next'],
+        'next_cursor': page['next_cursor'],
     })
 
 # ============= GEOLOCATION VIEWS (Browser-Only) =============
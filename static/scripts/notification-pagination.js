@@ -1,6 +1,6 @@
 /**
  * Notification Pagination - Load More functionality
- * Handles AJAX loading of additional notifications
+ * Handles AJAX loading of additional notifications (keyset cursor "timestamp,id")
  */
 
 document.addEventListener('DOMContentLoaded', function () {
@@ -11,16 +11,16 @@ document.addEventListener('DOMContentLoaded', function () {
     if (!loadMoreBtn) return; // No pagination needed
 
     loadMoreBtn.addEventListener('click', async function () {
-        const nextPage = this.dataset.nextPage;
+        const nextCursor = this.dataset.nextCursor;
 
-        if (!nextPage) return;
+        if (!nextCursor) return;
 
         // Show loading state
         loadMoreBtn.classList.add('hidden');
         loadingSpinner.classList.remove('hidden');
 
         try {
-            const response = await fetch(`/notifications/load-more/?page=${nextPage}`);
+            const response = await fetch(`/notifications/load-more/?cursor=${encodeURIComponent(nextCursor)}`);
             const data = await response.json();
 
             if (data.error) {
@@ -42,7 +42,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
             // Update button state
             if (data.has_more) {
-                loadMoreBtn.dataset.nextPage = data.next_page;
+                loadMoreBtn.dataset.nextCursor = data.next_cursor;
                 loadMoreBtn.classList.remove('hidden');
             } else {
                 // No more notifications - show "all caught up" message
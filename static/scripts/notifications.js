@@ -1,22 +1,57 @@
 /**
- * Real-time notification polling system
- * Polls the server every 30 seconds for new notifications
+ * Real-time notification system
+ * Listens to the Server-Sent Events stream (/notifications/stream/) when the
+ * server supports it, otherwise polls the server every 30 seconds.
+ * The stream sends `unread` counts and a `notification` event (with the
+ * rendered list item) for every new notification or merge into a group.
  */
 
 let notificationPollInterval = null;
+let notificationStream = null;
 let lastNotificationCount = 0;
 
-// Initialize notification polling when DOM is ready
+// Initialize notification updates when DOM is ready
 document.addEventListener('DOMContentLoaded', function () {
     if (document.querySelector('.notification-badge')) {
-        initializeNotificationPolling();
+        initializeNotificationStream();
     }
 });
 
+/**
+ * Open the push stream; fall back to polling if it is unavailable
+ * (no EventSource support, or the server answered 204 / failed for good)
+ */
+function initializeNotificationStream() {
+    if (!('EventSource' in window)) {
+        initializeNotificationPolling();
+        return;
+    }
+
+    notificationStream = new EventSource('/notifications/stream/');
+
+    notificationStream.addEventListener('unread', function (event) {
+        handleNotificationCount(JSON.parse(event.data).count);
+    });
+
+    notificationStream.addEventListener('notification', function (event) {
+        handleNotificationEvent(JSON.parse(event.data));
+    });
+
+    notificationStream.onerror = function () {
+        // EventSource retries by itself unless the connection is closed for good
+        if (notificationStream.readyState === EventSource.CLOSED) {
+            notificationStream = null;
+            initializeNotificationPolling();
+        }
+    };
+}
+
 /**
  * Start polling for notifications
  */
 function initializeNotificationPolling() {
+    if (notificationPollInterval) return;
+
     // Initial fetch
     fetchNotificationCount();
 
@@ -32,19 +67,78 @@ async function fetchNotificationCount() {
         const response = await fetch('/notifications/count/');
         const data = await response.json();
 
-        updateNotificationBadge(data.count);
-
-        // Optional: Show desktop notification for new notifications
-        if (data.count > lastNotificationCount && lastNotificationCount > 0) {
-            showNewNotificationAlert(data.count - lastNotificationCount);
-        }
-
-        lastNotificationCount = data.count;
+        handleNotificationCount(data.count);
     } catch (error) {
         console.error('Error fetching notification count:', error);
     }
 }
 
+/**
+ * Apply a new unread count from the stream or a poll
+ */
+function handleNotificationCount(count) {
+    updateNotificationBadge(count);
+
+    // Optional: Show desktop notification for new notifications
+    // (the stream announces each notification itself, see handleNotificationEvent)
+    if (!notificationStream && count > lastNotificationCount && lastNotificationCount > 0) {
+        const newCount = count - lastNotificationCount;
+        showNewNotificationAlert(`You have ${newCount} new notification(s)`);
+    }
+
+    lastNotificationCount = count;
+}
+
+/**
+ * Apply a new or updated (coalesced) notification from the stream
+ */
+function handleNotificationEvent(notification) {
+    const container = document.getElementById('notifications-container');
+    if (container) {
+        showNotificationItem(container, notification);
+    } else if (!notification.is_read) {
+        showNewNotificationAlert(describeNotification(notification));
+    }
+}
+
+/**
+ * Put a streamed notification into the open notifications page: groups already
+ * listed are updated in place, new notifications go to the top
+ */
+function showNotificationItem(container, notification) {
+    const template = document.createElement('template');
+    template.innerHTML = notification.html.trim();
+    const item = template.content.firstElementChild;
+
+    const existing = container.querySelector(`[data-notification-id="${notification.id}"]`);
+    if (existing) {
+        existing.replaceWith(item);
+        return;
+    }
+
+    let liveItems = document.getElementById('live-notifications');
+    if (!liveItems) {
+        if (!container.querySelector('.notification-item')) {
+            container.innerHTML = '';  // Drop the empty state
+        }
+        liveItems = document.createElement('div');
+        liveItems.id = 'live-notifications';
+        container.prepend(liveItems);
+    }
+    liveItems.prepend(item);
+}
+
+/**
+ * Short text of a notification ("alice and 2 others reacted to your log")
+ */
+function describeNotification(notification) {
+    const others = notification.actor_count - 1;
+    const actors = others > 0
+        ? `${notification.actor} and ${others} other${others === 1 ? '' : 's'}`
+        : notification.actor;
+    return `${actors} ${notification.verb}`;
+}
+
 /**
  * Update the notification badge in the UI (both desktop and mobile)
  */
@@ -66,14 +160,14 @@ function updateNotificationBadge(count) {
 /**
  * Show a subtle alert for new notifications (optional)
  */
-function showNewNotificationAlert(newCount) {
+function showNewNotificationAlert(message) {
     // You can implement a toast notification here
-    console.log(`You have ${newCount} new notification(s)`);
+    console.log(message);
 
     // Optional: Browser notification (requires permission)
     if ('Notification' in window && Notification.permission === 'granted') {
         new Notification('DevMate', {
-            body: `You have ${newCount} new notification(s)`,
+            body: message,
             icon: '/static/assets/logo.png',
             badge: '/static/assets/logo.png'
         });
@@ -180,9 +274,11 @@ document.addEventListener('visibilitychange', function () {
     if (document.hidden) {
         if (notificationPollInterval) {
             clearInterval(notificationPollInterval);
+            notificationPollInterval = null;
         }
     } else {
-        if (document.querySelector('.notification-badge')) {
+        // The stream keeps running in the background; only polling was stopped
+        if (!notificationStream && document.querySelector('.notification-badge')) {
             initializeNotificationPolling();
         }
     }